@@ -0,0 +1,254 @@
+"""
+Emotion recognition API for frames captured in the browser.
+
+Remote users can't share the server's camera, so the client captures
+frames itself and pushes them here as JPEG/PNG bytes or raw pixels. Each
+frame runs through the usual FacePreprocessor, and the detected faces are
+classified together with other clients' faces, both scheduled by the
+shared fair-share inference service.
+"""
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+from flask import current_app, jsonify, request
+
+from app.api.routes import api_bp, login_required, get_current_user_id
+from app.models.preprocessing import FacePreprocessor
+from app.models.inference_service import get_inference_service, InferenceQueueFull
+
+# Channels per pixel for the supported raw frame formats
+RAW_FORMATS = {
+    'bgr': (3, None),
+    'rgb': (3, cv2.COLOR_RGB2BGR),
+    'rgba': (4, cv2.COLOR_RGBA2BGR),
+    'bgra': (4, cv2.COLOR_BGRA2BGR),
+    'gray': (1, cv2.COLOR_GRAY2BGR),
+}
+
+class TokenBucketLimiter:
+    """
+    Per-client token bucket rate limiter.
+
+    Each client may send ``rate`` frames per second on average with bursts
+    of up to ``burst`` frames. Only the most recently seen clients are
+    tracked, so the limiter's memory stays bounded.
+    """
+
+    def __init__(self, rate=10.0, burst=5, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()  # client_id -> (tokens, last update time)
+        self.lock = threading.Lock()
+
+    def acquire(self, client_id):
+        """
+        Take one token for a client.
+
+        Args:
+            client_id: ID of the client
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until the next token is available
+        """
+        now = time.time()
+        with self.lock:
+            tokens, last = self.buckets.pop(client_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+
+            self.buckets[client_id] = (tokens, now)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+            return wait
+
+class PreprocessorCache:
+    """
+    Per-client FacePreprocessor instances.
+
+    The preprocessor keeps face tracking state between frames, so each
+    client gets its own; concurrent frames from one client take turns on
+    its lock. Least recently used entries are evicted.
+    """
+
+    def __init__(self, max_clients=256):
+        self.max_clients = max_clients
+        self.preprocessors = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, client_id):
+        with self.lock:
+            preprocessor = self.preprocessors.pop(client_id, None)
+            if preprocessor is None:
+                preprocessor = FacePreprocessor()
+            self.preprocessors[client_id] = preprocessor
+            if len(self.preprocessors) > self.max_clients:
+                self.preprocessors.popitem(last=False)
+            return preprocessor
+
+_rate_limiter = None
+_preprocessors = None
+_init_lock = threading.Lock()
+
+def _get_ingest_state():
+    """Create the rate limiter and preprocessor cache from the config on first use."""
+    global _rate_limiter, _preprocessors
+    with _init_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucketLimiter(
+                rate=current_app.config.get('INGEST_MAX_FPS', 10.0),
+                burst=current_app.config.get('INGEST_BURST', 5)
+            )
+            _preprocessors = PreprocessorCache()
+    return _rate_limiter, _preprocessors
+
+def decode_frame(data, content_type, width=None, height=None, pixel_format='rgba'):
+    """
+    Decode a pushed frame without copying the request body.
+
+    Args:
+        data (bytes): Request body
+        content_type (str): Request content type
+        width (int, optional): Frame width for raw frames
+        height (int, optional): Frame height for raw frames
+        pixel_format (str, optional): Pixel layout of raw frames (default: rgba)
+
+    Returns:
+        numpy.ndarray: BGR frame
+
+    Raises:
+        ValueError: If the frame can't be decoded
+    """
+    # View the request bytes as an array - no copy is made here
+    buffer = np.frombuffer(data, dtype=np.uint8)
+
+    if content_type.startswith('application/octet-stream'):
+        if pixel_format not in RAW_FORMATS:
+            raise ValueError(f"Unsupported pixel format: {pixel_format}")
+        if not width or not height:
+            raise ValueError("Raw frames need X-Frame-Width and X-Frame-Height headers")
+
+        channels, conversion = RAW_FORMATS[pixel_format]
+        if buffer.size != width * height * channels:
+            raise ValueError("Raw frame size does not match its dimensions")
+
+        frame = buffer.reshape(height, width, channels)
+        if conversion is not None:
+            frame = cv2.cvtColor(frame, conversion)
+        return frame
+
+    frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image")
+    return frame
+
+def read_frame_body(max_bytes):
+    """
+    Read the request body, refusing bodies over a size limit.
+
+    A chunked upload has no Content-Length to check up front, so at most
+    ``max_bytes + 1`` bytes are read whatever the client declared.
+
+    Args:
+        max_bytes (int): Largest body accepted
+
+    Returns:
+        bytes: The body, or None if it is larger than ``max_bytes``
+    """
+    if request.content_length is not None and request.content_length > max_bytes:
+        return None
+
+    chunks, size = [], 0
+    while size <= max_bytes:
+        chunk = request.stream.read(max_bytes + 1 - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    if size > max_bytes:
+        return None
+    # A body read in one go is passed on without a copy
+    return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+@api_bp.route('/frames', methods=['POST'])
+@login_required
+def ingest_frame():
+    """
+    Analyze a frame captured and pushed by the client.
+
+    The body is either an encoded image (``image/jpeg``, ``image/png``, ...)
+    or raw pixels (``application/octet-stream``) described by the
+    ``X-Frame-Width``, ``X-Frame-Height`` and ``X-Pixel-Format`` headers.
+
+    Returns:
+        JSON: Detected faces with their emotion probabilities
+    """
+    user_id = get_current_user_id()
+    rate_limiter, preprocessors = _get_ingest_state()
+
+    # Per-client rate limit
+    wait = rate_limiter.acquire(user_id)
+    if wait > 0:
+        retry_after = max(1, int(wait + 0.999))
+        response = jsonify({"error": "Frame rate limit exceeded", "retry_after": wait})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    data = read_frame_body(current_app.config.get('INGEST_MAX_FRAME_BYTES', 4 * 1024 * 1024))
+    if data is None:
+        return jsonify({"error": "Frame too large"}), 413
+
+    start_time = time.time()
+    try:
+        frame = decode_frame(
+            data,
+            request.content_type or '',
+            width=request.headers.get('X-Frame-Width', type=int),
+            height=request.headers.get('X-Frame-Height', type=int),
+            pixel_format=request.headers.get('X-Pixel-Format', 'rgba').lower()
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    service = get_inference_service()
+    if service is None:
+        return jsonify({"error": "Emotion model unavailable"}), 503
+
+    # Detect and classify in the user's fair turn; faces are batched with
+    # other clients'
+    preprocessor = preprocessors.get(user_id)
+    timeout = current_app.config.get('INGEST_TIMEOUT', 5.0)
+    try:
+        faces, face_rects = service.run(
+            user_id, lambda: preprocessor.detect_and_preprocess(frame), timeout=timeout)
+        emotions = service.predict(user_id, faces, timeout=timeout)
+    except InferenceQueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    except (TimeoutError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 503
+
+    results = []
+    for rect, emotion_result in zip(face_rects, emotions):
+        results.append({
+            "box": [int(v) for v in rect],
+            "emotions": emotion_result,
+            "dominant_emotion": max(emotion_result.items(), key=lambda x: x[1])[0]
+        })
+
+    return jsonify({
+        "faces": results,
+        "width": frame.shape[1],
+        "height": frame.shape[0],
+        "processing_time": time.time() - start_time
+    })
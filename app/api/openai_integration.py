@@ -7,11 +7,14 @@ This module provides integration with OpenAI's GPT models for:
 3. Enhancing the emotion recognition system with contextual analysis
 """
 import os
-import json
 import time
+from datetime import datetime, timedelta
 from flask import current_app
 import openai
 from app.database.models import EmotionRecord
+from app.database.db import get_read_db
+from app.database.emotion_vectors import decode_emotions
+from app.database.rollups import get_emotion_summary
 
 class OpenAIAnalyzer:
     """
@@ -59,7 +62,7 @@ class OpenAIAnalyzer:
             # Prepare data for OpenAI
             emotions_data = []
             for record in records:
-                emotions = json.loads(record['emotions_data'])
+                emotions = decode_emotions(record['emotion_vector'])
                 dominant = record['dominant_emotion']
                 timestamp = record['timestamp']
                 emotions_data.append({
@@ -112,7 +115,8 @@ class OpenAIAnalyzer:
         Args:
             user_id (int): User ID to analyze
             start_date (str, optional): Start date for the report (ISO format)
-            end_date (str, optional): End date for the report (ISO format)
+            end_date (str, optional): End date for the report (ISO format); a
+                                      bare date includes that whole day
         
         Returns:
             dict: Report data with summary and detailed analysis
@@ -135,7 +139,7 @@ class OpenAIAnalyzer:
             # Prepare data for OpenAI
             emotions_data = []
             for record in records:
-                emotions = json.loads(record['emotions_data'])
+                emotions = decode_emotions(record['emotion_vector'])
                 dominant = record['dominant_emotion']
                 timestamp = record['timestamp']
                 emotions_data.append({
@@ -144,9 +148,14 @@ class OpenAIAnalyzer:
                     "emotions": emotions
                 })
             
-            # Get emotion statistics
-            stats = EmotionRecord.get_user_stats(user_id)
-            emotion_counts = {row['dominant_emotion']: row['count'] for row in stats}
+            # Get emotion statistics from the daily rollups; their end is
+            # exclusive, so a bare end date is moved to the next day
+            end_bound = end_date
+            if end_date is not None and len(end_date) == 10:
+                end_bound = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+            summary = get_emotion_summary(get_read_db(), user_id, start=start_date, end=end_bound)
+            emotion_counts = {emotion: stats['count']
+                              for emotion, stats in summary['emotions'].items() if stats['count']}
             
             # Construct prompt for report generation
             prompt = self._construct_report_prompt(emotions_data, emotion_counts, start_date, end_date)
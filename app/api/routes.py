@@ -2,8 +2,15 @@
 API routes for the facial emotion recognition application.
 """
 from flask import Blueprint, jsonify, g, request, Response, current_app, session
-from app.database.db import get_db
-from app.models.video_processor import VideoStream, active_streams
+from app.database.db import get_db, get_read_db, connect_db, database_path, storage_pragmas
+from app.database.export import EXPORT_FORMATS, EmotionExporter
+from app.database.records import get_history_page, parse_timestamp
+from app.database.writer import peek_record_writer
+from app.database.retention import peek_retention_engine
+from app.models.video_processor import active_streams, get_or_start_stream
+from app.models.admission import AdmissionRejected, get_admission_controller
+from app.models.inference_service import peek_inference_service
+from app.models.broadcast import ViewerMailbox
 import time
 import json
 import functools
@@ -58,6 +65,21 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def admission_rejected_response(error):
+    """
+    Build the response for a stream refused by the admission controller.
+    
+    Args:
+        error (AdmissionRejected): The rejection
+        
+    Returns:
+        Response: 503 JSON response with a Retry-After header
+    """
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 # FIXED: Removed duplicate route decorator
 @api_bp.route('/video_feed')
 @login_required
@@ -65,43 +87,84 @@ def video_feed():
     """
     Video streaming route for emotion recognition.
     This continuously serves MJPEG frames.
+    
+    Query parameters:
+        tier: Quality tier name (see MJPEG_QUALITY_TIERS)
+        auto: 0 to keep the tier even if the client falls behind
     """
     # Get user_id from session if authentication is required
     user_id = session.get('user_id')
     
-    # Check if a stream for this user already exists
-    from app.models.video_processor import active_streams, VideoStream
+    # Reuse the user's stream or start a new one if admission allows
+    try:
+        stream = get_or_start_stream(user_id)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     
-    if user_id and user_id in active_streams:
-        stream = active_streams[user_id]
-        # Make sure stream is running
-        if not stream.running:
-            stream.start()
-    else:
-        # Create a new stream for this user or session
-        stream = VideoStream(user_id=user_id)
-        if not stream.start():
-            return jsonify({"error": "Failed to start video stream"}), 500
+    if stream is None:
+        return jsonify({"error": "Failed to start video stream"}), 500
+    stream.touch()
+    frame_interval = current_app.config.get('MJPEG_FRAME_INTERVAL', 0.03)
+    keepalive_interval = current_app.config.get('SSE_HEARTBEAT_INTERVAL', 15.0)
+    
+    try:
+        quality = stream.create_viewer_quality(
+            request.args.get('tier'),
+            auto=None if 'auto' not in request.args else request.args.get('auto') != '0'
+        )
+    except ValueError as e:
+        return jsonify({
+            "error": str(e),
+            "tiers": [tier.name for tier in stream.quality_tiers]
+        }), 400
     
     # Define MJPEG streaming response generator
     def generate():
+        # Count this viewer so the idle reaper leaves the stream running
+        # Frames come from the viewer's own single-slot mailbox, so frames
+        # produced while a slow client is still receiving the previous one
+        # are skipped instead of queued
+        mailbox = ViewerMailbox(stream.frame_updates)
+        stream.attach_viewer(mailbox, quality)
         try:
+            first = True
             while True:
-                # Get JPEG frame
-                frame = stream.get_jpeg_frame(processed=True)
+                # Wait for a new frame; after a quiet period resend the
+                # current one to keep the connection open
+                if not first:
+                    if mailbox.take(timeout=keepalive_interval) is None and stream.frame_updates.closed:
+                        break  # Stream stopped - end the response so the client can reconnect
+                first = False
                 
-                # Yield the frame in multipart MIME format
+                # Get JPEG frame at the viewer's current tier
+                tier = quality.tier
+                frame = stream.get_jpeg_frame(processed=True, tier=tier)
+                
+                # Yield the frame in multipart MIME format; the server
+                # resumes us once it's written, so a slow client shows up
+                # as a long yield
+                send_start = time.time()
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+                quality.record_send(time.time() - send_start)
                 
-                # Small sleep to control frame rate and reduce CPU usage
-                time.sleep(0.03)  # ~30 FPS
+                # Cap the frame rate (~30 FPS by default); a slow send
+                # already used up the interval
+                interval = frame_interval
+                if tier.max_fps:
+                    interval = max(interval, 1.0 / tier.max_fps)
+                remaining = interval - (time.time() - send_start)
+                if remaining > 0:
+                    time.sleep(remaining)
                 
         except Exception as e:
             print(f"Error in video feed generator: {str(e)}")
             # Clean yield to prevent browser hanging
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
+        finally:
+            # Runs when the client disconnects and the server closes the generator
+            stream.detach_viewer(mailbox)
     
     # Return streaming response
     return Response(generate(),
@@ -118,25 +181,19 @@ def analyze_current_emotion():
     user_id = session.get('user_id')
     
     try:
-        # Get the active stream for this user
-        from app.models.video_processor import active_streams, VideoStream
-        
         # Check if there's an active stream for this user
         if user_id and user_id in active_streams:
             stream = active_streams[user_id]
+            stream.touch()
+        elif active_streams:
+            # For demo/anonymous users, use the first active stream
+            stream = next(iter(active_streams.values()))
         else:
-            # For demo/anonymous users, get the first active stream or create a new one
-            if not active_streams:
-                stream = VideoStream(user_id=user_id)
-                stream.start()
-            else:
-                stream = next(iter(active_streams.values()))
-        
-        # Get the latest processed frame to extract emotions
-        frame = stream.get_frame(processed=True)
+            # Polling never starts a stream; only video_feed/start_video do
+            stream = None
         
         # Check if emotion history exists
-        if not stream.emotion_history or not stream.emotion_history[-1]:
+        if stream is None or not stream.emotion_history or not stream.emotion_history[-1]:
             return jsonify({
                 "emotions": {
                     "angry": 0, "disgust": 0, "fear": 0, 
@@ -183,12 +240,10 @@ def performance_metrics():
     user_id = session.get('user_id')
     
     try:
-        # Get the active stream for this user
-        from app.models.video_processor import active_streams, VideoStream
-        
         # Check if there's an active stream for this user
         if user_id and user_id in active_streams:
             stream = active_streams[user_id]
+            stream.touch()
         else:
             # For demo/anonymous users, get the first active stream
             if not active_streams:
@@ -214,6 +269,77 @@ def performance_metrics():
             "error": str(e)
         })
 
+def format_sse(event, data):
+    """
+    Format a Server-Sent Events message.
+    
+    Args:
+        event (str): Event name
+        data: JSON-serialisable payload
+        
+    Returns:
+        str: The encoded event
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_bp.route('/events')
+@login_required
+def events():
+    """
+    Server-Sent Events stream of emotion results and performance metrics.
+    
+    Events are only sent when the user's stream publishes a new result;
+    results published while the client is busy are coalesced into the
+    latest one. Heartbeat comments keep idle connections open.
+    """
+    user_id = get_current_user_id()
+    heartbeat_interval = current_app.config.get('SSE_HEARTBEAT_INTERVAL', 15.0)
+    
+    def generate():
+        # Tell the browser how quickly to reconnect if the connection drops
+        yield "retry: 3000\n\n"
+        
+        stream = None
+        version = 0
+        last_sent = time.time()
+        try:
+            while True:
+                # Follow the user's current stream, which may start or stop
+                current = active_streams.get(user_id)
+                if current is not stream:
+                    if stream is not None:
+                        stream.detach_viewer()
+                    stream, version = current, 0
+                    if stream is not None:
+                        stream.attach_viewer()
+                    yield format_sse('status', {"active": stream is not None})
+                    last_sent = time.time()
+                
+                if stream is None:
+                    # No stream yet - check again shortly
+                    time.sleep(1.0)
+                    update = None
+                else:
+                    version, update = stream.updates.wait(version, timeout=heartbeat_interval)
+                
+                if update is not None:
+                    if 'emotion' in update:
+                        yield format_sse('emotion', update['emotion'])
+                    if 'metrics' in update:
+                        yield format_sse('metrics', update['metrics'])
+                    last_sent = time.time()
+                elif time.time() - last_sent >= heartbeat_interval:
+                    yield ": heartbeat\n\n"
+                    last_sent = time.time()
+        finally:
+            if stream is not None:
+                stream.detach_viewer()
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_bp.route('/start_video', methods=['POST'])
 @login_required
 def start_video():
@@ -229,9 +355,13 @@ def start_video():
     if user_id in active_streams:
         return jsonify({"message": "Video stream already running"})
     
-    # Create a new stream for this user
-    stream = VideoStream(user_id=user_id)
-    if stream.start():
+    # Create a new stream for this user if admission allows
+    try:
+        stream = get_or_start_stream(user_id)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    
+    if stream is not None:
         return jsonify({"message": "Video stream started"})
     else:
         return jsonify({"error": "Failed to start video stream"}), 500
@@ -255,4 +385,130 @@ def stop_video():
         else:
             return jsonify({"error": "Failed to stop video stream"}), 500
     else:
-        return jsonify({"message": "No active stream to stop"})
\ No newline at end of file
+        return jsonify({"message": "No active stream to stop"})
+
+@api_bp.route('/load')
+@login_required
+def load():
+    """
+    Get the current stream load of the server.
+    
+    Returns:
+        JSON: Active/maximum streams, waiting requests and admission counters,
+              plus inference, storage queue and retention statistics once started
+    """
+    load = get_admission_controller().get_load()
+    
+    # Include the shared batch inference queue once it has been started
+    service = peek_inference_service()
+    if service is not None:
+        load['inference'] = service.get_stats()
+    
+    # Same for the emotion record writer
+    writer = peek_record_writer()
+    if writer is not None:
+        load['storage'] = writer.get_stats()
+    
+    # And the results of the retention engine's recent runs
+    retention = peek_retention_engine()
+    if retention is not None:
+        load['retention'] = retention.get_stats()
+    
+    return jsonify(load)
+
+@api_bp.route('/history')
+@login_required
+def history():
+    """
+    Get a page of the user's emotion records, newest first.
+    
+    Query parameters:
+        user_id: User to read (default: the current user; others are forbidden)
+        from: Earliest timestamp, inclusive (ISO 8601)
+        to: Latest timestamp, exclusive (ISO 8601)
+        emotion: Only records with this dominant emotion
+        cursor: next_cursor of the previous page
+        limit: Records per page (default: HISTORY_PAGE_SIZE)
+        
+    Returns:
+        JSON: The page's records and the cursor of the next page (null on the last page)
+    """
+    current_user_id = get_current_user_id()
+    user_id = request.args.get('user_id', current_user_id, type=int)
+    if user_id != current_user_id:
+        return jsonify({"error": "Access to other users' history is not allowed"}), 403
+    
+    max_limit = current_app.config.get('HISTORY_MAX_PAGE_SIZE', 500)
+    limit = request.args.get('limit', current_app.config.get('HISTORY_PAGE_SIZE', 50), type=int)
+    limit = max(1, min(limit, max_limit))
+    
+    try:
+        start = parse_timestamp(request.args.get('from'))
+        end = parse_timestamp(request.args.get('to'))
+        records, next_cursor = get_history_page(
+            get_read_db(), user_id,
+            start=start,
+            end=end,
+            emotion=request.args.get('emotion') or None,
+            cursor=request.args.get('cursor') or None,
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({"records": records, "next_cursor": next_cursor})
+
+@api_bp.route('/export')
+@login_required
+def export():
+    """
+    Download the user's emotion records, streamed in constant memory.
+    
+    Query parameters:
+        user_id: User to export (default: the current user; others are forbidden)
+        from: Earliest timestamp, inclusive (ISO 8601)
+        to: Latest timestamp, exclusive (ISO 8601)
+        format: csv, ndjson or columnar (default: csv)
+        
+    Returns:
+        Response: The export as an attachment, oldest record first
+    """
+    current_user_id = get_current_user_id()
+    user_id = request.args.get('user_id', current_user_id, type=int)
+    if user_id != current_user_id:
+        return jsonify({"error": "Access to other users' history is not allowed"}), 403
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown export format: {export_format}"}), 400
+    try:
+        start = parse_timestamp(request.args.get('from'))
+        end = parse_timestamp(request.args.get('to'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # A dedicated connection, so a long export doesn't hold a pooled one
+    config = current_app.config
+    connection = connect_db(database_path(config), storage_pragmas(config), readonly=True)
+    exporter = EmotionExporter(connection, export_format, user_id, start, end,
+                               chunk_size=config.get('EXPORT_CHUNK_SIZE', 5000))
+    
+    def close_export():
+        connection.close()
+        stats = exporter.get_stats()
+        print(f"Exported {stats['rows']} emotion records for user {user_id} "
+              f"({stats['bytes'] / 1048576:.1f} MiB) in {stats['elapsed']:.1f}s "
+              f"({stats['rows_per_second']:.0f} records/s)")
+    
+    response = Response(
+        iter(exporter),
+        mimetype=exporter.mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{exporter.filename}"'}
+    )
+    # The server closes the response even if the client leaves before the
+    # body is read, which a generator's finally block wouldn't see
+    response.call_on_close(close_export)
+    return response
+
+# Register the frame ingestion routes on the API blueprint
+from app.api import emotion_recognition  # noqa: E402,F401
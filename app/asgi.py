@@ -0,0 +1,394 @@
+"""
+Asynchronous serving mode for the long-lived streaming endpoints.
+
+Under a WSGI server every MJPEG viewer (``/api/video_feed``) and every
+push subscriber (``/api/events``) holds a worker thread for as long as it
+stays connected. This module wraps the Flask application in an ASGI app
+that serves those two endpoints from the event loop instead: a connected
+client costs a socket and a small task, and only wakes up when its stream
+publishes a new frame or result. All other routes are passed through to
+Flask unchanged.
+
+Serve it with an ASGI server, e.g. ``uvicorn asgi:app``.
+"""
+import asyncio
+import contextlib
+import json
+from flask import request
+from werkzeug.test import EnvironBuilder
+
+from app.api.routes import get_current_user_id, format_sse
+from app.models.video_processor import active_streams, get_or_start_stream, cleanup_video_streams
+from app.models.admission import AdmissionRejected
+from app.models.broadcast import ViewerMailbox
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+class ChannelWatcher:
+    """
+    Wakes asyncio tasks waiting on UpdateChannels.
+
+    Each watched channel gets a single listener however many tasks are
+    waiting on it, so a publish costs one event loop callback rather than
+    one per connected client.
+    """
+
+    def __init__(self, loop):
+        """
+        Initialize the watcher.
+
+        Args:
+            loop: Event loop the waiting tasks run on
+        """
+        self.loop = loop
+        self.channels = {}  # channel -> [event, subscriber count, listener]
+
+    def subscribe(self, channel):
+        """
+        Start watching a channel on behalf of a waiting task.
+
+        Args:
+            channel (UpdateChannel): The channel to watch
+        """
+        entry = self.channels.get(channel)
+        if entry is None:
+            listener = lambda: self.loop.call_soon_threadsafe(self._wake, channel)
+            entry = self.channels[channel] = [asyncio.Event(), 0, listener]
+            channel.add_listener(listener)
+        entry[1] += 1
+
+    def unsubscribe(self, channel):
+        """
+        Stop watching a channel for a task that no longer waits on it.
+
+        Args:
+            channel (UpdateChannel): The watched channel
+        """
+        entry = self.channels[channel]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.channels[channel]
+            channel.remove_listener(entry[2])
+
+    @contextlib.contextmanager
+    def watching(self, channel):
+        """
+        Keep a channel watched for the duration of a ``with`` block.
+
+        Args:
+            channel (UpdateChannel): The channel to watch
+        """
+        self.subscribe(channel)
+        try:
+            yield
+        finally:
+            self.unsubscribe(channel)
+
+    def _wake(self, channel):
+        """Release every task waiting on a channel (runs on the event loop)."""
+        entry = self.channels.get(channel)
+        if entry is not None:
+            entry[0].set()
+            entry[0] = asyncio.Event()
+
+    async def wait(self, channel, last_version=0, timeout=None):
+        """
+        Wait for a value newer than ``last_version`` without blocking the loop.
+
+        The channel must be subscribed to first.
+
+        Args:
+            channel (UpdateChannel): The channel to wait on
+            last_version (int, optional): Version the caller has already seen (default: 0)
+            timeout (float, optional): Maximum number of seconds to wait
+
+        Returns:
+            tuple: (version, value); value is None on timeout or when the channel is closed
+        """
+        # Take the event before checking, so a publish in between still wakes us
+        event = self.channels[channel][0]
+        version, value = channel.wait(last_version, timeout=0)
+        if value is not None or channel.closed:
+            return version, value
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return channel.wait(last_version, timeout=0)
+
+class StreamingASGIApp:
+    """
+    ASGI application serving the streaming endpoints asynchronously.
+    """
+
+    def __init__(self, flask_app):
+        """
+        Initialize the application.
+
+        Args:
+            flask_app: The Flask application handling all other routes
+        """
+        if WsgiToAsgi is None:
+            raise RuntimeError("The asynchronous server mode requires the 'asgiref' package")
+
+        self.flask_app = flask_app
+        self.wsgi_app = WsgiToAsgi(flask_app)
+        self.frame_interval = flask_app.config.get('MJPEG_FRAME_INTERVAL', 0.03)
+        self.heartbeat_interval = flask_app.config.get('SSE_HEARTBEAT_INTERVAL', 15.0)
+        self.watcher = None
+
+        self.routes = {
+            '/api/video_feed': self.video_feed,
+            '/api/events': self.events,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        handler = self.routes.get(scope['path']) if scope['type'] == 'http' else None
+        if handler is None or scope['method'] != 'GET':
+            await self.wsgi_app(scope, receive, send)
+            return
+
+        if self.watcher is None:
+            self.watcher = ChannelWatcher(asyncio.get_running_loop())
+        await self._until_disconnect(receive, handler(scope, send))
+
+    async def _lifespan(self, receive, send):
+        """Handle server startup and shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, cleanup_video_streams)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _until_disconnect(self, receive, response):
+        """Run a streaming response until it finishes or the client disconnects."""
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        response_task = asyncio.ensure_future(response)
+        disconnect_task = asyncio.ensure_future(disconnected())
+        done, pending = await asyncio.wait({response_task, disconnect_task},
+                                           return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        # Let the cancelled response run its cleanup (detaching the viewer)
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        if response_task in done and response_task.exception() is not None:
+            print(f"Error in streaming response: {response_task.exception()}")
+
+    def _request_context(self, scope):
+        """Create a Flask request context from the connection's headers and cookies."""
+        builder = EnvironBuilder(
+            path=scope.get('root_path', '') + scope['path'],
+            query_string=scope.get('query_string', b'').decode('latin-1'),
+            headers=[(name.decode('latin-1'), value.decode('latin-1'))
+                     for name, value in scope.get('headers', [])],
+            environ_base={'REMOTE_ADDR': (scope.get('client') or ('', 0))[0]}
+        )
+        try:
+            return self.flask_app.request_context(builder.get_environ())
+        finally:
+            builder.close()
+
+    def _get_user_id(self, scope):
+        """Get the logged-in user from the session cookie (runs in a worker thread)."""
+        with self._request_context(scope):
+            return get_current_user_id()
+
+    def _open_stream(self, scope):
+        """
+        Get or start the user's video stream (runs in a worker thread).
+
+        Returns:
+            tuple: (stream, viewer quality, error response) where the error
+                   response is a (status, body, headers) tuple or None
+        """
+        with self._request_context(scope):
+            user_id = get_current_user_id()
+            if user_id is None:
+                return None, None, (401, {"error": "Authentication required"}, [])
+
+            try:
+                stream = get_or_start_stream(user_id)
+            except AdmissionRejected as e:
+                return None, None, (503, {"error": str(e), "retry_after": e.retry_after},
+                                    [(b'retry-after', str(e.retry_after).encode())])
+
+            if stream is None:
+                return None, None, (500, {"error": "Failed to start video stream"}, [])
+            stream.touch()
+
+            try:
+                quality = stream.create_viewer_quality(
+                    request.args.get('tier'),
+                    auto=None if 'auto' not in request.args else request.args.get('auto') != '0'
+                )
+            except ValueError as e:
+                return None, None, (400, {"error": str(e),
+                                          "tiers": [tier.name for tier in stream.quality_tiers]}, [])
+            return stream, quality, None
+
+    async def _send_json(self, send, status, body, headers=()):
+        """Send a complete JSON response."""
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')] + list(headers)
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+    async def video_feed(self, scope, send):
+        """
+        MJPEG feed of the user's processed frames.
+
+        A frame is sent whenever the stream produces a new processed frame,
+        at most once per MJPEG_FRAME_INTERVAL (or the tier's frame rate
+        cap), and repeated after a heartbeat interval without new frames to
+        keep the connection open. Accepts the same ``tier`` and ``auto``
+        query parameters as the Flask route.
+        """
+        loop = asyncio.get_running_loop()
+        stream, quality, error = await loop.run_in_executor(None, self._open_stream, scope)
+        if error is not None:
+            await self._send_json(send, *error)
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'multipart/x-mixed-replace; boundary=frame')]
+        })
+
+        # Count this viewer so the idle reaper leaves the stream running.
+        # Frames come from its single-slot mailbox, so a slow client skips
+        # to the newest frame instead of receiving stale ones
+        mailbox = ViewerMailbox(stream.frame_updates)
+        stream.attach_viewer(mailbox, quality)
+        try:
+            with self.watcher.watching(stream.frame_updates):
+                while stream.running:
+                    # JPEG encoding is CPU work - keep it off the event loop
+                    tier = quality.tier
+                    frame = await loop.run_in_executor(None, stream.get_jpeg_frame, True, tier)
+
+                    # Sends wait for the transport to drain, so a slow
+                    # client shows up as a long send
+                    send_start = loop.time()
+                    await send({
+                        'type': 'http.response.body',
+                        'body': b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n',
+                        'more_body': True
+                    })
+                    quality.record_send(loop.time() - send_start)
+
+                    interval = self.frame_interval
+                    if tier.max_fps:
+                        interval = max(interval, 1.0 / tier.max_fps)
+                    remaining = interval - (loop.time() - send_start)
+                    if remaining > 0:
+                        await asyncio.sleep(remaining)
+                    mailbox.accept(*await self.watcher.wait(stream.frame_updates, mailbox.version,
+                                                            timeout=self.heartbeat_interval))
+        finally:
+            stream.detach_viewer(mailbox)
+
+        # The stream stopped - end the response so the client can reconnect
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def events(self, scope, send):
+        """
+        Server-Sent Events stream of emotion results and performance metrics.
+
+        Same protocol as the Flask ``/api/events`` route.
+        """
+        loop = asyncio.get_running_loop()
+        user_id = await loop.run_in_executor(None, self._get_user_id, scope)
+        if user_id is None:
+            await self._send_json(send, 401, {"error": "Authentication required"})
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]
+        })
+
+        async def emit(text):
+            await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+        # Tell the browser how quickly to reconnect if the connection drops
+        await emit("retry: 3000\n\n")
+
+        stream = None
+        version = 0
+        last_sent = loop.time()
+        first = True
+        try:
+            while True:
+                # Follow the user's current stream, which may start or stop
+                current = active_streams.get(user_id)
+                if current is not stream or first:
+                    first = False
+                    if stream is not None:
+                        self.watcher.unsubscribe(stream.updates)
+                        stream.detach_viewer()
+                    stream, version = current, 0
+                    if stream is not None:
+                        stream.attach_viewer()
+                        self.watcher.subscribe(stream.updates)
+                    await emit(format_sse('status', {"active": stream is not None}))
+                    last_sent = loop.time()
+
+                if stream is None:
+                    # No stream yet - check again shortly
+                    await asyncio.sleep(1.0)
+                    update = None
+                else:
+                    version, update = await self.watcher.wait(stream.updates, version,
+                                                              timeout=self.heartbeat_interval)
+                    if update is None and stream.updates.closed:
+                        # Stopping - wait for it to leave active_streams
+                        await asyncio.sleep(0.1)
+
+                if update is not None:
+                    if 'emotion' in update:
+                        await emit(format_sse('emotion', update['emotion']))
+                    if 'metrics' in update:
+                        await emit(format_sse('metrics', update['metrics']))
+                    last_sent = loop.time()
+                elif loop.time() - last_sent >= self.heartbeat_interval:
+                    await emit(": heartbeat\n\n")
+                    last_sent = loop.time()
+        finally:
+            if stream is not None:
+                self.watcher.unsubscribe(stream.updates)
+                stream.detach_viewer()
+
+def create_asgi_app(flask_app):
+    """
+    Wrap a Flask application for serving with an ASGI server.
+
+    Args:
+        flask_app: The Flask application
+
+    Returns:
+        StreamingASGIApp: The ASGI application
+    """
+    return StreamingASGIApp(flask_app)
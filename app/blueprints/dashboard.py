@@ -3,13 +3,15 @@ Dashboard blueprint for the facial emotion recognition application.
 
 This module provides views for the user dashboard, history, and reports.
 """
-from flask import Blueprint, render_template, g, redirect, url_for, request, flash
+from flask import Blueprint, render_template, g, redirect, url_for, request, flash, current_app, session
 from app.routes import login_required
-from app.database.models import EmotionRecord
-from app.database.db import get_db
+from app.database.db import get_read_db
+from app.database.rollups import get_emotion_summary, get_emotion_timeline
 from app.factory import AppContextManager
-import json
-from datetime import datetime
+from datetime import datetime, timedelta
+
+# Emotions counted as negative in reports
+NEGATIVE_EMOTIONS = ('angry', 'disgust', 'fear', 'sad')
 
 # Create blueprint
 dashboard_bp = Blueprint('dashboard_bp', __name__, url_prefix='/dashboard')
@@ -23,57 +25,20 @@ def dashboard():
     if not user_id:
         return redirect(url_for('main_bp.login'))
     
-    # Get recent emotion records
+    # Summarise emotions from the rollups rather than the raw records
     try:
-        # Try using the SQLAlchemy method if available
-        try:
-            records = EmotionRecord.get_recent_by_user(user_id, limit=100)
-        except (AttributeError, Exception) as e:
-            # Fall back to direct database query
-            db = get_db()
-            records = db.execute(
-                'SELECT * FROM emotion_records WHERE user_id = ? ORDER BY timestamp DESC LIMIT 100',
-                (user_id,)
-            ).fetchall()
-        
-        # Process records for the template
-        emotion_stats = {}
-        emotion_history = []
-        most_common_emotion = 'neutral'
-        most_common_count = 0
-        
-        for record in records:
-            # Get emotion data
-            if hasattr(record, 'emotions_data'):
-                # SQLAlchemy model
-                emotions_data = json.loads(record.emotions_data)
-                timestamp = record.timestamp
-                dominant = record.dominant_emotion if hasattr(record, 'dominant_emotion') else 'neutral'
-            else:
-                # SQLite row
-                emotions_data = json.loads(record['emotions_data'])
-                timestamp = record['timestamp']
-                dominant = record.get('dominant_emotion', 'neutral')
-            
-            # Update stats
-            if dominant not in emotion_stats:
-                emotion_stats[dominant] = 1
-            else:
-                emotion_stats[dominant] += 1
-            
-            # Update most common emotion
-            if emotion_stats[dominant] > most_common_count:
-                most_common_emotion = dominant
-                most_common_count = emotion_stats[dominant]
-            
-            # Add to history
-            emotion_history.append({
-                'timestamp': timestamp,
-                'emotions': emotions_data
-            })
+        db = get_read_db()
+        summary = get_emotion_summary(db, user_id)
+        counts = {emotion: stats['count'] for emotion, stats in summary['emotions'].items() if stats['count']}
+        emotion_stats = dict(sorted(counts.items(), key=lambda item: -item[1]))
+        most_common_emotion = next(iter(emotion_stats), 'neutral')
+        total_records = summary['samples']
         
-        # Calculate total records
-        total_records = sum(emotion_stats.values())
+        # Mean probabilities of the latest hours with data, for the trend chart
+        emotion_history = get_emotion_timeline(
+            db, user_id, resolution='hour',
+            limit=current_app.config.get('DASHBOARD_HISTORY_BUCKETS', 24)
+        )
         
         # Generate insights and suggestions (simplified)
         insights = [
@@ -112,51 +77,11 @@ def dashboard():
 @dashboard_bp.route('/history')
 @login_required
 def history():
-    """Render the emotion history page."""
-    user_id = g.user['id'] if g.user and isinstance(g.user, dict) else session.get('user_id')
-    
-    # Get emotion records
-    try:
-        # Try using the SQLAlchemy method if available
-        try:
-            records = EmotionRecord.get_recent_by_user(user_id, limit=500)
-        except (AttributeError, Exception) as e:
-            # Fall back to direct database query
-            db = get_db()
-            records = db.execute(
-                'SELECT * FROM emotion_records WHERE user_id = ? ORDER BY timestamp DESC LIMIT 500',
-                (user_id,)
-            ).fetchall()
-        
-        # Convert records to a format suitable for the template
-        history_records = []
-        for record in records:
-            if hasattr(record, 'to_dict'):
-                # SQLAlchemy model with to_dict method
-                history_records.append(record.to_dict())
-            elif hasattr(record, 'emotions_data'):
-                # SQLAlchemy model without to_dict
-                history_records.append({
-                    'id': record.id,
-                    'timestamp': record.timestamp.isoformat() if hasattr(record.timestamp, 'isoformat') else record.timestamp,
-                    'emotions': json.loads(record.emotions_data),
-                    'dominant_emotion': record.dominant_emotion if hasattr(record, 'dominant_emotion') else 'neutral'
-                })
-            else:
-                # SQLite row
-                history_records.append({
-                    'id': record['id'],
-                    'timestamp': record['timestamp'],
-                    'emotions': json.loads(record['emotions_data']),
-                    'dominant_emotion': record.get('dominant_emotion', 'neutral')
-                })
-        
-        return render_template('history.html', records=history_records)
-    
-    except Exception as e:
-        # Log the error and show empty history
-        print(f"Error loading history data: {str(e)}")
-        return render_template('history.html', records=[])
+    """Render the emotion history page; records are loaded page by page from the history API."""
+    return render_template(
+        'history.html',
+        page_size=current_app.config.get('HISTORY_PAGE_SIZE', 50)
+    )
 
 @dashboard_bp.route('/reports')
 @login_required
@@ -214,16 +139,32 @@ def generate_report():
             end_date = now.strftime('%Y-%m-%d')
             start_date = (now - timedelta(days=365)).strftime('%Y-%m-%d')
     
-    # Generate a sample report (in a real app, this would analyze actual data)
+    # Summarise the period from the daily rollups; the end date is inclusive
+    try:
+        end_bound = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        end_bound = None
+    summary = get_emotion_summary(get_read_db(), user_id, start=start_date or None, end=end_bound)
+    
+    if summary['samples']:
+        emotions = summary['emotions']
+        dominant = max(emotions, key=lambda emotion: emotions[emotion]['count'])
+        negative_share = sum(emotions[emotion]['share'] for emotion in NEGATIVE_EMOTIONS)
+        distribution_items = [
+            f"Your dominant emotion during this period was {dominant}.",
+            f"You experienced negative emotions approximately {negative_share:.0%} of the time.",
+            f"{summary['samples']} emotion samples were analyzed."
+        ]
+    else:
+        distribution_items = ['No emotions were recorded during this period.']
+    
+    # The distribution comes from your data; the other sections are general guidance
     report = {
         'summary': 'This is a sample emotion analysis report. In a complete application, this would contain actual insights derived from your emotion data.',
         'sections': [
             {
                 'title': 'Emotion Distribution',
-                'items': [
-                    'Your dominant emotion during this period was happiness.',
-                    'You experienced negative emotions approximately 20% of the time.'
-                ]
+                'items': distribution_items
             },
             {
                 'title': 'Patterns and Triggers',
@@ -9,10 +9,19 @@ from flask import (
 )
 from app.database.db import get_db
 from app.routes import login_required
+from app.models.video_processor import active_streams
 
 # Create blueprint
 settings_bp = Blueprint('settings_bp', __name__)
 
+# Fields saved by each form on the settings page, so saving one form
+# doesn't reset the others (unchecked checkboxes aren't submitted)
+SETTINGS_SECTIONS = {
+    'preferences': ('theme', 'analysis_frequency'),
+    'privacy': ('privacy_mode',),
+    'notifications': ('notification_enabled',),
+}
+
 @settings_bp.route('/')
 @login_required
 def settings():
@@ -59,22 +68,32 @@ def update_settings():
     user_id = session.get('user_id')
     
     # Get form data
-    theme = request.form.get('theme', 'light')
-    notification_enabled = 'notification_enabled' in request.form
-    privacy_mode = 'privacy_mode' in request.form
-    analysis_frequency = request.form.get('analysis_frequency', 5, type=int)
+    values = {
+        'theme': request.form.get('theme', 'light'),
+        'notification_enabled': 'notification_enabled' in request.form,
+        'privacy_mode': 'privacy_mode' in request.form,
+        'analysis_frequency': request.form.get('analysis_frequency', 5, type=int)
+    }
+    
+    # Only save the fields of the submitted form (all of them if unknown)
+    fields = SETTINGS_SECTIONS.get(request.form.get('section'), tuple(values))
     
     try:
         # Update settings in database
         db = get_db()
+        assignments = ', '.join(f'{field} = ?' for field in fields)
         db.execute(
-            'UPDATE settings SET theme = ?, notification_enabled = ?, '
-            'privacy_mode = ?, analysis_frequency = ?, updated_at = CURRENT_TIMESTAMP '
+            f'UPDATE settings SET {assignments}, updated_at = CURRENT_TIMESTAMP '
             'WHERE user_id = ?',
-            (theme, notification_enabled, privacy_mode, analysis_frequency, user_id)
+            [values[field] for field in fields] + [user_id]
         )
         db.commit()
         
+        # Apply the changes to the user's running video stream
+        stream = active_streams.get(user_id)
+        if stream is not None:
+            stream.apply_settings({field: values[field] for field in fields})
+        
         flash('Settings updated successfully.')
     except Exception as e:
         flash(f'Error updating settings: {str(e)}')
@@ -11,6 +11,23 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///instance/facial_emotion.db')
     
+    # SQLite storage profile (see app.database.db): journal and sync mode,
+    # page cache and memory map sizes, how long to wait on a locked
+    # database, and the read-write and read-only connection pools
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+    DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', '8'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5.0'))
+    
+    # Schema migrations (see app.database.migrations): apply pending ones
+    # at startup, and the slow online ones in the background after it
+    DB_MIGRATE_ON_STARTUP = os.getenv('DB_MIGRATE_ON_STARTUP', 'true').lower() == 'true'
+    DB_ONLINE_MIGRATIONS = os.getenv('DB_ONLINE_MIGRATIONS', 'true').lower() == 'true'
+    
     # Model paths
     MODEL_PATH = os.getenv('MODEL_PATH', 'emotion_model_final.keras')
     MODEL_PATHS = [
@@ -34,16 +51,141 @@ class Config:
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     
     # Video settings
+    # Default frame source for new streams: a camera index or a source
+    # specification such as "file:/path/video.mp4", "images:/path/dir",
+    # "synthetic:0" or "rtsp://host/stream" (see app.models.frame_sources).
+    # Unset means the stream's own camera_id.
+    FRAME_SOURCE = os.getenv('FRAME_SOURCE')
     FRAME_INTERVAL = float(os.getenv('FRAME_INTERVAL', '0.1'))
     STORAGE_INTERVAL = float(os.getenv('STORAGE_INTERVAL', '2.0'))
     MAX_CONCURRENT_USERS = int(os.getenv('MAX_CONCURRENT_USERS', '10'))
     
+    # Admission control: streams per user, how long a request may queue for
+    # a free slot and the Retry-After hint sent when it is rejected
+    MAX_STREAMS_PER_USER = int(os.getenv('MAX_STREAMS_PER_USER', '1'))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '5.0'))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '10'))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '10'))
+    
+    # Frames pushed by browsers: per-client rate limit and maximum body size
+    INGEST_MAX_FPS = float(os.getenv('INGEST_MAX_FPS', '10'))
+    INGEST_BURST = int(os.getenv('INGEST_BURST', '5'))
+    INGEST_MAX_FRAME_BYTES = int(os.getenv('INGEST_MAX_FRAME_BYTES', str(4 * 1024 * 1024)))
+    INGEST_TIMEOUT = float(os.getenv('INGEST_TIMEOUT', '5.0'))
+    
+    # Shared batch inference: faces per batch, how long to wait for a batch
+    # to fill and how many requests may be queued
+    INFERENCE_BATCH_SIZE = int(os.getenv('INFERENCE_BATCH_SIZE', '32'))
+    INFERENCE_BATCH_WAIT = float(os.getenv('INFERENCE_BATCH_WAIT', '0.01'))
+    INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', '256'))
+    
+    # Fair-share scheduling of detection and inference: worker threads
+    # (unset means one per budgeted core), weight of interactive (viewed)
+    # and background work, and how long a stream waits for its turn
+    INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0')) or None
+    INTERACTIVE_PRIORITY_WEIGHT = float(os.getenv('INTERACTIVE_PRIORITY_WEIGHT', '4.0'))
+    BACKGROUND_PRIORITY_WEIGHT = float(os.getenv('BACKGROUND_PRIORITY_WEIGHT', '1.0'))
+    INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', '5.0'))
+    
+    # CPU budget (see app.models.cpu_budget): cores OpenCV and TensorFlow
+    # may use in total (unset means all available), an optional CPU list
+    # to confine the process to (e.g. "0-3"), whether to pin each worker
+    # to its own slice of it (Linux only), and per-library thread overrides
+    CPU_CORE_BUDGET = int(os.getenv('CPU_CORE_BUDGET', '0')) or None
+    CPU_SET = os.getenv('CPU_SET')
+    CPU_PIN_WORKERS = os.getenv('CPU_PIN_WORKERS', 'false').lower() == 'true'
+    OPENCV_THREADS = int(os.getenv('OPENCV_THREADS', '0')) or None
+    TF_INTRA_OP_THREADS = int(os.getenv('TF_INTRA_OP_THREADS', '0')) or None
+    TF_INTER_OP_THREADS = int(os.getenv('TF_INTER_OP_THREADS', '0')) or None
+    
+    # Write-behind storage of emotion records: records per transaction,
+    # longest wait before a partial batch is written, and pending records
+    # beyond which new ones are dropped
+    RECORD_BATCH_SIZE = int(os.getenv('RECORD_BATCH_SIZE', '100'))
+    RECORD_FLUSH_INTERVAL = float(os.getenv('RECORD_FLUSH_INTERVAL', '1.0'))
+    RECORD_QUEUE_SIZE = int(os.getenv('RECORD_QUEUE_SIZE', '10000'))
+    
+    # Hourly rollup buckets shown on the dashboard's trend chart
+    DASHBOARD_HISTORY_BUCKETS = int(os.getenv('DASHBOARD_HISTORY_BUCKETS', '24'))
+    
+    # Retention of emotion data: days raw records are kept (their rollups
+    # remain; raw records go a whole day at a time), then days minute and
+    # hour rollups are kept; 0 keeps forever.
+    # Pruning runs every RETENTION_INTERVAL seconds, deleting
+    # RETENTION_BATCH_SIZE rows per transaction with a pause in between
+    RETENTION_ENABLED = os.getenv('RETENTION_ENABLED', 'true').lower() == 'true'
+    RETENTION_RAW_DAYS = int(os.getenv('RETENTION_RAW_DAYS', '30'))
+    RETENTION_MINUTE_ROLLUP_DAYS = int(os.getenv('RETENTION_MINUTE_ROLLUP_DAYS', '90'))
+    RETENTION_HOUR_ROLLUP_DAYS = int(os.getenv('RETENTION_HOUR_ROLLUP_DAYS', '0'))
+    RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', '3600'))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '2000'))
+    RETENTION_BATCH_PAUSE = float(os.getenv('RETENTION_BATCH_PAUSE', '0.05'))
+    # Pages returned to the filesystem per incremental vacuum step
+    RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', '1000'))
+    
+    # Records per page of the history API, by default and at most
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '50'))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '500'))
+    
+    # Records read and encoded at a time by streaming exports
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '5000'))
+    
+    # Streams without viewers or API polls for this long are stopped
+    STREAM_IDLE_TIMEOUT = float(os.getenv('STREAM_IDLE_TIMEOUT', '60.0'))
+    STREAM_REAPER_INTERVAL = float(os.getenv('STREAM_REAPER_INTERVAL', '10.0'))
+    
     # Performance settings
     MAX_INFERENCE_TIME = float(os.getenv('MAX_INFERENCE_TIME', '0.5'))
     
+    # Adaptive frame interval: under load each stream's FRAME_INTERVAL is
+    # lengthened, up to MAX_FRAME_INTERVAL, to hold the CPU and p95 latency
+    # targets. It never gets shorter than FRAME_INTERVAL, or than
+    # MIN_FRAME_INTERVAL if that is longer.
+    ADAPTIVE_FRAME_INTERVAL = os.getenv('ADAPTIVE_FRAME_INTERVAL', 'true').lower() == 'true'
+    MIN_FRAME_INTERVAL = float(os.getenv('MIN_FRAME_INTERVAL', '0.05'))
+    MAX_FRAME_INTERVAL = float(os.getenv('MAX_FRAME_INTERVAL', '1.0'))
+    TARGET_CPU_UTILIZATION = float(os.getenv('TARGET_CPU_UTILIZATION', '0.75'))
+    TARGET_P95_LATENCY = float(os.getenv('TARGET_P95_LATENCY', str(MAX_INFERENCE_TIME)))
+    RATE_ADJUST_PERIOD = float(os.getenv('RATE_ADJUST_PERIOD', '2.0'))
+    ADAPTIVE_DETECTION_RESOLUTION = os.getenv('ADAPTIVE_DETECTION_RESOLUTION', 'false').lower() == 'true'
+    
+    # Degradation ladder (see app.models.degradation): steps taken in order
+    # while the process stays overloaded - CPU or p95 processing time above
+    # the HIGH thresholds for ESCALATE_AFTER seconds per step - and undone
+    # in reverse once both stay below the LOW thresholds for RECOVER_AFTER
+    DEGRADATION_ENABLED = os.getenv('DEGRADATION_ENABLED', 'true').lower() == 'true'
+    DEGRADATION_STEPS = os.getenv('DEGRADATION_STEPS',
+                                  'haar_detector,low_resolution,long_interval,primary_face,no_overlay')
+    DEGRADATION_CPU_HIGH = float(os.getenv('DEGRADATION_CPU_HIGH', '0.9'))
+    DEGRADATION_CPU_LOW = float(os.getenv('DEGRADATION_CPU_LOW', '0.6'))
+    DEGRADATION_LATENCY_HIGH = float(os.getenv('DEGRADATION_LATENCY_HIGH', str(MAX_INFERENCE_TIME * 2)))
+    DEGRADATION_LATENCY_LOW = float(os.getenv('DEGRADATION_LATENCY_LOW', str(MAX_INFERENCE_TIME)))
+    DEGRADATION_ESCALATE_AFTER = float(os.getenv('DEGRADATION_ESCALATE_AFTER', '3.0'))
+    DEGRADATION_RECOVER_AFTER = float(os.getenv('DEGRADATION_RECOVER_AFTER', '15.0'))
+    DEGRADED_DETECTION_SCALE = float(os.getenv('DEGRADED_DETECTION_SCALE', '0.5'))
+    DEGRADED_INTERVAL_FACTOR = float(os.getenv('DEGRADED_INTERVAL_FACTOR', '2.0'))
+    
     # UI settings
     UI_UPDATE_INTERVAL = int(os.getenv('UI_UPDATE_INTERVAL', '100'))
     
+    # Push channel (/api/events): seconds between metrics updates and
+    # between heartbeats on otherwise idle connections
+    METRICS_PUSH_INTERVAL = float(os.getenv('METRICS_PUSH_INTERVAL', '1.0'))
+    SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', '15.0'))
+    
+    # MJPEG feed: minimum seconds between frames sent to a viewer
+    MJPEG_FRAME_INTERVAL = float(os.getenv('MJPEG_FRAME_INTERVAL', '0.03'))
+    
+    # MJPEG quality tiers, best first, as name:max_width:quality[:max_fps]
+    # (see app.models.stream_quality). Viewers pick one with ?tier= and
+    # are stepped down while sending a frame takes over
+    # MJPEG_SLOW_SEND_TIME seconds.
+    MJPEG_QUALITY_TIERS = os.getenv('MJPEG_QUALITY_TIERS',
+                                    'high:640:85,medium:480:70,low:320:50,thumbnail:160:40:2')
+    MJPEG_DEFAULT_TIER = os.getenv('MJPEG_DEFAULT_TIER', 'high')
+    MJPEG_AUTO_DOWNGRADE = os.getenv('MJPEG_AUTO_DOWNGRADE', 'true').lower() == 'true'
+    MJPEG_SLOW_SEND_TIME = float(os.getenv('MJPEG_SLOW_SEND_TIME', '0.1'))
+    
     # Confidence threshold for emotion predictions
     EMOTION_CONFIDENCE_THRESHOLD = float(os.getenv('EMOTION_CONFIDENCE_THRESHOLD', '0.4'))
     
@@ -70,6 +212,8 @@ class TestingConfig(Config):
     DATABASE_URI = 'sqlite:///:memory:'
     # Use mock data for testing
     MOCK_EMOTION_DATA = True
+    # No background pruning of test data
+    RETENTION_ENABLED = False
 
 class ProductionConfig(Config):
     """Production configuration."""
@@ -1,41 +1,275 @@
 """
 Database connection and initialization module.
+
+Connections are tuned for concurrent use (WAL journal, relaxed syncing,
+larger page cache, memory-mapped reads, a busy timeout) and pooled per
+database file. Request code gets a read-write connection from
+``get_db()`` and a read-only one from ``get_read_db()``; in WAL mode
+readers see a consistent snapshot and are never blocked by the video
+threads' writes, nor block them.
 """
+import queue
 import sqlite3
-import os
+import threading
+from contextlib import contextmanager
 import click
 from flask import current_app, g
 from flask.cli import with_appcontext
 
+# In-memory database shared by every connection of the process, for as
+# long as one of them is open
+MEMORY_DATABASE_URI = 'file::memory:?cache=shared'
+
+def storage_pragmas(config):
+    """
+    Get the PRAGMA settings applied to new connections.
+
+    Args:
+        config: Flask config mapping
+
+    Returns:
+        dict: PRAGMA names and values
+    """
+    return {
+        'journal_mode': config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        # Negative sizes are in KiB
+        'cache_size': -config.get('SQLITE_CACHE_SIZE_KB', 16384),
+        'mmap_size': config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'busy_timeout': config.get('SQLITE_BUSY_TIMEOUT', 5000),
+        'temp_store': 'MEMORY'
+    }
+
+def database_path(config):
+    """
+    Get the SQLite file path from the DATABASE_URI setting.
+
+    Args:
+        config: Flask config mapping
+
+    Returns:
+        str: Database file path
+    """
+    return config['DATABASE_URI'].replace('sqlite:///', '')
+
+def connect_db(path, pragmas=None, readonly=False):
+    """
+    Open a tuned database connection.
+
+    Args:
+        path (str): Database file path
+        pragmas (dict, optional): PRAGMA settings to apply (see storage_pragmas)
+        readonly (bool, optional): Reject writes on this connection (default: False)
+
+    Returns:
+        sqlite3.Connection: Connection with row factory set to sqlite3.Row
+    """
+    # Each plain ':memory:' connection would get its own empty database;
+    # a shared cache lets the pools and the record writer see one
+    uri = path == ':memory:'
+    if uri:
+        path = MEMORY_DATABASE_URI
+    # Pooled connections move between request threads, one at a time
+    connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                 check_same_thread=False, uri=uri)
+    connection.row_factory = sqlite3.Row
+    for name, value in (pragmas or {}).items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    if readonly:
+        connection.execute("PRAGMA query_only = ON")
+    return connection
+
+class ConnectionPool:
+    """
+    Bounded pool of reusable connections to one database file.
+
+    Connections are opened on demand up to ``size``; beyond that callers
+    wait for one to be released.
+    """
+
+    def __init__(self, path, size=4, pragmas=None, readonly=False, timeout=5.0):
+        """
+        Initialize the pool.
+
+        Args:
+            path (str): Database file path
+            size (int, optional): Maximum number of connections (default: 4)
+            pragmas (dict, optional): PRAGMA settings for new connections
+            readonly (bool, optional): Open read-only connections (default: False)
+            timeout (float, optional): Seconds to wait for a free connection (default: 5)
+        """
+        self.path = path
+        self.size = max(1, size)
+        self.pragmas = pragmas
+        self.readonly = readonly
+        self.timeout = timeout
+
+        # Most recently used first, so warm connections are reused
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def acquire(self):
+        """
+        Take a connection from the pool.
+
+        Returns:
+            sqlite3.Connection: A connection for the caller's exclusive use
+
+        Raises:
+            sqlite3.OperationalError: If no connection became free in time
+        """
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            can_open = self.opened < self.size
+            if can_open:
+                self.opened += 1
+        if can_open:
+            try:
+                return connect_db(self.path, self.pragmas, self.readonly)
+            except sqlite3.Error:
+                with self.lock:
+                    self.opened -= 1
+                raise
+
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+
+    def release(self, connection):
+        """
+        Return a connection to the pool, rolling back anything left uncommitted.
+
+        Args:
+            connection (sqlite3.Connection): Connection taken with acquire()
+        """
+        try:
+            connection.rollback()
+        except sqlite3.Error:
+            # Broken connection - drop it so a fresh one can be opened
+            connection.close()
+            with self.lock:
+                self.opened -= 1
+            return
+        self.idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        """Context manager lending a connection for the duration of a block."""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self.lock:
+                self.opened -= 1
+
+    def get_stats(self):
+        """
+        Get pool usage.
+
+        Returns:
+            dict: Maximum, open and idle connection counts
+        """
+        return {'size': self.size, 'open': self.opened, 'idle': self.idle.qsize()}
+
+# Pools per (database path, read-only)
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(readonly=False):
+    """
+    Get the connection pool for the current app's database.
+
+    Args:
+        readonly (bool, optional): Get the read-only pool (default: False)
+
+    Returns:
+        ConnectionPool: The pool
+    """
+    config = current_app.config
+    path = database_path(config)
+    with _pools_lock:
+        pool = _pools.get((path, readonly))
+        if pool is None:
+            size_key = 'DB_READ_POOL_SIZE' if readonly else 'DB_POOL_SIZE'
+            pool = ConnectionPool(
+                path,
+                size=config.get(size_key, 8 if readonly else 4),
+                pragmas=storage_pragmas(config),
+                readonly=readonly,
+                timeout=config.get('DB_POOL_TIMEOUT', 5.0)
+            )
+            _pools[(path, readonly)] = pool
+        return pool
+
 def get_db():
     """
-    Get a database connection.
+    Get a read-write database connection for the current app context.
     
     Returns:
-        sqlite3.Connection: Database connection with row factory set to sqlite3.Row
+        sqlite3.Connection: Pooled connection with row factory set to sqlite3.Row
     """
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE_URI'].replace('sqlite:///', ''),
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        g.db_pool = get_pool()
+        g.db = g.db_pool.acquire()
     
     return g.db
 
-def init_db():
-    """Initialize the database by executing schema.sql."""
-    db = get_db()
+def get_read_db():
+    """
+    Get a read-only database connection for the current app context.
+    
+    Use this for queries that don't write (dashboards, history), so they
+    don't hold one of the read-write connections.
+    
+    Returns:
+        sqlite3.Connection: Pooled read-only connection
+    """
+    if 'read_db' not in g:
+        g.read_db_pool = get_pool(readonly=True)
+        g.read_db = g.read_db_pool.acquire()
     
-    # Get the path to the schema file
-    schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
+    return g.read_db
+
+def close_db(e=None):
+    """Return the app context's connections to their pools."""
+    db = g.pop('db', None)
+    if db is not None:
+        g.pop('db_pool').release(db)
     
-    # Execute the schema file
-    with open(schema_path, 'r') as f:
-        db.executescript(f.read())
+    read_db = g.pop('read_db', None)
+    if read_db is not None:
+        g.pop('read_db_pool').release(read_db)
+
+def init_db():
+    """Clear the database and create the current schema."""
+    from app.database.migrations import create_schema
+
+    db = get_db()
     
-    # Commit the changes
+    # Drop every table, including ones from older schemas
+    tables = [row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        db.execute(f'DROP TABLE IF EXISTS "{table}"')
     db.commit()
+    
+    create_schema(db)
 
 @click.command('init-db')
 @with_appcontext
@@ -46,4 +280,17 @@ def init_db_command():
 
 def register_db_commands(app):
     """Register database commands with the Flask application."""
-    app.cli.add_command(init_db_command)
\ No newline at end of file
+    from app.database.emotion_vectors import migrate_emotion_vectors_command
+    from app.database.rollups import rebuild_rollups_command
+    from app.database.retention import prune_emotion_data_command
+    from app.database.export import export_emotions_command
+    from app.database.synthetic import generate_emotion_data_command
+    from app.database.migrations import migrate_db_command
+    
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
+    app.cli.add_command(migrate_emotion_vectors_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(prune_emotion_data_command)
+    app.cli.add_command(export_emotions_command)
+    app.cli.add_command(generate_emotion_data_command)
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Compact storage of emotion probability vectors.
+
+Each emotion record stores its seven probabilities as a 28-byte blob of
+little-endian float32 values in EMOTION_LABELS order, instead of a JSON
+object. Rows decode without parsing, and a whole range of records loads
+straight into one NumPy array.
+"""
+import json
+import numpy as np
+import click
+from flask.cli import with_appcontext
+
+# Storage order of the probabilities. This is part of the on-disk format:
+# it matches the model's output classes and must not be reordered.
+EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise')
+VECTOR_DTYPE = np.dtype('<f4')
+VECTOR_SIZE = len(EMOTION_LABELS) * VECTOR_DTYPE.itemsize
+
+def encode_emotions(emotions):
+    """
+    Pack emotion probabilities into a blob.
+
+    Args:
+        emotions (dict): Emotion names mapped to probabilities; missing
+                         emotions are stored as 0
+
+    Returns:
+        bytes: VECTOR_SIZE bytes
+    """
+    return np.array([emotions.get(label, 0.0) for label in EMOTION_LABELS],
+                    dtype=VECTOR_DTYPE).tobytes()
+
+def decode_emotions(blob):
+    """
+    Unpack a blob into emotion probabilities.
+
+    Args:
+        blob (bytes): Blob written by encode_emotions
+
+    Returns:
+        dict: Emotion names mapped to probabilities
+    """
+    return dict(zip(EMOTION_LABELS, np.frombuffer(blob, dtype=VECTOR_DTYPE).tolist()))
+
+def dominant_emotion(emotions):
+    """
+    Get the most likely emotion and its probability.
+
+    Args:
+        emotions (dict): Emotion names mapped to probabilities
+
+    Returns:
+        tuple: (emotion name, probability), ('neutral', 0.0) if empty
+    """
+    if not emotions:
+        return ('neutral', 0.0)
+    label = max(emotions, key=emotions.get)
+    return (label, float(emotions[label]))
+
+def decode_matrix(blobs):
+    """
+    Unpack many blobs at once.
+
+    Args:
+        blobs (list): Blobs written by encode_emotions
+
+    Returns:
+        numpy.ndarray: float32 array of shape (len(blobs), len(EMOTION_LABELS))
+    """
+    return np.frombuffer(b''.join(blobs), dtype=VECTOR_DTYPE).reshape(-1, len(EMOTION_LABELS))
+
+def load_emotion_range(db, user_id, start=None, end=None):
+    """
+    Load a user's emotion records in a time range as an array.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        user_id (int): User ID
+        start (str or datetime, optional): Earliest timestamp, inclusive
+        end (str or datetime, optional): Latest timestamp, exclusive
+
+    Returns:
+        tuple: (list of timestamps, float32 array of shape (n, len(EMOTION_LABELS))),
+               oldest first
+    """
+    query = 'SELECT timestamp, emotion_vector FROM emotion_records WHERE user_id = ?'
+    params = [user_id]
+    if start is not None:
+        query += ' AND timestamp >= ?'
+        params.append(str(start))
+    if end is not None:
+        query += ' AND timestamp < ?'
+        params.append(str(end))
+    query += ' ORDER BY timestamp'
+
+    rows = db.execute(query, params).fetchall()
+    return [row[0] for row in rows], decode_matrix([row[1] for row in rows])
+
+def _parse_json(emotions_data):
+    """Parse a legacy JSON column value, treating malformed values as empty."""
+    try:
+        return json.loads(emotions_data)
+    except (TypeError, ValueError):
+        return {}
+
+def _register_functions(db):
+    """Register the SQL functions used by the migrations on a connection."""
+    db.create_function('vector_from_json', 1,
+                       lambda data: encode_emotions(_parse_json(data)), deterministic=True)
+    db.create_function('dominant_from_json', 1,
+                       lambda data: dominant_emotion(_parse_json(data))[0], deterministic=True)
+    db.create_function('confidence_from_json', 1,
+                       lambda data: dominant_emotion(_parse_json(data))[1], deterministic=True)
+    db.create_function('dominant_from_vector', 1,
+                       lambda blob: dominant_emotion(decode_emotions(blob))[0], deterministic=True)
+    db.create_function('confidence_from_vector', 1,
+                       lambda blob: dominant_emotion(decode_emotions(blob))[1], deterministic=True)
+
+# Indexes of emotion_records, recreated by the migrations
+EMOTION_RECORD_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_emotion_records_user_time '
+    'ON emotion_records (user_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_emotion_records_user_dominant '
+    'ON emotion_records (user_id, dominant_emotion, timestamp)',
+)
+
+def migrate_emotions_data(db):
+    """
+    Convert a legacy ``emotions_data`` JSON column to ``emotion_vector`` blobs.
+
+    SQLite can't change a column's type in place, so the table is rebuilt
+    in one transaction, keeping IDs and timestamps. The dominant emotion
+    and its confidence are derived from the probabilities on the way.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+
+    Returns:
+        int: Number of records converted, or 0 if there was nothing to migrate
+    """
+    columns = [row[1] for row in db.execute('PRAGMA table_info(emotion_records)')]
+    if 'emotions_data' not in columns:
+        return 0
+
+    _register_functions(db)
+    db.execute('BEGIN')
+    try:
+        db.execute('''
+            CREATE TABLE emotion_records_migrated (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                emotion_vector BLOB NOT NULL,
+                dominant_emotion TEXT NOT NULL DEFAULT 'neutral',
+                confidence REAL NOT NULL DEFAULT 0,
+                timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        count = db.execute('''
+            INSERT INTO emotion_records_migrated
+                (id, user_id, emotion_vector, dominant_emotion, confidence, timestamp)
+            SELECT id, user_id, vector_from_json(emotions_data), dominant_from_json(emotions_data),
+                   confidence_from_json(emotions_data), timestamp
+            FROM emotion_records
+        ''').rowcount
+        db.execute('DROP TABLE emotion_records')
+        db.execute('ALTER TABLE emotion_records_migrated RENAME TO emotion_records')
+        for statement in EMOTION_RECORD_INDEXES:
+            db.execute(statement)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return count
+
+def migrate_dominant_emotions(db):
+    """
+    Add and fill the ``confidence`` column of vector-format emotion records.
+
+    Records written before the dominant emotion was stored all say
+    'neutral'; they get the label and confidence derived from their
+    probabilities, and the (user, time) and (user, emotion, time) indexes
+    replace the single-column user index.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+
+    Returns:
+        int: Number of records updated, or 0 if there was nothing to migrate
+    """
+    columns = [row[1] for row in db.execute('PRAGMA table_info(emotion_records)')]
+    if 'confidence' in columns or 'emotion_vector' not in columns:
+        return 0
+
+    _register_functions(db)
+    db.execute('BEGIN')
+    try:
+        db.execute('ALTER TABLE emotion_records ADD COLUMN confidence REAL NOT NULL DEFAULT 0')
+        count = db.execute('''
+            UPDATE emotion_records
+            SET dominant_emotion = dominant_from_vector(emotion_vector),
+                confidence = confidence_from_vector(emotion_vector)
+        ''').rowcount
+        db.execute('DROP INDEX IF EXISTS idx_emotion_records_user_id')
+        for statement in EMOTION_RECORD_INDEXES:
+            db.execute(statement)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return count
+
+@click.command('migrate-emotion-vectors')
+@with_appcontext
+def migrate_emotion_vectors_command():
+    """Convert emotion records to float32 vectors with stored dominant emotions."""
+    from app.database.db import get_db
+
+    db = get_db()
+    count = migrate_emotions_data(db)
+    count += migrate_dominant_emotions(db)
+    click.echo(f'Migrated {count} emotion records.')
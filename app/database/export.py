@@ -0,0 +1,280 @@
+"""
+Streaming export of emotion records.
+
+Records are read through one SQLite cursor in chunks and encoded chunk by
+chunk, so an export of millions of rows uses the same memory as one of a
+hundred. Three formats are supported:
+
+- ``csv``: one row per record, probabilities in EMOTION_LABELS columns
+- ``ndjson``: one JSON object per line
+- ``columnar``: a compact binary layout for analysis tools, read back with
+  read_columnar. After the magic bytes and a JSON header line, each chunk
+  is a little-endian uint32 row count followed by the columns of that
+  many rows, in the header's order; a zero count ends the stream.
+"""
+import csv
+import io
+import json
+import struct
+import time
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.database.emotion_vectors import EMOTION_LABELS, VECTOR_DTYPE, decode_matrix
+from app.database.records import parse_timestamp
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'columnar': ('application/octet-stream', 'emocol')
+}
+
+COLUMNAR_MAGIC = b'EMOCOL1\n'
+
+# Columns of the columnar format: name, dtype and values per row.
+# timestamp is microseconds since the Unix epoch (UTC); dominant_emotion
+# is an index into EMOTION_LABELS.
+COLUMNAR_COLUMNS = (
+    ('id', '<i8', 1),
+    ('user_id', '<i8', 1),
+    ('timestamp', '<i8', 1),
+    ('dominant_emotion', '|u1', 1),
+    ('confidence', '<f4', 1),
+    ('emotions', VECTOR_DTYPE.str, len(EMOTION_LABELS))
+)
+
+_LABEL_INDEX = {label: i for i, label in enumerate(EMOTION_LABELS)}
+
+class EmotionExporter:
+    """Iterable of the encoded chunks of an emotion record export."""
+
+    def __init__(self, connection, export_format='csv', user_id=None, start=None, end=None,
+                 chunk_size=5000):
+        """
+        Initialize the export.
+
+        Args:
+            connection (sqlite3.Connection): Database connection, used by one
+                                             cursor for the whole export
+            export_format (str, optional): Key of EXPORT_FORMATS (default: 'csv')
+            user_id (int, optional): Only this user's records (default: all users)
+            start (str or datetime, optional): Earliest timestamp, inclusive
+            end (str or datetime, optional): Latest timestamp, exclusive
+            chunk_size (int, optional): Records read and encoded at a time (default: 5000)
+
+        Raises:
+            ValueError: If the format is unknown
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+
+        self.connection = connection
+        self.export_format = export_format
+        self.user_id = user_id
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+
+        # Statistics
+        self.rows = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+
+    @property
+    def mimetype(self):
+        """str: MIME type of the export."""
+        return EXPORT_FORMATS[self.export_format][0]
+
+    @property
+    def filename(self):
+        """str: Suggested file name of the export."""
+        name = f'emotions-user{self.user_id}' if self.user_id is not None else 'emotions'
+        return f'{name}.{EXPORT_FORMATS[self.export_format][1]}'
+
+    def _chunks(self):
+        """Yield lists of record rows, oldest first, from a single cursor."""
+        query = ('SELECT id, user_id, CAST(timestamp AS TEXT), dominant_emotion, confidence, emotion_vector '
+                 'FROM emotion_records')
+        conditions, params = [], []
+        if self.user_id is not None:
+            conditions.append('user_id = ?')
+            params.append(self.user_id)
+        if self.start is not None:
+            conditions.append('timestamp >= ?')
+            params.append(str(self.start))
+        if self.end is not None:
+            conditions.append('timestamp < ?')
+            params.append(str(self.end))
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp, id'
+
+        cursor = self.connection.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def __iter__(self):
+        """Yield the export as bytes, one encoded chunk at a time."""
+        encode = getattr(self, f'_encode_{self.export_format}')
+        start_time = time.time()
+        try:
+            header = self._header()
+            if header:
+                self.bytes += len(header)
+                yield header
+            for rows in self._chunks():
+                data = encode(rows)
+                self.rows += len(rows)
+                self.bytes += len(data)
+                yield data
+            footer = self._footer()
+            if footer:
+                self.bytes += len(footer)
+                yield footer
+        finally:
+            self.elapsed = time.time() - start_time
+
+    def _header(self):
+        """Get the bytes preceding the first chunk."""
+        if self.export_format == 'csv':
+            return self._csv_lines([['id', 'user_id', 'timestamp', 'dominant_emotion', 'confidence',
+                                     *EMOTION_LABELS]])
+        if self.export_format == 'columnar':
+            header = {
+                'labels': list(EMOTION_LABELS),
+                'columns': [{'name': name, 'dtype': dtype, 'width': width}
+                            for name, dtype, width in COLUMNAR_COLUMNS]
+            }
+            return COLUMNAR_MAGIC + json.dumps(header).encode() + b'\n'
+        return b''
+
+    def _footer(self):
+        """Get the bytes following the last chunk."""
+        return struct.pack('<I', 0) if self.export_format == 'columnar' else b''
+
+    @staticmethod
+    def _csv_lines(rows):
+        """Encode rows as CSV lines."""
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        return buffer.getvalue().encode()
+
+    def _encode_csv(self, rows):
+        """Encode a chunk as CSV."""
+        matrix = decode_matrix([row[5] for row in rows])
+        return self._csv_lines(
+            [row[0], row[1], row[2], row[3], f'{row[4]:.6g}', *(f'{value:.6g}' for value in probabilities)]
+            for row, probabilities in zip(rows, matrix.tolist())
+        )
+
+    def _encode_ndjson(self, rows):
+        """Encode a chunk as newline-delimited JSON."""
+        matrix = decode_matrix([row[5] for row in rows])
+        return ''.join(
+            json.dumps({
+                'id': row[0],
+                'user_id': row[1],
+                'timestamp': row[2],
+                'dominant_emotion': row[3],
+                'confidence': row[4],
+                'emotions': dict(zip(EMOTION_LABELS, probabilities))
+            }) + '\n'
+            for row, probabilities in zip(rows, matrix.tolist())
+        ).encode()
+
+    def _encode_columnar(self, rows):
+        """Encode a chunk as columns."""
+        columns = (
+            np.array([row[0] for row in rows], dtype='<i8'),
+            np.array([row[1] for row in rows], dtype='<i8'),
+            np.array([row[2] for row in rows], dtype='datetime64[us]').astype('<i8'),
+            np.array([_LABEL_INDEX.get(row[3], _LABEL_INDEX['neutral']) for row in rows], dtype='|u1'),
+            np.array([row[4] for row in rows], dtype='<f4'),
+            decode_matrix([row[5] for row in rows])
+        )
+        return struct.pack('<I', len(rows)) + b''.join(column.tobytes() for column in columns)
+
+    def get_stats(self):
+        """
+        Get the size and throughput of the export so far.
+
+        Returns:
+            dict: Rows and bytes written, elapsed seconds and rows per second
+        """
+        return {
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'elapsed': self.elapsed,
+            'rows_per_second': self.rows / self.elapsed if self.elapsed else 0.0
+        }
+
+def read_columnar(stream):
+    """
+    Read a columnar export chunk by chunk.
+
+    Args:
+        stream: Binary file object positioned at the start of the export
+
+    Yields:
+        dict: Column name mapped to a NumPy array for each chunk; emotions
+              has shape (rows, len(labels)), dominant_emotion holds label indexes
+
+    Raises:
+        ValueError: If the stream isn't a columnar export
+    """
+    if stream.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar emotion export")
+    header = json.loads(stream.readline())
+
+    while True:
+        count = struct.unpack('<I', stream.read(4))[0]
+        if not count:
+            return
+        chunk = {}
+        for column in header['columns']:
+            dtype = np.dtype(column['dtype'])
+            data = stream.read(count * column['width'] * dtype.itemsize)
+            values = np.frombuffer(data, dtype=dtype)
+            chunk[column['name']] = values.reshape(count, column['width']) if column['width'] > 1 else values
+        yield chunk
+
+@click.command('export-emotions')
+@click.option('--user-id', type=int, default=None, help='Only export this user (default: all users)')
+@click.option('--from', 'start', default=None, help='Earliest timestamp, inclusive (ISO 8601, default UTC)')
+@click.option('--to', 'end', default=None, help='Latest timestamp, exclusive (ISO 8601, default UTC)')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='csv')
+@click.option('--output', type=click.File('wb'), default='-', help='Output file (default: stdout)')
+@with_appcontext
+def export_emotions_command(user_id, start, end, export_format, output):
+    """Stream emotion records to a file."""
+    from app.database.db import connect_db, database_path, storage_pragmas
+
+    # The same timestamps as the API: ISO 8601, offsets converted to UTC
+    try:
+        start = parse_timestamp(start)
+        end = parse_timestamp(end)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    connection = connect_db(database_path(current_app.config), storage_pragmas(current_app.config),
+                            readonly=True)
+    try:
+        exporter = EmotionExporter(connection, export_format, user_id, start, end,
+                                   chunk_size=current_app.config.get('EXPORT_CHUNK_SIZE', 5000))
+        for data in exporter:
+            output.write(data)
+        output.flush()
+    finally:
+        connection.close()
+
+    stats = exporter.get_stats()
+    click.echo(f"Exported {stats['rows']} records ({stats['bytes'] / 1048576:.1f} MiB) in "
+               f"{stats['elapsed']:.1f}s ({stats['rows_per_second']:.0f} records/s)", err=True)
@@ -0,0 +1,290 @@
+"""
+Versioned schema migrations.
+
+Each migration in MIGRATIONS has a version number and is recorded in the
+``schema_migrations`` table once applied, so when the database is up to
+date startup only reads that table. Pending migrations run in version order
+under a lock held across processes (a ``flock`` on a file next to the
+database), so of several workers booting together one migrates and the
+others find nothing left to do. A new database gets the current schema
+from schema.sql in one step, with every migration recorded as applied.
+
+Migrations are idempotent: they check the schema before changing it, so a
+database that predates version tracking can safely run all of them, and
+an interrupted migration can simply run again.
+
+Migrations marked online are slow on large tables (index builds) and
+nothing at startup depends on them. They are applied after startup, in a
+background thread, while the app is serving requests. SQLite builds an
+index in a single write transaction; the record writer sees the migration
+lock held and waits for it instead of dropping records, and reads carry on.
+
+Switching an existing database to incremental auto-vacuum rewrites the
+whole file, so it isn't a migration but an explicit maintenance step:
+``flask prune-emotion-data --enable-incremental-vacuum``.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+from app.database.db import connect_db, database_path, get_db, storage_pragmas
+from app.database.emotion_vectors import migrate_emotions_data, migrate_dominant_emotions
+from app.database.rollups import ROLLUP_COLUMNS, rebuild_rollups
+
+Migration = namedtuple('Migration', ['version', 'name', 'apply', 'online'])
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema.sql')
+
+CREATE_MIGRATIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration REAL NOT NULL DEFAULT 0
+    )
+'''
+
+def _emotion_rollups(db):
+    """Create the rollups table and roll up the existing records."""
+    if _table_exists(db, 'emotion_rollups'):
+        return
+    columns = ''.join(
+        f"{column} {'INTEGER' if column == 'samples' or column.endswith('_count') else 'REAL'} "
+        f"NOT NULL DEFAULT 0, "
+        for column in ROLLUP_COLUMNS)
+    with db:
+        db.execute('CREATE TABLE emotion_rollups (user_id INTEGER NOT NULL, resolution TEXT NOT NULL, '
+                   f'bucket_start TIMESTAMP NOT NULL, {columns}'
+                   'PRIMARY KEY (user_id, resolution, bucket_start)) WITHOUT ROWID')
+    rebuild_rollups(db)
+
+def _retention_indexes(db):
+    """Build the indexes the retention engine deletes by."""
+    for statement in ('CREATE INDEX IF NOT EXISTS idx_emotion_records_timestamp '
+                      'ON emotion_records (timestamp)',
+                      'CREATE INDEX IF NOT EXISTS idx_emotion_rollups_resolution_time '
+                      'ON emotion_rollups (resolution, bucket_start)'):
+        with db:
+            db.execute(statement)
+
+# All migrations, in order. Never renumber or remove one; later migrations
+# must not depend on online ones, which may still be pending.
+MIGRATIONS = (
+    Migration(1, 'emotion_vectors', migrate_emotions_data, online=False),
+    Migration(2, 'dominant_emotions', migrate_dominant_emotions, online=False),
+    Migration(3, 'emotion_rollups', _emotion_rollups, online=False),
+    Migration(4, 'retention_indexes', _retention_indexes, online=True),
+)
+
+def _table_exists(db, name):
+    """Check whether a table exists."""
+    return db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                      (name,)).fetchone() is not None
+
+def get_applied_versions(db):
+    """
+    Get the versions of the migrations applied to a database.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+
+    Returns:
+        set: Applied migration versions
+    """
+    if not _table_exists(db, 'schema_migrations'):
+        return set()
+    return {row[0] for row in db.execute('SELECT version FROM schema_migrations')}
+
+def get_pending_migrations(db, online=None):
+    """
+    Get the migrations not yet applied to a database.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        online (bool, optional): Only online (True) or only blocking (False)
+                                 migrations (default: both)
+
+    Returns:
+        list: Pending Migration tuples, in version order
+    """
+    applied = get_applied_versions(db)
+    return [migration for migration in MIGRATIONS
+            if migration.version not in applied and (online is None or migration.online == online)]
+
+def _record_migration(db, migration, duration=0.0):
+    """Mark a migration as applied."""
+    with db:
+        db.execute('INSERT OR REPLACE INTO schema_migrations (version, name, duration) VALUES (?, ?, ?)',
+                   (migration.version, migration.name, duration))
+
+def create_schema(db):
+    """
+    Create the current schema in an empty database.
+
+    Every migration is recorded as applied, since the schema already
+    includes them.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+    """
+    # Let the retention engine return freed pages to the filesystem; the
+    # VACUUM that applies the setting is instant on an empty file
+    db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    db.execute('VACUUM')
+    with open(SCHEMA_PATH, 'r') as f:
+        db.executescript(f.read())
+    for migration in MIGRATIONS:
+        _record_migration(db, migration)
+
+# Serializes migrations between threads; the lock file between processes
+_migration_lock = threading.Lock()
+
+@contextmanager
+def migration_lock(path):
+    """
+    Hold the migration lock of a database.
+
+    Args:
+        path (str): Database file path
+    """
+    with _migration_lock:
+        if fcntl is None or path == ':memory:':
+            yield
+            return
+        with open(path + '.migrate-lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def migration_running(path):
+    """
+    Check whether a process is applying migrations to a database.
+
+    Args:
+        path (str): Database file path
+
+    Returns:
+        bool: True while some process holds the migration lock
+    """
+    if fcntl is None or path == ':memory:':
+        return _migration_lock.locked()
+    lock_path = path + '.migrate-lock'
+    if not os.path.exists(lock_path):
+        return False
+    with open(lock_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return False
+
+def apply_migrations(db, path, online=False):
+    """
+    Apply the pending migrations of one kind, under the migration lock.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        path (str): Database file path, locked for the duration
+        online (bool, optional): Apply the online migrations rather than the
+                                 blocking ones (default: False)
+
+    Returns:
+        list: Names of the migrations applied
+    """
+    # Up to date: nothing to lock
+    if not get_pending_migrations(db, online):
+        return []
+
+    applied = []
+    with migration_lock(path):
+        # Pending migrations are listed again below, as another process may
+        # have applied them while we waited for the lock
+        if not online and not db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchone():
+            create_schema(db)
+            print("Created database schema")
+            return ['schema']
+
+        # A database from before version tracking runs every migration
+        with db:
+            db.execute(CREATE_MIGRATIONS_TABLE)
+
+        for migration in get_pending_migrations(db, online):
+            print(f"Applying migration {migration.version} ({migration.name})...")
+            start_time = time.time()
+            migration.apply(db)
+            duration = time.time() - start_time
+            _record_migration(db, migration, duration)
+            print(f"Applied migration {migration.version} ({migration.name}) in {duration:.1f}s")
+            applied.append(migration.name)
+    return applied
+
+def _apply_online_migrations(path, pragmas):
+    """Background thread function applying the online migrations."""
+    try:
+        connection = connect_db(path, pragmas)
+        try:
+            apply_migrations(connection, path, online=True)
+        finally:
+            connection.close()
+    except Exception as e:
+        print(f"Error applying online migrations: {str(e)}")
+
+def migrate_db():
+    """
+    Bring the current app's database up to date.
+
+    Blocking migrations are applied before returning; online ones, if
+    DB_ONLINE_MIGRATIONS is set, in a background thread. When the database
+    is up to date this only reads the migrations table.
+
+    Returns:
+        list: Names of the blocking migrations applied
+    """
+    config = current_app.config
+    path = database_path(config)
+    db = get_db()
+    applied = apply_migrations(db, path)
+
+    # An in-memory database isn't shared with another connection
+    if (config.get('DB_ONLINE_MIGRATIONS', True) and path != ':memory:'
+            and get_pending_migrations(db, online=True)):
+        threading.Thread(target=_apply_online_migrations, args=(path, storage_pragmas(config)),
+                         name='schema-migrations', daemon=True).start()
+    return applied
+
+@click.command('migrate-db')
+@click.option('--status', is_flag=True, help='List the migrations and whether they are applied')
+@with_appcontext
+def migrate_db_command(status):
+    """Apply pending schema migrations, including the online ones."""
+    path = database_path(current_app.config)
+    db = get_db()
+    if status:
+        applied = {row[0]: row for row in db.execute('SELECT * FROM schema_migrations')} \
+            if _table_exists(db, 'schema_migrations') else {}
+        for migration in MIGRATIONS:
+            row = applied.get(migration.version)
+            state = f"applied {row['applied_at']} ({row['duration']:.1f}s)" if row else 'pending'
+            kind = ' [online]' if migration.online else ''
+            click.echo(f"{migration.version:4d} {migration.name}{kind}: {state}")
+        if db.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            click.echo("auto_vacuum isn't incremental: retention can't shrink the file until "
+                       "'flask prune-emotion-data --enable-incremental-vacuum' is run")
+        return
+
+    applied = apply_migrations(db, path) + apply_migrations(db, path, online=True)
+    click.echo(f"Applied {len(applied)} migrations." if applied else 'Database is up to date.')
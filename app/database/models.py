@@ -6,6 +6,8 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask import current_app
 
+from app.database.emotion_vectors import encode_emotions, decode_emotions, dominant_emotion
+
 db = SQLAlchemy()
 
 class EmotionRecord(db.Model):
@@ -17,7 +19,9 @@ class EmotionRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    emotions_data = db.Column(db.Text, nullable=False)  # JSON string of emotion probabilities
+    emotion_vector = db.Column(db.LargeBinary, nullable=False)  # float32 probabilities, see emotion_vectors
+    dominant_label = db.Column('dominant_emotion', db.String, nullable=False, default='neutral')
+    confidence = db.Column(db.Float, nullable=False, default=0.0)
     
     # Define relationship
     user = db.relationship('User', backref=db.backref('emotion_records', lazy=True))
@@ -28,15 +32,15 @@ class EmotionRecord(db.Model):
         
         Args:
             user_id (int): ID of the user who generated this record
-            emotions_data (dict): Dictionary of emotion probabilities
+            emotions_data (dict): Dictionary of emotion probabilities (or a JSON string of one)
         """
         self.user_id = user_id
         
-        # Convert dict to JSON string
-        if isinstance(emotions_data, dict):
-            self.emotions_data = json.dumps(emotions_data)
-        else:
-            self.emotions_data = emotions_data
+        # Pack the probabilities into the compact vector format
+        if isinstance(emotions_data, str):
+            emotions_data = json.loads(emotions_data)
+        self.emotion_vector = encode_emotions(emotions_data)
+        self.dominant_label, self.confidence = dominant_emotion(emotions_data)
     
     @property
     def emotions(self):
@@ -47,9 +51,9 @@ class EmotionRecord(db.Model):
             dict: Dictionary of emotion probabilities
         """
         try:
-            return json.loads(self.emotions_data)
+            return decode_emotions(self.emotion_vector)
         except Exception as e:
-            print(f"Error parsing emotions data: {str(e)}")
+            print(f"Error decoding emotions data: {str(e)}")
             return {}
     
     @property
@@ -60,11 +64,7 @@ class EmotionRecord(db.Model):
         Returns:
             tuple: (emotion_name, probability)
         """
-        emotions = self.emotions
-        if not emotions:
-            return ('neutral', 0.0)
-        
-        return max(emotions.items(), key=lambda x: x[1])
+        return (self.dominant_label, self.confidence)
     
     def to_dict(self):
         """
@@ -0,0 +1,127 @@
+"""
+Queries over emotion records.
+
+Every record stores its dominant emotion next to the probability vector,
+and ``(user_id, timestamp)`` and ``(user_id, dominant_emotion, timestamp)``
+indexes cover the common filters. Statistics come from the rollups
+instead (see app.database.rollups).
+
+History is paged by keyset: each page continues strictly after the
+(timestamp, id) of the previous page's last record, so fetching a page
+costs the same however far back it is, unlike OFFSET.
+"""
+import base64
+import json
+from datetime import datetime, timezone
+
+from app.database.emotion_vectors import EMOTION_LABELS, decode_emotions
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 date or date-time into the stored timestamp format.
+
+    Args:
+        value (str): Date or date-time, optionally with a UTC offset
+
+    Returns:
+        str: Naive UTC timestamp as stored in emotion_records, or None if empty
+
+    Raises:
+        ValueError: If the value isn't a valid date or date-time
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(sep=' ')
+
+def encode_cursor(timestamp, record_id):
+    """
+    Encode a history position as an opaque cursor string.
+
+    Args:
+        timestamp (str): Stored timestamp of the last record returned
+        record_id (int): ID of the last record returned
+
+    Returns:
+        str: URL-safe cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps([timestamp, record_id]).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor.
+
+    Args:
+        cursor (str): Cursor string
+
+    Returns:
+        tuple: (timestamp, record_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(timestamp, str) or not isinstance(record_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return timestamp, record_id
+
+def get_history_page(db, user_id, start=None, end=None, emotion=None, cursor=None, limit=50):
+    """
+    Get one page of a user's emotion records, newest first.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        user_id (int): User ID
+        start (str or datetime, optional): Earliest timestamp, inclusive
+        end (str or datetime, optional): Latest timestamp, exclusive
+        emotion (str, optional): Only records with this dominant emotion
+        cursor (str, optional): next_cursor of the previous page
+        limit (int, optional): Records per page (default: 50)
+
+    Returns:
+        tuple: (list of record dicts, next_cursor or None on the last page)
+
+    Raises:
+        ValueError: If the emotion or cursor is invalid
+    """
+    if emotion is not None and emotion not in EMOTION_LABELS:
+        raise ValueError(f"Unknown emotion: {emotion}")
+
+    # CAST keeps the stored timestamp text, which the cursor compares against
+    query = ('SELECT id, CAST(timestamp AS TEXT), dominant_emotion, confidence, emotion_vector '
+             'FROM emotion_records WHERE user_id = ?')
+    params = [user_id]
+    if emotion is not None:
+        query += ' AND dominant_emotion = ?'
+        params.append(emotion)
+    if start is not None:
+        query += ' AND timestamp >= ?'
+        params.append(str(start))
+    if end is not None:
+        query += ' AND timestamp < ?'
+        params.append(str(end))
+    if cursor is not None:
+        query += ' AND (timestamp, id) < (?, ?)'
+        params.extend(decode_cursor(cursor))
+    # One extra row tells whether there is another page
+    query += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    rows = db.execute(query, params).fetchall()
+    records = [{
+        'id': row[0],
+        'timestamp': row[1],
+        'dominant_emotion': row[2],
+        'confidence': row[3],
+        'emotions': decode_emotions(row[4])
+    } for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(records[-1]['timestamp'], records[-1]['id'])
+    return records, next_cursor
@@ -0,0 +1,362 @@
+"""
+Retention of emotion data.
+
+Every active user adds tens of thousands of raw records a day. Their
+contribution to the minute/hour/day rollups is recorded as they are
+written, so raw records are only needed for a limited time. The
+retention engine periodically:
+
+1. folds old raw records into the rollups where the rollups are missing
+   them (data written before rollups existed);
+2. deletes raw records older than the raw retention period, a whole day
+   at a time;
+3. deletes minute and hour rollups older than their own retention periods,
+   leaving the coarser rollups;
+4. returns the freed pages to the filesystem with incremental vacuum.
+
+Deletes and vacuum steps run in small transactions with a pause between
+them, so the record writer is never locked out for long.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.database.db import connect_db, database_path, storage_pragmas
+from app.database.rollups import bucket_start, rebuild_rollups
+
+# PRAGMA auto_vacuum values
+_AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+class RetentionEngine:
+    """Background pruning of old emotion records and fine-grained rollups."""
+
+    def __init__(self, database_path, raw_days=30, minute_rollup_days=90, hour_rollup_days=0,
+                 interval=3600.0, batch_size=2000, batch_pause=0.05, vacuum_pages=1000,
+                 pragmas=None, history_size=100):
+        """
+        Initialize the engine.
+
+        Args:
+            database_path (str): Path of the SQLite database file
+            raw_days (int, optional): Days raw records are kept; 0 keeps them forever (default: 30)
+            minute_rollup_days (int, optional): Days minute rollups are kept; 0 keeps
+                                                them forever (default: 90)
+            hour_rollup_days (int, optional): Days hour rollups are kept; 0 keeps
+                                              them forever (default: 0)
+            interval (float, optional): Seconds between runs (default: 3600)
+            batch_size (int, optional): Rows deleted per transaction (default: 2000)
+            batch_pause (float, optional): Seconds to pause between transactions (default: 0.05)
+            vacuum_pages (int, optional): Pages freed per incremental vacuum step (default: 1000)
+            pragmas (dict, optional): PRAGMA settings for the engine's connection
+            history_size (int, optional): Run reports kept for get_stats (default: 100)
+        """
+        self.database_path = database_path
+        self.raw_days = raw_days
+        self.rollup_days = {'minute': minute_rollup_days, 'hour': hour_rollup_days}
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self.pragmas = pragmas
+
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.run_lock = threading.Lock()
+
+        # Statistics
+        self.history = deque(maxlen=history_size)
+        self.total_raw_pruned = 0
+        self.total_rollups_pruned = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create an engine from the application config.
+
+        Args:
+            config: Flask config mapping
+
+        Returns:
+            RetentionEngine: The engine
+        """
+        return cls(
+            database_path(config),
+            raw_days=config.get('RETENTION_RAW_DAYS', 30),
+            minute_rollup_days=config.get('RETENTION_MINUTE_ROLLUP_DAYS', 90),
+            hour_rollup_days=config.get('RETENTION_HOUR_ROLLUP_DAYS', 0),
+            interval=config.get('RETENTION_INTERVAL', 3600.0),
+            batch_size=config.get('RETENTION_BATCH_SIZE', 2000),
+            batch_pause=config.get('RETENTION_BATCH_PAUSE', 0.05),
+            vacuum_pages=config.get('RETENTION_VACUUM_PAGES', 1000),
+            pragmas=storage_pragmas(config)
+        )
+
+    def start(self):
+        """Start running periodically in a background thread."""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='emotion-retention', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the background thread after its current transaction.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the thread (default: 5)
+        """
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def _run(self):
+        """Background thread function."""
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error applying emotion data retention: {str(e)}")
+            self.stop_event.wait(self.interval)
+
+    def run_once(self, now=None):
+        """
+        Apply the retention policy once.
+
+        Args:
+            now (datetime, optional): Current UTC time (default: now)
+
+        Returns:
+            dict: Report with the rows folded and pruned, pages vacuumed and
+                  database size before and after
+        """
+        now = now or datetime.utcnow()
+        with self.run_lock:
+            connection = connect_db(self.database_path, self.pragmas)
+            try:
+                start_time = time.time()
+                report = {'time': now.isoformat(sep=' '), 'database_bytes_before': self._database_size()}
+
+                if self.raw_days:
+                    # Raw records go a whole day at a time, so a day that
+                    # still has raw records has all of them (see _fold)
+                    cutoff = bucket_start(now - timedelta(days=self.raw_days), 'day')
+                    report['days_folded'] = self._fold(connection, cutoff)
+                    report['raw_pruned'] = self._delete_batches(
+                        connection,
+                        'DELETE FROM emotion_records WHERE id IN '
+                        '(SELECT id FROM emotion_records WHERE timestamp < ? LIMIT ?)',
+                        cutoff)
+                else:
+                    report['days_folded'] = report['raw_pruned'] = 0
+
+                report['rollups_pruned'] = 0
+                for resolution, days in self.rollup_days.items():
+                    if days:
+                        cutoff = (now - timedelta(days=days)).isoformat(sep=' ')
+                        report['rollups_pruned'] += self._delete_batches(
+                            connection,
+                            'DELETE FROM emotion_rollups WHERE (user_id, resolution, bucket_start) IN '
+                            '(SELECT user_id, resolution, bucket_start FROM emotion_rollups '
+                            'WHERE resolution = ? AND bucket_start < ? LIMIT ?)',
+                            resolution, cutoff)
+
+                report['pages_vacuumed'] = self._vacuum(connection)
+                report['database_bytes_after'] = self._database_size()
+                report['duration'] = time.time() - start_time
+            finally:
+                connection.close()
+
+        self.history.append(report)
+        self.total_raw_pruned += report['raw_pruned']
+        self.total_rollups_pruned += report['rollups_pruned']
+        if report['raw_pruned'] or report['rollups_pruned'] or report['days_folded']:
+            print(f"Retention: pruned {report['raw_pruned']} raw records and "
+                  f"{report['rollups_pruned']} rollups, folded {report['days_folded']} days; "
+                  f"database {report['database_bytes_before'] / 1048576:.1f} MiB -> "
+                  f"{report['database_bytes_after'] / 1048576:.1f} MiB")
+        return report
+
+    def _fold(self, connection, cutoff):
+        """
+        Roll up old raw records that the rollups don't account for yet.
+
+        A day is rebuilt from its raw records when it has more raw records
+        than its day rollup has samples. Rebuilding replaces the day's
+        rollups, which is only safe while all of its raw records exist:
+        the cutoff is a midnight, so raw records are never pruned from part
+        of a day and every day folded here is complete.
+
+        Args:
+            connection (sqlite3.Connection): Database connection
+            cutoff (str): Start of the day before which raw records are about
+                          to be pruned
+
+        Returns:
+            int: Number of user days rebuilt
+        """
+        missing = connection.execute('''
+            SELECT raw.user_id, raw.day
+            FROM (
+                SELECT user_id, substr(timestamp, 1, 10) AS day, COUNT(*) AS records
+                FROM emotion_records WHERE timestamp < ?
+                GROUP BY user_id, day
+            ) AS raw
+            LEFT JOIN emotion_rollups AS rollup
+                ON rollup.user_id = raw.user_id AND rollup.resolution = 'day'
+                AND rollup.bucket_start = raw.day || ' 00:00:00'
+            WHERE raw.records > COALESCE(rollup.samples, 0)
+        ''', (cutoff,)).fetchall()
+
+        for user_id, day in missing:
+            if self.stop_event.is_set():
+                break
+            start = datetime.strptime(day, '%Y-%m-%d')
+            rebuild_rollups(connection, user_id, start=start, end=start + timedelta(days=1))
+            time.sleep(self.batch_pause)
+        return len(missing)
+
+    def _delete_batches(self, connection, statement, *params):
+        """
+        Run a batched DELETE until it deletes nothing.
+
+        Args:
+            connection (sqlite3.Connection): Database connection
+            statement (str): DELETE whose last parameter is the batch size
+            *params: Other parameters of the statement
+
+        Returns:
+            int: Rows deleted
+        """
+        deleted = 0
+        while not self.stop_event.is_set():
+            with connection:
+                count = connection.execute(statement, (*params, self.batch_size)).rowcount
+            deleted += count
+            if count < self.batch_size:
+                break
+            # Let the record writer in between batches
+            time.sleep(self.batch_pause)
+        return deleted
+
+    def _vacuum(self, connection):
+        """
+        Release free pages to the filesystem in small steps.
+
+        Args:
+            connection (sqlite3.Connection): Database connection
+
+        Returns:
+            int: Pages released, 0 unless auto_vacuum is incremental
+        """
+        if self._auto_vacuum(connection) != 'incremental':
+            return 0
+        released = 0
+        while not self.stop_event.is_set():
+            free = connection.execute('PRAGMA freelist_count').fetchone()[0]
+            if not free:
+                break
+            step = min(free, self.vacuum_pages)
+            # executescript runs the pragma to completion; execute frees a single page
+            connection.executescript(f'PRAGMA incremental_vacuum({step});')
+            released += step
+            time.sleep(self.batch_pause)
+        if released:
+            # Move the shrunken database out of the write-ahead log into the file
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        return released
+
+    @staticmethod
+    def _auto_vacuum(connection):
+        """Get the database's auto_vacuum mode name."""
+        return _AUTO_VACUUM_MODES.get(connection.execute('PRAGMA auto_vacuum').fetchone()[0], 'none')
+
+    def _database_size(self):
+        """Get the size in bytes of the database file and its write-ahead log."""
+        size = 0
+        for path in (self.database_path, self.database_path + '-wal'):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+    def get_stats(self):
+        """
+        Get the policy and the results of recent runs.
+
+        Returns:
+            dict: Retention periods, totals, the last run's report and the
+                  database size after each recent run
+        """
+        return {
+            'raw_days': self.raw_days,
+            'rollup_days': dict(self.rollup_days),
+            'runs': len(self.history),
+            'total_raw_pruned': self.total_raw_pruned,
+            'total_rollups_pruned': self.total_rollups_pruned,
+            'last_run': self.history[-1] if self.history else None,
+            'database_bytes': [(report['time'], report['database_bytes_after']) for report in self.history]
+        }
+
+# Process-wide engine, created from the app config on first use
+_retention_engine = None
+_retention_engine_lock = threading.Lock()
+
+def get_retention_engine():
+    """
+    Get the process-wide retention engine, starting it if needed.
+
+    Returns:
+        RetentionEngine: The running engine, or None if retention is disabled
+    """
+    global _retention_engine
+    if not current_app.config.get('RETENTION_ENABLED', True):
+        return None
+    with _retention_engine_lock:
+        if _retention_engine is None:
+            _retention_engine = RetentionEngine.from_config(current_app.config)
+            _retention_engine.start()
+        return _retention_engine
+
+def peek_retention_engine():
+    """
+    Get the retention engine without starting it.
+
+    Returns:
+        RetentionEngine: The engine, or None if it hasn't been started
+    """
+    return _retention_engine
+
+def shutdown_retention_engine():
+    """Stop the retention engine, e.g. at exit."""
+    global _retention_engine
+    with _retention_engine_lock:
+        if _retention_engine is not None:
+            _retention_engine.stop()
+            _retention_engine = None
+
+@click.command('prune-emotion-data')
+@click.option('--enable-incremental-vacuum', is_flag=True,
+              help='Switch the database to incremental auto-vacuum first (runs a full VACUUM)')
+@with_appcontext
+def prune_emotion_data_command(enable_incremental_vacuum):
+    """Apply the emotion data retention policy once."""
+    engine = RetentionEngine.from_config(current_app.config)
+    if enable_incremental_vacuum:
+        connection = connect_db(engine.database_path, engine.pragmas)
+        try:
+            connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            connection.execute('VACUUM')
+        finally:
+            connection.close()
+
+    report = engine.run_once()
+    click.echo(f"Folded {report['days_folded']} days, pruned {report['raw_pruned']} raw records "
+               f"and {report['rollups_pruned']} rollups, vacuumed {report['pages_vacuumed']} pages.")
+    click.echo(f"Database size: {report['database_bytes_before']} -> {report['database_bytes_after']} bytes")
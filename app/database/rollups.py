@@ -0,0 +1,291 @@
+"""
+Time-bucketed rollups of emotion records.
+
+Raw records arrive every couple of seconds per user, so summarising a week
+or a year from them means scanning hundreds of thousands of rows. The
+``emotion_rollups`` table keeps, per user and per minute, hour and day,
+the number of records, how often each emotion was dominant, and the sum
+and sum of squares of each emotion's probability. The record writer
+updates it in the same transaction as the records themselves, so counts,
+shares, means and standard deviations over any range come from a few
+hundred rollup rows.
+"""
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from flask.cli import with_appcontext
+
+from app.database.emotion_vectors import EMOTION_LABELS, decode_matrix
+
+# Bucket sizes, mapped to the length of the timestamp prefix that identifies
+# a bucket ('YYYY-MM-DD HH:MM' for minutes, and so on)
+ROLLUP_RESOLUTIONS = {'minute': 16, 'hour': 13, 'day': 10}
+_BUCKET_SUFFIX = {'minute': ':00', 'hour': ':00:00', 'day': ' 00:00:00'}
+
+_LABEL_INDEX = {label: i for i, label in enumerate(EMOTION_LABELS)}
+_STATS = ('count', 'sum', 'sumsq')
+
+# Aggregate columns in table order: per emotion, its dominant count and
+# probability sum and sum of squares
+ROLLUP_COLUMNS = ['samples'] + [f'{label}_{stat}' for label in EMOTION_LABELS for stat in _STATS]
+
+UPSERT_ROLLUP = (
+    f"INSERT INTO emotion_rollups (user_id, resolution, bucket_start, {', '.join(ROLLUP_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * (3 + len(ROLLUP_COLUMNS)))}) "
+    f"ON CONFLICT (user_id, resolution, bucket_start) DO UPDATE SET "
+    + ', '.join(f'{column} = {column} + excluded.{column}' for column in ROLLUP_COLUMNS)
+)
+
+def bucket_start(timestamp, resolution):
+    """
+    Get the start of the bucket a timestamp falls in.
+
+    Args:
+        timestamp (str or datetime): Timestamp in SQLite's 'YYYY-MM-DD HH:MM:SS' form
+        resolution (str): Key of ROLLUP_RESOLUTIONS
+
+    Returns:
+        str: Bucket start timestamp
+    """
+    timestamp = str(timestamp).replace('T', ' ', 1)
+    # Complete partial timestamps such as a bare date
+    timestamp += '0000-00-00 00:00:00'[len(timestamp):]
+    return timestamp[:ROLLUP_RESOLUTIONS[resolution]] + _BUCKET_SUFFIX[resolution]
+
+def rollup_rows(records):
+    """
+    Aggregate emotion records into rollup rows for every resolution.
+
+    Args:
+        records (list): (user_id, timestamp, emotion_vector, dominant_emotion)
+                        tuples; further fields are ignored
+
+    Returns:
+        list: Row tuples matching UPSERT_ROLLUP, one per user and bucket
+    """
+    if not records:
+        return []
+
+    matrix = decode_matrix([record[2] for record in records]).astype(np.float64)
+    dominant = np.array([_LABEL_INDEX.get(record[3], _LABEL_INDEX['neutral']) for record in records])
+
+    rows = []
+    for resolution in ROLLUP_RESOLUTIONS:
+        buckets = {}
+        inverse = np.array([
+            buckets.setdefault((record[0], bucket_start(record[1], resolution)), len(buckets))
+            for record in records
+        ])
+
+        # Per bucket and emotion: dominant count, probability sum, sum of squares
+        stats = np.zeros((len(buckets), len(EMOTION_LABELS), len(_STATS)))
+        np.add.at(stats[:, :, 0], (inverse, dominant), 1)
+        np.add.at(stats[:, :, 1], inverse, matrix)
+        np.add.at(stats[:, :, 2], inverse, matrix ** 2)
+        samples = np.bincount(inverse, minlength=len(buckets))
+
+        for (user_id, start), i in buckets.items():
+            rows.append((user_id, resolution, start, int(samples[i]), *stats[i].ravel().tolist()))
+    return rows
+
+def apply_rollups(db, records):
+    """
+    Add emotion records to the rollups.
+
+    Runs in the caller's transaction, so records and rollups are committed
+    together.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        records (list): Records as accepted by rollup_rows
+    """
+    db.executemany(UPSERT_ROLLUP, rollup_rows(records))
+
+def rebuild_rollups(db, user_id=None, start=None, end=None, chunk_size=10000):
+    """
+    Recompute rollups from the raw emotion records.
+
+    A time range must start and end on day boundaries, so that every
+    bucket it touches lies entirely inside it.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        user_id (int, optional): Only rebuild this user's rollups (default: all users)
+        start (str or datetime, optional): Start of the days to rebuild, inclusive
+        end (str or datetime, optional): End of the days to rebuild, exclusive
+        chunk_size (int, optional): Records read at a time (default: 10000)
+
+    Returns:
+        int: Number of records rolled up
+    """
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append('user_id = ?')
+        params.append(user_id)
+    if start is not None:
+        conditions.append('{column} >= ?')
+        params.append(bucket_start(start, 'day'))
+    if end is not None:
+        conditions.append('{column} < ?')
+        params.append(bucket_start(end, 'day'))
+    where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+    count = 0
+    db.execute('BEGIN')
+    try:
+        db.execute('DELETE FROM emotion_rollups ' + where.format(column='bucket_start'), params)
+        cursor = db.execute(
+            'SELECT user_id, timestamp, emotion_vector, dominant_emotion FROM emotion_records '
+            + where.format(column='timestamp'), params)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            apply_rollups(db, [tuple(row) for row in chunk])
+            count += len(chunk)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return count
+
+def _range_query(columns, user_id, resolution, start, end):
+    """Build the SELECT of a user's rollup rows in a time range."""
+    query = f'SELECT {columns} FROM emotion_rollups WHERE user_id = ? AND resolution = ?'
+    params = [user_id, resolution]
+    if start is not None:
+        # Include the bucket the start falls in
+        query += ' AND bucket_start >= ?'
+        params.append(bucket_start(start, resolution))
+    if end is not None:
+        query += ' AND bucket_start < ?'
+        params.append(str(end))
+    return query, params
+
+def get_emotion_summary(db, user_id, start=None, end=None, resolution='day'):
+    """
+    Summarise a user's emotions over a time range from the rollups.
+
+    The range is widened to whole buckets of the given resolution.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        user_id (int): User ID
+        start (str or datetime, optional): Earliest timestamp, inclusive
+        end (str or datetime, optional): Latest timestamp, exclusive
+        resolution (str, optional): Rollup resolution to read (default: 'day')
+
+    Returns:
+        dict: 'samples' (record count) and 'emotions', mapping each emotion
+              to its dominant 'count' and 'share' and the 'mean' and 'std'
+              of its probability
+    """
+    query, params = _range_query(
+        ', '.join(f'TOTAL({column})' for column in ROLLUP_COLUMNS), user_id, resolution, start, end)
+    totals = np.array(db.execute(query, params).fetchone(), dtype=np.float64)
+
+    samples = int(totals[0])
+    stats = totals[1:].reshape(len(EMOTION_LABELS), len(_STATS))
+    emotions = {}
+    for label, (count, total, total_sq) in zip(EMOTION_LABELS, stats):
+        mean = total / samples if samples else 0.0
+        variance = total_sq / samples - mean ** 2 if samples else 0.0
+        emotions[label] = {
+            'count': int(count),
+            'share': count / samples if samples else 0.0,
+            'mean': mean,
+            'std': float(np.sqrt(max(variance, 0.0)))
+        }
+    return {'samples': samples, 'emotions': emotions}
+
+def get_emotion_timeline(db, user_id, start=None, end=None, resolution='hour', limit=None):
+    """
+    Get a user's mean emotion probabilities per bucket from the rollups.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        user_id (int): User ID
+        start (str or datetime, optional): Earliest timestamp, inclusive
+        end (str or datetime, optional): Latest timestamp, exclusive
+        resolution (str, optional): Rollup resolution to read (default: 'hour')
+        limit (int, optional): Only return the latest this many buckets
+
+    Returns:
+        list: Dicts with the bucket's 'timestamp', 'samples' and 'emotions'
+              (mean probability per emotion), oldest first
+    """
+    columns = ', '.join(['bucket_start', 'samples'] + [f'{label}_sum' for label in EMOTION_LABELS])
+    query, params = _range_query(columns, user_id, resolution, start, end)
+    query += ' ORDER BY bucket_start DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+
+    timeline = []
+    for row in reversed(db.execute(query, params).fetchall()):
+        samples = row[1]
+        timeline.append({
+            'timestamp': row[0],
+            'samples': samples,
+            'emotions': {label: total / samples if samples else 0.0
+                         for label, total in zip(EMOTION_LABELS, row[2:])}
+        })
+    return timeline
+
+def first_complete_day(db, user_id=None):
+    """
+    Get the first day all of whose raw records still exist.
+
+    Retention deletes raw records oldest first, so every day from the one
+    after the oldest remaining record on is complete, and so is that
+    record's day if it starts exactly at midnight.
+
+    Args:
+        db (sqlite3.Connection): Database connection
+        user_id (int, optional): Only consider this user's records (default: all users)
+
+    Returns:
+        str: Start of the day, or None if there are no records
+    """
+    query = 'SELECT MIN(timestamp) FROM emotion_records'
+    params = []
+    if user_id is not None:
+        query += ' WHERE user_id = ?'
+        params.append(user_id)
+    oldest = db.execute(query, params).fetchone()[0]
+    if oldest is None:
+        return None
+
+    oldest = str(oldest).replace('T', ' ', 1)
+    day = bucket_start(oldest, 'day')
+    if oldest[:19] == day:
+        return day
+    return bucket_start(datetime.strptime(day, '%Y-%m-%d %H:%M:%S') + timedelta(days=1), 'day')
+
+@click.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user')
+@click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='First day to rebuild (default: the first day whose raw records are all kept)')
+@click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='Day to stop before (default: rebuild up to now)')
+@with_appcontext
+def rebuild_rollups_command(user_id, start, end):
+    """
+    Recompute emotion rollups from the raw records.
+
+    Rollups outlive the raw records that retention prunes. Without --from,
+    days before the first one whose raw records are all still present keep
+    their rollups; with it, the rollups of the given days are replaced by
+    whatever raw records remain.
+    """
+    from app.database.db import get_db
+
+    db = get_db()
+    if start is None:
+        start = first_complete_day(db, user_id)
+        if start is None:
+            click.echo('No emotion records to roll up.')
+            return
+    start = bucket_start(start, 'day')
+    count = rebuild_rollups(db, user_id, start, end)
+    click.echo(f'Rolled up {count} emotion records from {start[:10]}.')
@@ -1,13 +1,11 @@
 -- Schema for the facial emotion recognition application
-
--- Drop tables if they exist
-DROP TABLE IF EXISTS users;
-DROP TABLE IF EXISTS emotion_records;
-DROP TABLE IF EXISTS sessions;
-DROP TABLE IF EXISTS settings;
+--
+-- The current schema, created in one step on a new database (see
+-- app.database.migrations.create_schema). Existing databases are brought
+-- up to date by the migrations instead; a change here needs a migration too.
 
 -- Create users table
-CREATE TABLE users (
+CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE NOT NULL,
     email TEXT UNIQUE NOT NULL,
@@ -17,17 +15,51 @@ CREATE TABLE users (
 );
 
 -- Create emotion records table
-CREATE TABLE emotion_records (
+CREATE TABLE IF NOT EXISTS emotion_records (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
-    emotions_data TEXT NOT NULL,  -- JSON string of emotion probabilities
-    dominant_emotion TEXT NOT NULL DEFAULT 'neutral',
+    emotion_vector BLOB NOT NULL,  -- 7 float32 probabilities (see app.database.emotion_vectors)
+    dominant_emotion TEXT NOT NULL DEFAULT 'neutral',  -- Most likely emotion, set on write
+    confidence REAL NOT NULL DEFAULT 0,  -- Probability of the dominant emotion
     timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
 
+-- Create emotion rollups table: per-user aggregates of emotion records by
+-- time bucket, maintained by the record writer (see app.database.rollups).
+-- For each emotion: records where it was dominant, and the sum and sum of
+-- squares of its probability.
+CREATE TABLE IF NOT EXISTS emotion_rollups (
+    user_id INTEGER NOT NULL,
+    resolution TEXT NOT NULL,  -- 'minute', 'hour' or 'day'
+    bucket_start TIMESTAMP NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 0,
+    angry_count INTEGER NOT NULL DEFAULT 0,
+    angry_sum REAL NOT NULL DEFAULT 0,
+    angry_sumsq REAL NOT NULL DEFAULT 0,
+    disgust_count INTEGER NOT NULL DEFAULT 0,
+    disgust_sum REAL NOT NULL DEFAULT 0,
+    disgust_sumsq REAL NOT NULL DEFAULT 0,
+    fear_count INTEGER NOT NULL DEFAULT 0,
+    fear_sum REAL NOT NULL DEFAULT 0,
+    fear_sumsq REAL NOT NULL DEFAULT 0,
+    happy_count INTEGER NOT NULL DEFAULT 0,
+    happy_sum REAL NOT NULL DEFAULT 0,
+    happy_sumsq REAL NOT NULL DEFAULT 0,
+    neutral_count INTEGER NOT NULL DEFAULT 0,
+    neutral_sum REAL NOT NULL DEFAULT 0,
+    neutral_sumsq REAL NOT NULL DEFAULT 0,
+    sad_count INTEGER NOT NULL DEFAULT 0,
+    sad_sum REAL NOT NULL DEFAULT 0,
+    sad_sumsq REAL NOT NULL DEFAULT 0,
+    surprise_count INTEGER NOT NULL DEFAULT 0,
+    surprise_sum REAL NOT NULL DEFAULT 0,
+    surprise_sumsq REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, resolution, bucket_start)
+) WITHOUT ROWID;
+
 -- Create sessions table
-CREATE TABLE sessions (
+CREATE TABLE IF NOT EXISTS sessions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     session_token TEXT UNIQUE NOT NULL,
@@ -36,7 +68,7 @@ CREATE TABLE sessions (
 );
 
 -- Create settings table
-CREATE TABLE settings (
+CREATE TABLE IF NOT EXISTS settings (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER UNIQUE NOT NULL,
     theme TEXT DEFAULT 'light',
@@ -48,8 +80,18 @@ CREATE TABLE settings (
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
 
+-- Create schema migrations table: one row per applied migration
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    duration REAL NOT NULL DEFAULT 0  -- Seconds the migration took
+);
+
 -- Create indexes
-CREATE INDEX idx_emotion_records_user_id ON emotion_records (user_id);
-CREATE INDEX idx_emotion_records_timestamp ON emotion_records (timestamp);
-CREATE INDEX idx_sessions_token ON sessions (session_token);
-CREATE INDEX idx_users_username ON users (username);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_emotion_records_user_time ON emotion_records (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emotion_records_user_dominant ON emotion_records (user_id, dominant_emotion, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emotion_records_timestamp ON emotion_records (timestamp);
+CREATE INDEX IF NOT EXISTS idx_emotion_rollups_resolution_time ON emotion_rollups (resolution, bucket_start);
+CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions (session_token);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users (username);
\ No newline at end of file
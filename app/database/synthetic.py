@@ -0,0 +1,302 @@
+"""
+Synthetic emotion data for scale testing.
+
+Generates users and months of emotion records that look like real usage,
+so the dashboard, history, reports, export and retention paths can be
+measured at 10^5 to 10^8 rows:
+
+- each user has a baseline temperament, a time zone and a daily rhythm;
+- records come in sessions of a few minutes to an hour, mostly in the
+  morning and evening of the user's local day, sampled every
+  STORAGE_INTERVAL seconds;
+- within a session, moods persist for streaks of samples, and the hour of
+  day shifts emotions (brighter mornings, gloomier nights).
+
+Records are generated lazily and bulk-loaded with executemany in large
+transactions that also update the rollups, as the record writer does.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+from app.database.emotion_vectors import EMOTION_LABELS, VECTOR_DTYPE, VECTOR_SIZE
+from app.database.rollups import apply_rollups
+from app.database.writer import INSERT_EMOTION_RECORD
+
+UserProfile = namedtuple('UserProfile', ['baseline', 'utc_offset', 'sessions_per_day', 'volatility'])
+
+_HAPPY, _NEUTRAL, _SAD, _FEAR, _ANGRY = (EMOTION_LABELS.index(label)
+                                          for label in ('happy', 'neutral', 'sad', 'fear', 'angry'))
+
+def _diurnal_logits(hours):
+    """
+    Emotion logit offsets by local hour of day.
+
+    Args:
+        hours (numpy.ndarray): Local hours (fractional)
+
+    Returns:
+        numpy.ndarray: Offsets of shape (len(hours), len(EMOTION_LABELS))
+    """
+    offsets = np.zeros((len(hours), len(EMOTION_LABELS)))
+    angle = 2 * np.pi * hours / 24
+    offsets[:, _HAPPY] = 0.6 * np.cos(angle - 2 * np.pi * 10 / 24)   # Brightest mid-morning
+    offsets[:, _SAD] = 0.5 * np.cos(angle - 2 * np.pi * 2 / 24)      # Gloomiest after midnight
+    offsets[:, _FEAR] = 0.3 * np.cos(angle - 2 * np.pi * 3 / 24)
+    offsets[:, _ANGRY] = 0.3 * np.cos(angle - 2 * np.pi * 17 / 24)   # Late-afternoon irritation
+    return offsets
+
+class EmotionDataGenerator:
+    """Generator of realistic emotion records for synthetic users."""
+
+    def __init__(self, seed=None, interval=2.0, sessions_per_day=3.0, session_minutes=20.0,
+                 streak_samples=30):
+        """
+        Initialize the generator.
+
+        Args:
+            seed (int, optional): Random seed for reproducible data
+            interval (float, optional): Seconds between records in a session (default: 2)
+            sessions_per_day (float, optional): Average sessions per user per day (default: 3)
+            session_minutes (float, optional): Average session length (default: 20)
+            streak_samples (float, optional): Average records a mood lasts (default: 30)
+        """
+        self.rng = np.random.default_rng(seed)
+        self.interval = interval
+        self.sessions_per_day = sessions_per_day
+        self.session_minutes = session_minutes
+        self.streak_samples = streak_samples
+
+    def make_profile(self):
+        """
+        Draw a random user profile.
+
+        Returns:
+            UserProfile: Baseline emotion logits, UTC offset in hours, the
+                         user's average sessions per day and mood volatility
+        """
+        baseline = self.rng.normal(0.0, 0.5, len(EMOTION_LABELS))
+        # Faces are mostly neutral, and more often happy than disgusted
+        baseline[_NEUTRAL] += 1.2
+        baseline[_HAPPY] += 0.5
+        return UserProfile(
+            baseline=baseline,
+            utc_offset=int(self.rng.integers(-8, 10)),
+            sessions_per_day=self.sessions_per_day * self.rng.lognormal(0.0, 0.4),
+            volatility=self.rng.uniform(0.3, 0.8)
+        )
+
+    def _session_starts(self, profile, day):
+        """
+        Draw the session start times and lengths of one user day.
+
+        Args:
+            profile (UserProfile): The user's profile
+            day (datetime): UTC midnight of the day
+
+        Returns:
+            list: (start datetime in UTC, duration in seconds) pairs, in order
+                  and not overlapping
+        """
+        count = self.rng.poisson(profile.sessions_per_day)
+        # Local start hours cluster around 9:00 and 20:00
+        peaks = self.rng.choice([9.0, 20.0], size=count, p=[0.4, 0.6])
+        local_hours = np.clip(self.rng.normal(peaks, 2.0), 0.0, 23.9)
+        durations = self.rng.lognormal(np.log(self.session_minutes * 60) - 0.5, 1.0, size=count)
+
+        sessions = []
+        previous_end = None
+        for local_hour, duration in sorted(zip(local_hours, durations)):
+            start = day + timedelta(hours=float(local_hour) - profile.utc_offset)
+            if previous_end is not None and start < previous_end:
+                start = previous_end + timedelta(minutes=1)
+            duration = min(float(duration), 3 * 3600.0)
+            sessions.append((start, duration))
+            previous_end = start + timedelta(seconds=duration)
+        return sessions
+
+    def _session_records(self, user_id, profile, start, duration):
+        """
+        Generate the records of one session.
+
+        Args:
+            user_id (int): User ID
+            profile (UserProfile): The user's profile
+            start (datetime): Session start in UTC
+            duration (float): Session length in seconds
+
+        Returns:
+            list: Record tuples matching INSERT_EMOTION_RECORD
+        """
+        count = max(1, int(duration / self.interval))
+        offsets = np.cumsum(self.rng.normal(self.interval, self.interval * 0.1, count).clip(0.5))
+        times = np.datetime64(start, 'us') + (offsets * 1e6).astype('timedelta64[us]')
+
+        # Moods persist for streaks, drawn from the user's temperament
+        temperament = np.exp(profile.baseline) / np.exp(profile.baseline).sum()
+        moods = []
+        while len(moods) < count:
+            length = self.rng.geometric(1.0 / self.streak_samples)
+            moods.extend([self.rng.choice(len(EMOTION_LABELS), p=temperament)] * length)
+        moods = np.array(moods[:count])
+
+        local_hours = ((times - times.astype('datetime64[D]')).astype(np.int64) / 3.6e9
+                       + profile.utc_offset) % 24
+        logits = (profile.baseline + _diurnal_logits(local_hours)
+                  + self.rng.normal(0.0, profile.volatility, (count, len(EMOTION_LABELS))))
+        logits[np.arange(count), moods] += 1.5
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities = (probabilities / probabilities.sum(axis=1, keepdims=True)).astype(VECTOR_DTYPE)
+
+        dominant = probabilities.argmax(axis=1)
+        blob = probabilities.tobytes()
+        timestamps = np.datetime_as_string(times, unit='s')
+        return [
+            (user_id, timestamps[i].replace('T', ' '), blob[i * VECTOR_SIZE:(i + 1) * VECTOR_SIZE],
+             EMOTION_LABELS[dominant[i]], float(probabilities[i, dominant[i]]))
+            for i in range(count)
+        ]
+
+    def iter_records(self, user_id, profile, start, days):
+        """
+        Generate a user's records over a number of days, oldest first.
+
+        Args:
+            user_id (int): User ID
+            profile (UserProfile): The user's profile
+            start (datetime): UTC midnight of the first day
+            days (int): Number of days
+
+        Yields:
+            tuple: Record tuples matching INSERT_EMOTION_RECORD
+        """
+        for day in range(days):
+            for session_start, duration in self._session_starts(profile, start + timedelta(days=day)):
+                yield from self._session_records(user_id, profile, session_start, duration)
+
+def bulk_load(connection, records, batch_size=50000, rate=None, progress=None):
+    """
+    Insert records in large transactions, updating the rollups.
+
+    Args:
+        connection (sqlite3.Connection): Database connection
+        records: Iterable of record tuples matching INSERT_EMOTION_RECORD
+        batch_size (int, optional): Records per transaction (default: 50000)
+        rate (float, optional): Target records per second; None loads as fast as possible
+        progress (callable, optional): Called with the statistics after each batch
+
+    Returns:
+        dict: Rows loaded, batches, elapsed seconds and rows per second
+    """
+    stats = {'rows': 0, 'batches': 0, 'elapsed': 0.0, 'rows_per_second': 0.0}
+    start_time = time.time()
+
+    def flush(batch):
+        with connection:
+            connection.executemany(INSERT_EMOTION_RECORD, batch)
+            apply_rollups(connection, batch)
+        stats['rows'] += len(batch)
+        stats['batches'] += 1
+
+        # Hold back to the target rate
+        if rate:
+            ahead = stats['rows'] / rate - (time.time() - start_time)
+            if ahead > 0:
+                time.sleep(ahead)
+        stats['elapsed'] = time.time() - start_time
+        stats['rows_per_second'] = stats['rows'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        if progress is not None:
+            progress(stats)
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return stats
+
+def create_users(connection, count, password):
+    """
+    Create users with Faker names and a shared password.
+
+    Args:
+        connection (sqlite3.Connection): Database connection
+        count (int): Number of users
+        password (str): Password of every user
+
+    Returns:
+        list: IDs of the new users
+    """
+    from faker import Faker
+
+    fake = Faker()
+    # Hashing is deliberately slow, so all users share one hash
+    password_hash = generate_password_hash(password)
+    user_ids = []
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        # Suffixing each name with the ID the user is about to get keeps
+        # names unique across runs: AUTOINCREMENT never issues an ID twice
+        row = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'users'").fetchone()
+        next_id = (row[0] if row else 0) + 1
+        for user_id in range(next_id, next_id + count):
+            cursor = connection.execute(
+                'INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                (user_id, f'{fake.user_name()}{user_id}',
+                 f'{fake.user_name()}{user_id}@{fake.free_email_domain()}', password_hash))
+            user_ids.append(cursor.lastrowid)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return user_ids
+
+@click.command('generate-emotion-data')
+@click.option('--users', default=10, show_default=True, help='Synthetic users to create.')
+@click.option('--days', default=30, show_default=True, help='Days of history per user.')
+@click.option('--end', 'end_date', default=None, help='Last day of history, YYYY-MM-DD (default: today).')
+@click.option('--sessions-per-day', default=3.0, show_default=True, help='Average sessions per user per day.')
+@click.option('--session-minutes', default=20.0, show_default=True, help='Average session length.')
+@click.option('--batch-size', default=50000, show_default=True, help='Records per transaction.')
+@click.option('--rate', default=0.0, show_default=True, help='Target records per second (0: unthrottled).')
+@click.option('--password', default='synthetic', show_default=True, help='Password of the created users.')
+@click.option('--seed', default=None, type=int, help='Random seed for reproducible data.')
+@with_appcontext
+def generate_emotion_data_command(users, days, end_date, sessions_per_day, session_minutes,
+                                  batch_size, rate, password, seed):
+    """Create synthetic users and bulk-load their emotion history."""
+    from app.database.db import connect_db, database_path, storage_pragmas
+
+    config = current_app.config
+    interval = config.get('STORAGE_INTERVAL', 2.0)
+    end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.utcnow()
+    start = end.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+
+    generator = EmotionDataGenerator(seed, interval, sessions_per_day, session_minutes)
+    expected = users * days * sessions_per_day * session_minutes * 60 / interval
+    click.echo(f"Generating about {expected:,.0f} records for {users} users over {days} days...")
+
+    connection = connect_db(database_path(config), storage_pragmas(config))
+    try:
+        user_ids = create_users(connection, users, password)
+        records = (record
+                   for user_id in user_ids
+                   for record in generator.iter_records(user_id, generator.make_profile(), start, days))
+
+        def progress(stats):
+            click.echo(f"  {stats['rows']:,} records, {stats['rows_per_second']:,.0f} records/s")
+
+        stats = bulk_load(connection, records, batch_size, rate or None, progress)
+    finally:
+        connection.close()
+
+    click.echo(f"Loaded {stats['rows']:,} records in {stats['batches']} transactions in "
+               f"{stats['elapsed']:.1f}s ({stats['rows_per_second']:,.0f} records/s)")
@@ -0,0 +1,259 @@
+"""
+Write-behind storage of emotion records.
+
+Video streams must never wait on the database: a slow disk or a locked
+SQLite file would stall their capture loops. Streams hand their records
+to a bounded queue instead, and a single background writer drains it,
+inserting each batch with one multi-row statement in one transaction,
+together with its contribution to the emotion rollups. A batch is
+flushed once it is full or has waited long enough. When the queue is
+full, new records are dropped and counted rather than blocking the
+caller.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+
+from app.database.db import connect_db, database_path, storage_pragmas
+from app.database.emotion_vectors import encode_emotions, dominant_emotion
+from app.database.migrations import migration_running
+from app.database.rollups import apply_rollups
+
+INSERT_EMOTION_RECORD = (
+    "INSERT INTO emotion_records (user_id, timestamp, emotion_vector, dominant_emotion, confidence) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+class EmotionRecordWriter:
+    """Background writer batching emotion records into SQLite."""
+
+    def __init__(self, database_path, batch_size=100, flush_interval=1.0,
+                 max_queue_size=10000, max_retries=3, pragmas=None):
+        """
+        Initialize the writer.
+
+        Args:
+            database_path (str): Path of the SQLite database file
+            batch_size (int, optional): Records per transaction (default: 100)
+            flush_interval (float, optional): Longest time in seconds a record
+                                              waits before being written (default: 1)
+            max_queue_size (int, optional): Records that may be pending before
+                                            new ones are dropped (default: 10000)
+            max_retries (int, optional): Retries of a batch while the database
+                                         is locked (default: 3)
+            pragmas (dict, optional): PRAGMA settings for the writer's connection
+        """
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.pragmas = pragmas
+
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.connection = None
+
+        # Statistics
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_flush_time = 0.0
+
+    def start(self):
+        """Start the writer thread."""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='emotion-record-writer', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Flush pending records and stop the writer thread.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the final flush (default: 5)
+        """
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        try:
+            # Wake the writer if it is waiting for records
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def submit(self, user_id, emotions, timestamp=None):
+        """
+        Queue a record for writing without blocking.
+
+        Args:
+            user_id (int): ID of the user the record belongs to
+            emotions (dict): Emotion probabilities
+            timestamp (datetime, optional): Time of the analysis (default: now, UTC)
+
+        Returns:
+            bool: True if the record was queued, False if it was dropped
+        """
+        timestamp = timestamp or datetime.utcnow()
+        # The dominant emotion is stored so statistics never decode vectors
+        label, confidence = dominant_emotion(emotions)
+        record = (user_id, timestamp.isoformat(sep=' '), encode_emotions(emotions), label, confidence)
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        """Writer thread function."""
+        self.connection = connect_db(self.database_path, self.pragmas)
+        batch = []
+        deadline = None
+        try:
+            while not self.stop_event.is_set():
+                timeout = self.flush_interval if not batch else max(0.0, deadline - time.time())
+                try:
+                    record = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    record = None
+
+                if record is not None:
+                    if not batch:
+                        deadline = time.time() + self.flush_interval
+                    batch.append(record)
+
+                if batch and (len(batch) >= self.batch_size or time.time() >= deadline):
+                    self._flush(batch)
+                    batch = []
+
+            # Shutting down: write everything still pending
+            while True:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not None:
+                    batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+        finally:
+            self.connection.close()
+            self.connection = None
+
+    def _flush(self, batch):
+        """
+        Insert a batch of records and update the rollups in one transaction.
+
+        Args:
+            batch (list): Row tuples matching INSERT_EMOTION_RECORD
+
+        Returns:
+            bool: True if the batch was written
+        """
+        start_time = time.time()
+        attempt = 0
+        while True:
+            try:
+                with self.connection:
+                    self.connection.executemany(INSERT_EMOTION_RECORD, batch)
+                    apply_rollups(self.connection, batch)
+                self.written += len(batch)
+                self.batches += 1
+                self.total_flush_time += time.time() - start_time
+                return True
+            except sqlite3.OperationalError as e:
+                # A schema migration (e.g. an index build) holds the write
+                # lock for as long as it runs: wait it out rather than drop
+                # the batch, unless we're shutting down
+                if not self.stop_event.is_set() and migration_running(self.database_path):
+                    self._wait_for_migration()
+                    continue
+                # Typically "database is locked": back off and retry
+                if attempt == self.max_retries:
+                    print(f"Error writing {len(batch)} emotion records: {str(e)}")
+                    break
+                time.sleep(0.1 * 2 ** attempt)
+                attempt += 1
+            except sqlite3.Error as e:
+                print(f"Error writing {len(batch)} emotion records: {str(e)}")
+                break
+
+        self.failed += len(batch)
+        return False
+
+    def _wait_for_migration(self, poll_interval=0.5):
+        """Wait until no schema migration holds the database, or the writer stops."""
+        print("Emotion record writer waiting for a schema migration to finish")
+        while not self.stop_event.is_set() and migration_running(self.database_path):
+            time.sleep(poll_interval)
+
+    def get_stats(self):
+        """
+        Get queue and write statistics.
+
+        Returns:
+            dict: Pending, written, dropped and failed record counts and batch timings
+        """
+        return {
+            'pending': self.queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'avg_batch_size': self.written / self.batches if self.batches else 0,
+            'avg_flush_time': self.total_flush_time / self.batches if self.batches else 0
+        }
+
+# Process-wide writer, created from the app config on first use
+_record_writer = None
+_record_writer_lock = threading.Lock()
+
+def get_record_writer():
+    """
+    Get the process-wide emotion record writer, starting it if needed.
+
+    Returns:
+        EmotionRecordWriter: The running writer
+    """
+    global _record_writer
+    with _record_writer_lock:
+        if _record_writer is None:
+            config = current_app.config
+            _record_writer = EmotionRecordWriter(
+                database_path(config),
+                batch_size=config.get('RECORD_BATCH_SIZE', 100),
+                flush_interval=config.get('RECORD_FLUSH_INTERVAL', 1.0),
+                max_queue_size=config.get('RECORD_QUEUE_SIZE', 10000),
+                pragmas=storage_pragmas(config)
+            )
+            _record_writer.start()
+        return _record_writer
+
+def peek_record_writer():
+    """
+    Get the emotion record writer without starting it.
+
+    Returns:
+        EmotionRecordWriter: The writer, or None if it hasn't been started
+    """
+    return _record_writer
+
+def shutdown_record_writer():
+    """Flush pending records and stop the writer, e.g. at exit."""
+    global _record_writer
+    with _record_writer_lock:
+        if _record_writer is not None:
+            _record_writer.stop()
+            _record_writer = None
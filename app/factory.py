@@ -1,12 +1,16 @@
 import os
+import atexit
 from flask import Flask, current_app
 # Assuming db functions are correctly importable like this
 # You might need adjustments based on your exact db setup file structure
-from app.database.db import init_db, get_db
+from app.database.db import close_db, register_db_commands
 from app.config import config_by_name
 # Import the routes module
 from . import routes 
 
+# Whether the shutdown handlers have been registered with atexit
+_shutdown_registered = False
+
 class AppContextManager:
     """Context manager for handling Flask application context."""
 
@@ -30,13 +34,16 @@ class AppContextManager:
         if self.ctx is not None:
             return self.ctx.__exit__(exc_type, exc_val, exc_tb)
 
-def create_app(config_name="development"):
+def create_app(config_name="development", config_overrides=None):
     """
     Create and configure the Flask application.
 
     Args:
         config_name (str): Configuration environment name
                           (development, testing, production)
+        config_overrides (dict, optional): Settings applied on top of the
+                                           configuration, before the database
+                                           is touched
 
     Returns:
         Flask: The configured Flask application
@@ -55,19 +62,25 @@ def create_app(config_name="development"):
         app.config.from_object(config_by_name[config_name])
     except KeyError:
         raise ValueError(f"Invalid configuration name: {config_name}")
+    if config_overrides:
+        app.config.update(config_overrides)
+    app.config['CONFIG_NAME'] = config_name
+
+    # Register teardown context to return DB connections to their pools
+    # (before initializing the database, which already uses one)
+    app.teardown_appcontext(close_db)
 
-    # Initialize database (ensure this handles potential errors)
+    # Bring the database schema up to date; a no-op when it already is
     try:
-        with app.app_context():
-            init_db()
+        if app.config.get('DB_MIGRATE_ON_STARTUP', True):
+            from app.database.migrations import migrate_db
+            with app.app_context():
+                migrate_db()
     except Exception as e:
         # Log error and potentially raise it or handle gracefully
         app.logger.error(f"Database initialization failed: {e}")
         # Depending on severity, you might want to raise e here
 
-    # Register teardown context to close DB connection
-    app.teardown_appcontext(close_db)
-
     # Register blueprints
     register_blueprints(app)
 
@@ -80,20 +93,26 @@ def create_app(config_name="development"):
     # Add a app_context_manager method to the app for easier access
     app.app_context_manager = lambda: AppContextManager(app)
 
-    # You might have other registrations here (CLI commands, extensions, etc.)
+    # Register CLI commands
+    register_commands(app)
+
+    # Stop all video streams and release their cameras on shutdown, then
+    # flush their pending emotion records (atexit runs in reverse order).
+    # The handlers act on process-wide state, so one registration covers
+    # every app created in the process
+    global _shutdown_registered
+    if not _shutdown_registered:
+        from app.database.writer import shutdown_record_writer
+        from app.database.retention import shutdown_retention_engine
+        from app.models.video_processor import cleanup_video_streams
+        atexit.register(shutdown_record_writer)
+        atexit.register(shutdown_retention_engine)
+        atexit.register(cleanup_video_streams)
+        _shutdown_registered = True
 
     app.logger.info(f"Flask app created with '{config_name}' configuration.")
     return app
 
-def close_db(e=None):
-    """Close database connection at the end of a request."""
-    # This assumes get_db() correctly retrieves the request-specific connection
-    # possibly stored in g by get_db itself.
-    db = get_db()
-    if hasattr(db, 'close'): # Check if it's a closable connection object
-        db.close()
-
-
 def register_blueprints(app):
     """Register Flask blueprints."""
     # It's often cleaner to import blueprints inside the function
@@ -109,6 +128,13 @@ def register_blueprints(app):
     app.register_blueprint(api_bp, url_prefix='/api')
     app.logger.info("Blueprints registered.")
 
+def register_commands(app):
+    """Register Flask CLI commands."""
+    from app.utils.video_processing import register_video_commands
+
+    register_db_commands(app)
+    register_video_commands(app)
+
 def register_error_handlers(app):
     """Register error handlers."""
     from flask import render_template, current_app # Import current_app for logging
@@ -0,0 +1,170 @@
+"""
+Admission control for video streams.
+
+This module caps the number of concurrently running video streams, both
+globally (``MAX_CONCURRENT_USERS``) and per user, so a burst of logins
+cannot oversubscribe the machine. Requests beyond the global cap wait in
+a short bounded queue and are rejected with a retry hint once the queue
+is full or their wait times out.
+"""
+import threading
+import time
+from flask import current_app
+
+class AdmissionRejected(Exception):
+    """Raised when a stream cannot be admitted."""
+
+    def __init__(self, message, retry_after):
+        """
+        Initialize the rejection.
+
+        Args:
+            message (str): Human readable reason
+            retry_after (int): Suggested number of seconds before retrying
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Counting admission controller with per-user limits and a wait queue.
+    """
+
+    def __init__(self, max_streams=10, max_streams_per_user=1, queue_timeout=5.0,
+                 max_queue_length=10, retry_after=10):
+        """
+        Initialize the admission controller.
+
+        Args:
+            max_streams (int, optional): Maximum number of concurrent streams (default: 10)
+            max_streams_per_user (int, optional): Maximum streams per user (default: 1)
+            queue_timeout (float, optional): Seconds a request may wait for a free slot (default: 5)
+            max_queue_length (int, optional): Maximum number of waiting requests (default: 10)
+            retry_after (int, optional): Base Retry-After hint in seconds (default: 10)
+        """
+        self.max_streams = max_streams
+        self.max_streams_per_user = max_streams_per_user
+        self.queue_timeout = queue_timeout
+        self.max_queue_length = max_queue_length
+        self.retry_after = retry_after
+
+        self.condition = threading.Condition()
+        self.active = {}  # user_id -> number of admitted streams
+        self.total_active = 0
+        self.waiting = 0
+
+        # Counters for monitoring
+        self.admitted_count = 0
+        self.rejected_count = 0
+
+    def _retry_after_hint(self):
+        """Estimate how long a rejected client should wait before retrying."""
+        backlog = self.waiting // max(self.max_streams, 1)
+        return int(self.retry_after * (1 + backlog))
+
+    def acquire(self, user_id, timeout=None):
+        """
+        Admit a new stream for a user, waiting for a free slot if needed.
+
+        Args:
+            user_id: ID of the user requesting a stream
+            timeout (float, optional): Override for the queue timeout in seconds
+
+        Raises:
+            AdmissionRejected: If the user is over their limit, the queue is
+                               full or no slot became free in time
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+
+        with self.condition:
+            if self.active.get(user_id, 0) >= self.max_streams_per_user:
+                self.rejected_count += 1
+                raise AdmissionRejected(
+                    f"Stream limit of {self.max_streams_per_user} per user reached",
+                    self.retry_after
+                )
+
+            if self.total_active >= self.max_streams:
+                if self.waiting >= self.max_queue_length or timeout <= 0:
+                    self.rejected_count += 1
+                    raise AdmissionRejected("Server is at capacity", self._retry_after_hint())
+
+                self.waiting += 1
+                try:
+                    deadline = time.time() + timeout
+                    while self.total_active >= self.max_streams:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+                if self.total_active >= self.max_streams:
+                    self.rejected_count += 1
+                    raise AdmissionRejected("Server is at capacity", self._retry_after_hint())
+
+            self.active[user_id] = self.active.get(user_id, 0) + 1
+            self.total_active += 1
+            self.admitted_count += 1
+
+    def release(self, user_id):
+        """
+        Release a stream slot previously admitted for a user.
+
+        Args:
+            user_id: ID of the user whose stream ended
+        """
+        with self.condition:
+            count = self.active.get(user_id, 0)
+            if count <= 0:
+                return
+            if count == 1:
+                del self.active[user_id]
+            else:
+                self.active[user_id] = count - 1
+            self.total_active -= 1
+            self.condition.notify()
+
+    def get_load(self):
+        """
+        Get the current load.
+
+        Returns:
+            dict: Active and maximum stream counts, queue length and counters
+        """
+        with self.condition:
+            return {
+                'active_streams': self.total_active,
+                'max_streams': self.max_streams,
+                'max_streams_per_user': self.max_streams_per_user,
+                'active_users': len(self.active),
+                'waiting': self.waiting,
+                'utilization': self.total_active / self.max_streams if self.max_streams else 0,
+                'admitted': self.admitted_count,
+                'rejected': self.rejected_count
+            }
+
+# Process-wide controller, created from the app config on first use
+_admission_controller = None
+_admission_controller_lock = threading.Lock()
+
+def get_admission_controller():
+    """
+    Get the process-wide admission controller.
+
+    Returns:
+        AdmissionController: The admission controller
+    """
+    global _admission_controller
+    with _admission_controller_lock:
+        if _admission_controller is None:
+            config = current_app.config
+            _admission_controller = AdmissionController(
+                max_streams=config.get('MAX_CONCURRENT_USERS', 10),
+                max_streams_per_user=config.get('MAX_STREAMS_PER_USER', 1),
+                queue_timeout=config.get('ADMISSION_QUEUE_TIMEOUT', 5.0),
+                max_queue_length=config.get('ADMISSION_MAX_QUEUE', 10),
+                retry_after=config.get('ADMISSION_RETRY_AFTER', 10)
+            )
+        return _admission_controller
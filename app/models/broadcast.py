@@ -0,0 +1,183 @@
+"""
+Latest-value broadcast channel for pushing stream updates to clients.
+
+Publishers overwrite the current value and bump a version number.
+Subscribers remember the last version they saw and block until a newer
+one is published, so a slow subscriber simply skips to the newest value
+instead of receiving a backlog of stale ones. Subscribers that can't
+block a thread (e.g. asyncio tasks) register a listener callback instead.
+"""
+import threading
+import time
+from collections import deque
+
+class UpdateChannel:
+    """
+    Thread-safe latest-value channel.
+    """
+
+    def __init__(self):
+        """Initialize the channel."""
+        self.condition = threading.Condition()
+        self.version = 0
+        self.value = None
+        self.closed = False
+        self.listeners = []
+
+    def publish(self, value):
+        """
+        Publish a new value, waking all waiting subscribers.
+
+        Args:
+            value: The value to publish
+        """
+        with self.condition:
+            self.version += 1
+            self.value = value
+            self.condition.notify_all()
+            listeners = list(self.listeners)
+        self._notify(listeners)
+
+    def wait(self, last_version=0, timeout=None):
+        """
+        Wait for a value newer than ``last_version``.
+
+        Args:
+            last_version (int, optional): Version the subscriber has already seen (default: 0)
+            timeout (float, optional): Maximum number of seconds to wait
+
+        Returns:
+            tuple: (version, value); value is None on timeout or when the channel is closed
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version > last_version or self.closed, timeout)
+            if self.version > last_version:
+                return self.version, self.value
+            return last_version, None
+
+    def close(self):
+        """Close the channel, releasing all waiting subscribers."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            listeners = list(self.listeners)
+        self._notify(listeners)
+
+    def add_listener(self, callback):
+        """
+        Register a callback run after every publish and when the channel closes.
+
+        Callbacks run on the publishing thread, so they should only hand the
+        notification off (e.g. with ``loop.call_soon_threadsafe``).
+
+        Args:
+            callback (callable): Function taking no arguments
+        """
+        with self.condition:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """
+        Unregister a callback added with ``add_listener``.
+
+        Args:
+            callback (callable): The registered callback
+        """
+        with self.condition:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def _notify(self, listeners):
+        """Run listener callbacks outside the lock."""
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in update listener: {e}")
+
+class ViewerMailbox:
+    """
+    Single-slot "latest value" mailbox for one subscriber of a channel.
+
+    The channel itself holds only the newest value, so a subscriber that
+    falls behind never builds a queue: when it takes the next value it
+    jumps straight to the newest one, and the versions it missed are
+    counted as skipped.
+    """
+
+    def __init__(self, channel, rate_window=30):
+        """
+        Initialize the mailbox.
+
+        Args:
+            channel (UpdateChannel): Channel delivering into this mailbox
+            rate_window (int, optional): Number of recent deliveries used
+                                         for the effective rate (default: 30)
+        """
+        self.channel = channel
+        self.version = 0
+        self.delivered = 0
+        self.skipped = 0
+        self.delivery_times = deque(maxlen=rate_window)
+
+    def take(self, timeout=None):
+        """
+        Wait for the newest value not yet taken.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait
+
+        Returns:
+            The value, or None on timeout or when the channel is closed
+        """
+        return self.accept(*self.channel.wait(self.version, timeout))
+
+    def accept(self, version, value):
+        """
+        Record a value obtained from the channel.
+
+        Used by subscribers that wait on the channel themselves, e.g. from
+        an event loop.
+
+        Args:
+            version (int): Version returned by the channel
+            value: Value returned by the channel (None if nothing new)
+
+        Returns:
+            The value, or None if nothing new was delivered
+        """
+        if value is None or version <= self.version:
+            return None
+
+        # Versions published while we were busy were never delivered
+        if self.delivered:
+            self.skipped += version - self.version - 1
+        self.version = version
+        self.delivered += 1
+        self.delivery_times.append(time.time())
+        return value
+
+    def effective_rate(self):
+        """
+        Get the recent delivery rate.
+
+        Returns:
+            float: Values delivered per second over the rate window
+        """
+        if len(self.delivery_times) < 2:
+            return 0.0
+        elapsed = self.delivery_times[-1] - self.delivery_times[0]
+        return (len(self.delivery_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def get_stats(self):
+        """
+        Get delivery statistics.
+
+        Returns:
+            dict: Delivered and skipped counts and the effective rate
+        """
+        return {
+            'delivered': self.delivered,
+            'skipped': self.skipped,
+            'effective_fps': self.effective_rate()
+        }
@@ -0,0 +1,212 @@
+"""
+CPU thread budgeting for OpenCV and TensorFlow.
+
+OpenCV and TensorFlow each size their thread pools to the whole machine by
+default. With several inference workers (and several streams feeding
+them) every worker then fans out across all cores, and the pools fight
+each other for the CPU. A CpuBudget divides a configured number of cores
+between the workers instead: OpenCV and TensorFlow get threads sized to a
+worker's slice, and on Linux each worker can optionally be pinned to its
+own CPUs.
+
+Workers are confined to the budgeted CPUs (or pinned to their own slice
+of them) from their own thread, since on Linux a thread's affinity only
+passes on to threads it creates afterwards.
+"""
+import os
+import threading
+import cv2
+
+def available_cpus():
+    """
+    Get the CPUs this process may run on.
+
+    Returns:
+        list: Sorted CPU indices
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def parse_cpu_list(spec):
+    """
+    Parse a CPU list such as ``"0-3,6"``.
+
+    Args:
+        spec (str): Comma separated CPU indices and inclusive ranges
+
+    Returns:
+        list: Sorted CPU indices
+
+    Raises:
+        ValueError: If the list is malformed or empty
+    """
+    cpus = set()
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        if '-' in entry:
+            first, last = (int(part) for part in entry.split('-', 1))
+            if first > last:
+                raise ValueError(f"Invalid CPU range: {entry!r}")
+            cpus.update(range(first, last + 1))
+        else:
+            cpus.add(int(entry))
+
+    if not cpus:
+        raise ValueError("Empty CPU list")
+    return sorted(cpus)
+
+class CpuBudget:
+    """
+    A number of cores shared out between worker threads or processes.
+
+    Each of ``workers`` workers gets ``cores // workers`` threads for
+    OpenCV and TensorFlow, and a slice of that size of the allowed CPUs to
+    be pinned to when pinning is enabled.
+    """
+
+    def __init__(self, cores=None, cpus=None, workers=None, pin_workers=False,
+                 opencv_threads=None, tf_intra_op_threads=None, tf_inter_op_threads=None):
+        """
+        Initialize the budget.
+
+        Args:
+            cores (int, optional): Cores to use in total (default: all allowed CPUs)
+            cpus (list, optional): CPUs the process is confined to (default: all available)
+            workers (int, optional): Number of workers sharing the cores (default: one per core)
+            pin_workers (bool, optional): Pin each worker to its slice of the CPUs (default: False)
+            opencv_threads (int, optional): Override the OpenCV threads per worker
+            tf_intra_op_threads (int, optional): Override the TensorFlow intra-op threads
+            tf_inter_op_threads (int, optional): Override the TensorFlow inter-op threads (default: 1)
+        """
+        self.cpus = list(cpus) if cpus else available_cpus()
+        self.cores = max(1, min(cores or len(self.cpus), len(self.cpus)))
+        self.workers = max(1, workers or self.cores)
+        self.pin_workers = pin_workers and hasattr(os, 'sched_setaffinity')
+
+        self.threads_per_worker = max(1, self.cores // self.workers)
+        self.opencv_threads = opencv_threads or self.threads_per_worker
+        self.tf_intra_op_threads = tf_intra_op_threads or self.threads_per_worker
+        self.tf_inter_op_threads = tf_inter_op_threads or 1
+
+    @classmethod
+    def from_config(cls, config, workers=None):
+        """
+        Create a budget from the application config.
+
+        Args:
+            config: Flask config (or any mapping) with the CPU_* settings
+            workers (int, optional): Number of workers; defaults to INFERENCE_WORKERS
+
+        Returns:
+            CpuBudget: The budget
+        """
+        cpu_set = config.get('CPU_SET')
+        return cls(
+            cores=config.get('CPU_CORE_BUDGET'),
+            cpus=parse_cpu_list(cpu_set) if cpu_set else None,
+            workers=workers or config.get('INFERENCE_WORKERS'),
+            pin_workers=config.get('CPU_PIN_WORKERS', False),
+            opencv_threads=config.get('OPENCV_THREADS'),
+            tf_intra_op_threads=config.get('TF_INTRA_OP_THREADS'),
+            tf_inter_op_threads=config.get('TF_INTER_OP_THREADS')
+        )
+
+    def worker_cpus(self, index):
+        """
+        Get the CPUs assigned to a worker.
+
+        Args:
+            index (int): Worker index
+
+        Returns:
+            list: CPU indices for the worker
+        """
+        budget_cpus = self.cpus[:self.cores]
+        size = self.threads_per_worker
+        start = (index * size) % len(budget_cpus)
+        return budget_cpus[start:start + size] or budget_cpus[:size]
+
+    def apply(self):
+        """
+        Size the OpenCV and TensorFlow thread pools for this process.
+
+        Must be called before TensorFlow runs its first operation;
+        afterwards its thread counts can no longer be changed and only
+        OpenCV is adjusted.
+        """
+        cv2.setNumThreads(self.opencv_threads)
+        configure_tensorflow_threads(self.tf_intra_op_threads, self.tf_inter_op_threads)
+
+    def bind_current_worker(self, index):
+        """
+        Restrict the calling worker thread or process to its CPUs.
+
+        A pinned worker is bound to its own slice of the budget, otherwise
+        to all budgeted CPUs. Threads the worker creates afterwards (e.g.
+        OpenCV's pool) inherit the affinity.
+
+        Args:
+            index (int): Worker index
+
+        Returns:
+            bool: True if the affinity was changed
+        """
+        if not hasattr(os, 'sched_setaffinity'):
+            return False
+
+        cpus = self.worker_cpus(index) if self.pin_workers else self.cpus[:self.cores]
+        if not self.pin_workers and cpus == available_cpus():
+            return False
+
+        try:
+            # On Linux a thread ID binds just that thread
+            os.sched_setaffinity(threading.get_native_id(), cpus)
+            return True
+        except OSError as e:
+            print(f"Could not bind worker {index} to CPUs {cpus}: {str(e)}")
+            return False
+
+    def get_stats(self):
+        """
+        Get the budget's configuration.
+
+        Returns:
+            dict: Cores, workers and thread counts
+        """
+        return {
+            'cores': self.cores,
+            'cpus': self.cpus[:self.cores],
+            'workers': self.workers,
+            'opencv_threads': self.opencv_threads,
+            'tf_intra_op_threads': self.tf_intra_op_threads,
+            'tf_inter_op_threads': self.tf_inter_op_threads,
+            'pinned': self.pin_workers
+        }
+
+def configure_tensorflow_threads(intra_op_threads, inter_op_threads):
+    """
+    Set TensorFlow's thread pool sizes.
+
+    Args:
+        intra_op_threads (int): Threads used within one operation
+        inter_op_threads (int): Operations run in parallel
+
+    Returns:
+        bool: True if the sizes were applied
+    """
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return False
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        return True
+    except RuntimeError as e:
+        # TensorFlow was already initialized in this process
+        print(f"Could not set TensorFlow thread counts: {str(e)}")
+        return False
@@ -0,0 +1,221 @@
+"""
+Graceful degradation under overload.
+
+When the machine saturates, slowing every stream down evenly makes the
+whole service sluggish. The degradation ladder instead gives up quality
+in a fixed order: while the process stays overloaded (CPU or p95
+processing time above the high thresholds) it climbs one step at a time,
+and once load has stayed below the low thresholds for a while it steps
+back down in reverse. The gap between the thresholds and the minimum
+time spent overloaded or recovered before each step keep it from
+flapping.
+
+The steps, cheapest loss of quality first:
+
+- ``haar_detector``: detect faces with Haar cascades instead of the DNN
+- ``low_resolution``: run face detection on a downscaled frame
+- ``long_interval``: analyze frames less often
+- ``primary_face``: classify only the largest face in each frame
+- ``no_overlay``: stop drawing results onto the video
+"""
+import threading
+import time
+from collections import deque
+import numpy as np
+from flask import current_app
+
+from app.models.rate_controller import cpu_monitor
+
+DEGRADATION_STEPS = ('haar_detector', 'low_resolution', 'long_interval', 'primary_face', 'no_overlay')
+
+class DegradationLadder:
+    """
+    Process-wide degradation level with hysteresis.
+
+    Streams report their processing times with ``record`` and call
+    ``update`` as they go; the level applies to every stream.
+    """
+
+    def __init__(self, steps=DEGRADATION_STEPS, cpu_high=0.9, cpu_low=0.6,
+                 latency_high=1.0, latency_low=0.5, escalate_after=3.0,
+                 recover_after=15.0, evaluate_period=1.0, latency_window=5.0):
+        """
+        Initialize the ladder.
+
+        Args:
+            steps (tuple, optional): Step names in the order they are taken
+                                     (default: DEGRADATION_STEPS)
+            cpu_high (float, optional): CPU utilisation that counts as overloaded (default: 0.9)
+            cpu_low (float, optional): CPU utilisation that counts as recovered (default: 0.6)
+            latency_high (float, optional): p95 processing time in seconds that
+                                            counts as overloaded (default: 1.0)
+            latency_low (float, optional): p95 processing time in seconds that
+                                           counts as recovered (default: 0.5)
+            escalate_after (float, optional): Seconds overloaded before each step up (default: 3)
+            recover_after (float, optional): Seconds recovered before each step down (default: 15)
+            evaluate_period (float, optional): Minimum seconds between evaluations (default: 1)
+            latency_window (float, optional): Seconds of processing times used for p95 (default: 5)
+
+        Raises:
+            ValueError: If a step name is unknown
+        """
+        unknown = [step for step in steps if step not in DEGRADATION_STEPS]
+        if unknown:
+            raise ValueError(f"Unknown degradation steps: {', '.join(unknown)}")
+
+        self.steps = tuple(steps)
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.latency_high = latency_high
+        self.latency_low = latency_low
+        self.escalate_after = escalate_after
+        self.recover_after = recover_after
+        self.evaluate_period = evaluate_period
+        self.latency_window = latency_window
+
+        self.lock = threading.Lock()
+        self.latencies = deque()  # (time, seconds)
+        self.level = 0
+        self.overloaded_since = None
+        self.recovered_since = None
+        self.last_evaluate_time = 0.0
+        self.last_change_time = None
+        self.level_changes = 0
+        self.cpu_utilization = 0.0
+        self.p95_latency = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create a ladder from the application config.
+
+        Args:
+            config: Flask config mapping
+
+        Returns:
+            DegradationLadder: The ladder
+        """
+        spec = config.get('DEGRADATION_STEPS') or ','.join(DEGRADATION_STEPS)
+        steps = [step.strip() for step in spec.split(',') if step.strip()]
+        return cls(
+            steps=steps,
+            cpu_high=config.get('DEGRADATION_CPU_HIGH', 0.9),
+            cpu_low=config.get('DEGRADATION_CPU_LOW', 0.6),
+            latency_high=config.get('DEGRADATION_LATENCY_HIGH', 1.0),
+            latency_low=config.get('DEGRADATION_LATENCY_LOW', 0.5),
+            escalate_after=config.get('DEGRADATION_ESCALATE_AFTER', 3.0),
+            recover_after=config.get('DEGRADATION_RECOVER_AFTER', 15.0)
+        )
+
+    def record(self, latency):
+        """
+        Record the processing time of one analyzed frame.
+
+        Args:
+            latency (float): Seconds taken to analyze the frame
+        """
+        with self.lock:
+            self.latencies.append((time.time(), latency))
+
+    def is_active(self, step):
+        """
+        Check whether a step is currently taken.
+
+        Args:
+            step (str): Step name
+
+        Returns:
+            bool: True if the step is at or below the current level
+        """
+        return step in self.steps[:self.level]
+
+    @property
+    def active_steps(self):
+        """list: Names of the steps currently taken, in order."""
+        return list(self.steps[:self.level])
+
+    def update(self):
+        """
+        Re-evaluate the load and move at most one step.
+
+        Returns:
+            int: The current level
+        """
+        now = time.time()
+        with self.lock:
+            if now - self.last_evaluate_time < self.evaluate_period:
+                return self.level
+            self.last_evaluate_time = now
+
+            while self.latencies and now - self.latencies[0][0] > self.latency_window:
+                self.latencies.popleft()
+            recent = [latency for _, latency in self.latencies]
+            self.p95_latency = float(np.percentile(recent, 95)) if recent else 0.0
+            self.cpu_utilization = cpu_monitor.sample()
+
+            overloaded = self.cpu_utilization > self.cpu_high or self.p95_latency > self.latency_high
+            recovered = self.cpu_utilization < self.cpu_low and self.p95_latency < self.latency_low
+
+            old_level = self.level
+            if overloaded:
+                self.recovered_since = None
+                if self.overloaded_since is None:
+                    self.overloaded_since = now
+                if now - self.overloaded_since >= self.escalate_after and self.level < len(self.steps):
+                    self.level += 1
+                    # Give the new step time to take effect before the next one
+                    self.overloaded_since = now
+            elif recovered:
+                self.overloaded_since = None
+                if self.recovered_since is None:
+                    self.recovered_since = now
+                if now - self.recovered_since >= self.recover_after and self.level > 0:
+                    self.level -= 1
+                    self.recovered_since = now
+            else:
+                # Between the thresholds: hold the current level
+                self.overloaded_since = None
+                self.recovered_since = None
+
+            if self.level != old_level:
+                self.last_change_time = now
+                self.level_changes += 1
+                step = self.steps[max(self.level, old_level) - 1]
+                action = "Degrading" if self.level > old_level else "Restoring"
+                print(f"{action} service: level {old_level} -> {self.level} ({step}); "
+                      f"cpu={self.cpu_utilization:.2f}, p95={self.p95_latency * 1000:.0f}ms")
+            return self.level
+
+    def get_metrics(self):
+        """
+        Get the ladder state for performance reporting.
+
+        Returns:
+            dict: Level, active steps, measured load and change count
+        """
+        return {
+            'level': self.level,
+            'max_level': len(self.steps),
+            'active_steps': self.active_steps,
+            'cpu_utilization': self.cpu_utilization,
+            'p95_latency': self.p95_latency,
+            'changes': self.level_changes,
+            'since_change': time.time() - self.last_change_time if self.last_change_time else None
+        }
+
+# Process-wide ladder, created from the app config on first use
+_degradation_ladder = None
+_degradation_ladder_lock = threading.Lock()
+
+def get_degradation_ladder():
+    """
+    Get the process-wide degradation ladder.
+
+    Returns:
+        DegradationLadder: The ladder, or None if degradation is disabled
+    """
+    global _degradation_ladder
+    with _degradation_ladder_lock:
+        if _degradation_ladder is None and current_app.config.get('DEGRADATION_ENABLED', True):
+            _degradation_ladder = DegradationLadder.from_config(current_app.config)
+        return _degradation_ladder
@@ -197,31 +197,79 @@ class EmotionRecognitionModel:
             predictions = self.model.predict(processed_image, verbose=0)
             
             # Map predictions to emotions
-            result = dict(zip(self.emotions, predictions[0].tolist()))
+            return self._to_result(predictions[0])
             
-            # Apply confidence thresholding
-            max_prob = max(result.values())
-            if max_prob < self.confidence_threshold:
-                # If below threshold, increase probability of 'neutral'
-                for emotion in result:
-                    if emotion == 'neutral':
-                        result[emotion] = max(result[emotion], 0.6)
-                    else:
-                        result[emotion] *= 0.8
-                
-                # Normalize so probabilities sum to 1
-                sum_probs = sum(result.values())
-                for emotion in result:
-                    result[emotion] /= sum_probs
+        except Exception as e:
+            print(f"Error during prediction: {str(e)}")
+            return self._fallback_result()
+    
+    def predict_batch(self, images):
+        """
+        Run inference on several images in a single model call.
+        
+        Args:
+            images (list): List of input images (RGB, self.img_size x self.img_size)
             
-            return result
+        Returns:
+            list: List of dictionaries mapping emotion names to probabilities,
+                  in the same order as the input images
+        """
+        if self.model is None:
+            print("Model not loaded. Call load() first.")
+            return None
+        
+        if len(images) == 0:
+            return []
+        
+        batch = np.stack([self.preprocess_image(image) for image in images])
+        
+        try:
+            predictions = self.model.predict(batch, batch_size=len(batch), verbose=0)
+            return [self._to_result(row) for row in predictions]
             
         except Exception as e:
-            print(f"Error during prediction: {str(e)}")
-            # Return a fallback prediction (neutral emotion)
-            fallback = {emotion: 0.0 for emotion in self.emotions}
-            fallback['neutral'] = 1.0
-            return fallback
+            print(f"Error during batch prediction: {str(e)}")
+            return [self._fallback_result() for _ in images]
+    
+    def _to_result(self, probabilities):
+        """
+        Map a row of model output to emotions and apply confidence thresholding.
+        
+        Args:
+            probabilities (numpy.ndarray): Model output for one image
+            
+        Returns:
+            dict: Dictionary mapping emotion names to probabilities
+        """
+        result = dict(zip(self.emotions, probabilities.tolist()))
+        
+        # Apply confidence thresholding
+        max_prob = max(result.values())
+        if max_prob < self.confidence_threshold:
+            # If below threshold, increase probability of 'neutral'
+            for emotion in result:
+                if emotion == 'neutral':
+                    result[emotion] = max(result[emotion], 0.6)
+                else:
+                    result[emotion] *= 0.8
+            
+            # Normalize so probabilities sum to 1
+            sum_probs = sum(result.values())
+            for emotion in result:
+                result[emotion] /= sum_probs
+        
+        return result
+    
+    def _fallback_result(self):
+        """
+        Build a fallback prediction (neutral emotion) for failed inference.
+        
+        Returns:
+            dict: Dictionary mapping emotion names to probabilities
+        """
+        fallback = {emotion: 0.0 for emotion in self.emotions}
+        fallback['neutral'] = 1.0
+        return fallback
     
     def save(self, save_path=None):
         """
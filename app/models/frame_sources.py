@@ -0,0 +1,503 @@
+"""
+Frame sources for the video processing pipeline.
+
+This module provides interchangeable sources of video frames so the
+emotion recognition pipeline can run against a local webcam, a recorded
+video file, a directory of images, a deterministic synthetic face
+generator or a network stream. Every source exposes the same small
+``open()/read()/release()`` interface as ``cv2.VideoCapture``.
+"""
+import os
+import time
+import threading
+from urllib.parse import parse_qs
+import cv2
+import numpy as np
+
+from app.utils.helpers import is_valid_image
+
+class FrameSource:
+    """
+    Base class for all frame sources.
+
+    Subclasses implement ``_open``, ``_read`` and ``_release``. Sources that
+    can run out of frames (files, image directories) set ``exhausted`` once
+    the last frame has been delivered and looping is disabled.
+    """
+
+    def __init__(self, fps=None, realtime=True):
+        """
+        Initialize the frame source.
+
+        Args:
+            fps (float, optional): Nominal frame rate used for pacing
+            realtime (bool, optional): Whether to pace frames to ``fps`` (default: True)
+        """
+        self.fps = fps
+        self.realtime = realtime
+        self.exhausted = False
+        self.frames_read = 0
+        self._opened = False
+        self._next_frame_time = 0
+
+    def open(self):
+        """
+        Open the source.
+
+        Returns:
+            bool: True if the source is ready to deliver frames
+        """
+        self.exhausted = False
+        self._opened = self._open()
+        self._next_frame_time = time.time()
+        return self._opened
+
+    def read(self):
+        """
+        Read the next frame.
+
+        Returns:
+            tuple: (success flag, BGR frame or None), like ``cv2.VideoCapture.read``
+        """
+        if not self._opened:
+            return False, None
+
+        ret, frame = self._read()
+        if ret:
+            self.frames_read += 1
+            self._pace()
+        return ret, frame
+
+    def release(self):
+        """Release any resources held by the source."""
+        if self._opened:
+            self._release()
+        self._opened = False
+
+    def is_opened(self):
+        """
+        Check whether the source is open.
+
+        Returns:
+            bool: True if the source is open
+        """
+        return self._opened
+
+    def _pace(self):
+        """Sleep so that frames are delivered at the nominal frame rate."""
+        if not self.realtime or not self.fps:
+            return
+
+        self._next_frame_time += 1.0 / self.fps
+        delay = self._next_frame_time - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # Fell behind - don't try to catch up with a burst of frames
+            self._next_frame_time = time.time()
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _release(self):
+        pass
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+class CaptureSource(FrameSource):
+    """Frame source backed by ``cv2.VideoCapture``."""
+
+    def __init__(self, target, fps=None, realtime=True):
+        super().__init__(fps=fps, realtime=realtime)
+        self.target = target
+        self.cap = None
+
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.target)
+        return self.cap.isOpened()
+
+    def _read(self):
+        return self.cap.read()
+
+    def _release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.target!r})"
+
+class WebcamSource(CaptureSource):
+    """
+    Local camera device.
+
+    The camera paces itself, so no additional sleeping is done.
+    """
+
+    def __init__(self, camera_id=0, width=640, height=480):
+        """
+        Initialize the webcam source.
+
+        Args:
+            camera_id (int, optional): Camera device ID (default: 0)
+            width (int, optional): Requested frame width (default: 640)
+            height (int, optional): Requested frame height (default: 480)
+        """
+        super().__init__(camera_id, realtime=False)
+        self.width = width
+        self.height = height
+
+    def _open(self):
+        if not super()._open():
+            return False
+
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return True
+
+class VideoFileSource(CaptureSource):
+    """
+    Recorded video file.
+
+    In real-time mode frames are delivered at the file's own frame rate;
+    otherwise they are decoded as fast as possible.
+    """
+
+    def __init__(self, path, realtime=True, loop=True):
+        """
+        Initialize the video file source.
+
+        Args:
+            path (str): Path to the video file
+            realtime (bool, optional): Pace to the file frame rate (default: True)
+            loop (bool, optional): Restart from the beginning at the end (default: True)
+        """
+        super().__init__(path, realtime=realtime)
+        self.path = path
+        self.loop = loop
+        self.frame_count = 0
+
+    def _open(self):
+        if not super()._open():
+            return False
+
+        file_fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = file_fps if file_fps and file_fps > 0 else 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return True
+
+    def seek(self, frame_index):
+        """
+        Move to a frame index so the next ``read()`` returns that frame.
+
+        Args:
+            frame_index (int): Zero-based frame index
+        """
+        if self.cap is not None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    def _read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.frames_read > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            self.exhausted = True
+        return ret, frame
+
+class NetworkStreamSource(CaptureSource):
+    """
+    Network stream (RTSP, HTTP MJPEG, ...) opened through OpenCV/FFmpeg.
+
+    A local stand-in for a real camera can be served with ``serve_mjpeg``.
+    """
+
+    def __init__(self, url):
+        """
+        Initialize the network stream source.
+
+        Args:
+            url (str): Stream URL
+        """
+        super().__init__(url, realtime=False)
+        self.url = url
+
+class ImageDirectorySource(FrameSource):
+    """Directory of still images played back in file name order."""
+
+    def __init__(self, directory, fps=10.0, realtime=True, loop=True):
+        """
+        Initialize the image directory source.
+
+        Args:
+            directory (str): Directory containing the images
+            fps (float, optional): Playback frame rate (default: 10)
+            realtime (bool, optional): Pace playback to ``fps`` (default: True)
+            loop (bool, optional): Restart from the first image at the end (default: True)
+        """
+        super().__init__(fps=fps, realtime=realtime)
+        self.directory = directory
+        self.loop = loop
+        self.paths = []
+        self.position = 0
+
+    def _open(self):
+        if not os.path.isdir(self.directory):
+            return False
+
+        self.paths = [
+            os.path.join(self.directory, name)
+            for name in sorted(os.listdir(self.directory))
+            if is_valid_image(name)
+        ]
+        self.position = 0
+        return bool(self.paths)
+
+    def _read(self):
+        # Skip files OpenCV can't decode rather than stalling the stream
+        for _ in range(len(self.paths)):
+            if self.position >= len(self.paths):
+                if not self.loop:
+                    self.exhausted = True
+                    return False, None
+                self.position = 0
+
+            frame = cv2.imread(self.paths[self.position])
+            self.position += 1
+            if frame is not None:
+                return True, frame
+
+        self.exhausted = True
+        return False, None
+
+    def __repr__(self):
+        return f"ImageDirectorySource({self.directory!r})"
+
+class SyntheticFaceSource(FrameSource):
+    """
+    Deterministic synthetic face generator.
+
+    Draws simple cartoon faces that drift across a textured background.
+    Frame ``n`` is a pure function of ``(seed, n)``, so benchmark runs are
+    reproducible without any camera or media files.
+    """
+
+    def __init__(self, seed=0, num_faces=1, width=640, height=480, fps=30.0,
+                 realtime=True, num_frames=None):
+        """
+        Initialize the synthetic source.
+
+        Args:
+            seed (int, optional): Random seed for face placement (default: 0)
+            num_faces (int, optional): Number of faces per frame (default: 1)
+            width (int, optional): Frame width (default: 640)
+            height (int, optional): Frame height (default: 480)
+            fps (float, optional): Nominal frame rate (default: 30)
+            realtime (bool, optional): Pace frames to ``fps`` (default: True)
+            num_frames (int, optional): Stop after this many frames (default: unlimited)
+        """
+        super().__init__(fps=fps, realtime=realtime)
+        self.seed = seed
+        self.num_faces = num_faces
+        self.width = width
+        self.height = height
+        self.num_frames = num_frames
+        self.position = 0
+
+    def _open(self):
+        rng = np.random.default_rng(self.seed)
+        self.background = rng.integers(40, 90, (self.height, self.width, 3), dtype=np.uint8)
+        self.background = cv2.GaussianBlur(self.background, (0, 0), 3)
+
+        # Per-face motion parameters: base position, size, drift phase and speed
+        self.faces = []
+        for _ in range(self.num_faces):
+            size = int(rng.integers(90, 150))
+            self.faces.append({
+                'cx': float(rng.uniform(size, self.width - size)),
+                'cy': float(rng.uniform(size, self.height - size)),
+                'size': size,
+                'phase': float(rng.uniform(0, 2 * np.pi)),
+                'speed': float(rng.uniform(0.02, 0.06)),
+                'smile_phase': float(rng.uniform(0, 2 * np.pi)),
+            })
+        self.position = 0
+        return True
+
+    def _read(self):
+        if self.num_frames is not None and self.position >= self.num_frames:
+            self.exhausted = True
+            return False, None
+
+        frame = self.render(self.position)
+        self.position += 1
+        return True, frame
+
+    def render(self, index):
+        """
+        Render a single frame.
+
+        Args:
+            index (int): Frame index
+
+        Returns:
+            numpy.ndarray: BGR frame
+        """
+        frame = self.background.copy()
+        for face in self.faces:
+            t = index * face['speed'] + face['phase']
+            cx = int(face['cx'] + 40 * np.sin(t))
+            cy = int(face['cy'] + 20 * np.cos(t * 0.7))
+            self._draw_face(frame, cx, cy, face['size'], np.sin(index * 0.05 + face['smile_phase']))
+        return frame
+
+    @staticmethod
+    def _draw_face(frame, cx, cy, size, smile):
+        """Draw a single cartoon face centred on ``(cx, cy)``."""
+        half_w, half_h = size // 2, int(size * 0.65)
+        eye_dx, eye_y = size // 5, cy - size // 6
+        eye_r = max(3, size // 14)
+
+        cv2.ellipse(frame, (cx, cy), (half_w, half_h), 0, 0, 360, (140, 170, 215), -1)
+        for sign in (-1, 1):
+            ex = cx + sign * eye_dx
+            cv2.ellipse(frame, (ex, eye_y), (eye_r * 2, eye_r), 0, 0, 360, (245, 245, 245), -1)
+            cv2.circle(frame, (ex, eye_y), eye_r, (40, 30, 30), -1)
+            cv2.line(frame, (ex - eye_r * 2, eye_y - eye_r * 3), (ex + eye_r * 2, eye_y - eye_r * 3),
+                     (50, 40, 40), max(2, size // 30))
+        cv2.line(frame, (cx, cy - size // 12), (cx, cy + size // 8), (110, 130, 170), 2)
+
+        # Mouth curvature oscillates between a frown and a smile
+        mouth_w = size // 4
+        mouth_y = cy + size // 3
+        curve = int(smile * size // 10)
+        start, end = (0, 180) if curve >= 0 else (180, 360)
+        cv2.ellipse(frame, (cx, mouth_y - max(curve, 0)), (mouth_w, max(abs(curve), 2)), 0,
+                    start, end, (60, 40, 150), max(2, size // 25))
+
+    def __repr__(self):
+        return f"SyntheticFaceSource(seed={self.seed}, num_faces={self.num_faces})"
+
+def _flag(value, default):
+    """Parse a boolean query string flag."""
+    if value is None:
+        return default
+    return value.lower() not in ('0', 'false', 'no', 'off')
+
+def create_frame_source(spec):
+    """
+    Create a frame source from a specification.
+
+    Supported specifications:
+        - ``FrameSource`` instance: returned unchanged
+        - ``0`` / ``"0"`` / ``"webcam:0"``: local camera device
+        - ``"file:/path/video.mp4?realtime=0&loop=0"``: recorded video file
+        - ``"images:/path/dir?fps=5"``: directory of images
+        - ``"synthetic:42?faces=2&fps=15"``: synthetic face generator with seed 42
+        - ``"rtsp://..."``, ``"http://..."``, ``"https://..."``: network stream
+
+    Args:
+        spec: Source specification
+
+    Returns:
+        FrameSource: The frame source
+
+    Raises:
+        ValueError: If the specification is not recognised
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, int):
+        return WebcamSource(spec)
+
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return WebcamSource(int(spec))
+
+    scheme, _, rest = spec.partition(':')
+    scheme = scheme.lower()
+    if scheme in ('rtsp', 'rtmp', 'http', 'https'):
+        return NetworkStreamSource(spec)
+
+    path, _, query = rest.partition('?')
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    realtime = _flag(params.get('realtime'), True)
+    loop = _flag(params.get('loop'), True)
+
+    if scheme == 'webcam':
+        return WebcamSource(
+            int(path or 0),
+            width=int(params.get('width', 640)),
+            height=int(params.get('height', 480))
+        )
+    if scheme == 'file':
+        return VideoFileSource(path, realtime=realtime, loop=loop)
+    if scheme == 'images':
+        return ImageDirectorySource(path, fps=float(params.get('fps', 10.0)), realtime=realtime, loop=loop)
+    if scheme == 'synthetic':
+        return SyntheticFaceSource(
+            seed=int(path or 0),
+            num_faces=int(params.get('faces', 1)),
+            width=int(params.get('width', 640)),
+            height=int(params.get('height', 480)),
+            fps=float(params.get('fps', 30.0)),
+            realtime=realtime,
+            num_frames=int(params['frames']) if 'frames' in params else None
+        )
+
+    raise ValueError(f"Unknown frame source: {spec}")
+
+def serve_mjpeg(source, host='127.0.0.1', port=0, quality=80):
+    """
+    Serve a frame source as an HTTP MJPEG stream.
+
+    This is a local stand-in for an IP camera so ``NetworkStreamSource``
+    can be exercised without real hardware.
+
+    Args:
+        source: Frame source or specification (see ``create_frame_source``)
+        host (str, optional): Interface to bind (default: 127.0.0.1)
+        port (int, optional): Port to bind, 0 for any free port (default: 0)
+        quality (int, optional): JPEG quality (default: 80)
+
+    Returns:
+        tuple: (server, url) - call ``server.shutdown()`` to stop serving
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    source = create_frame_source(source)
+    source.open()
+    source_lock = threading.Lock()
+
+    class MJPEGHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+            self.end_headers()
+            try:
+                while True:
+                    with source_lock:
+                        ret, frame = source.read()
+                    if not ret:
+                        break
+                    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                    if not ok:
+                        continue
+                    self.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\n'
+                                     + f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                                     + jpeg.tobytes() + b'\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MJPEGHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{host}:{server.server_address[1]}/stream.mjpg"
+    return server, url
@@ -0,0 +1,520 @@
+"""
+Shared fair-share inference scheduler for the facial emotion recognition system.
+
+All face detection and emotion inference work - from video streams and
+from frames pushed by browsers - is queued here instead of running on the
+callers' threads. Worker threads take the work in weighted fair order:
+each user is weighted by the share of capacity they request (see
+``set_client_share``) times the weight of the request's priority class, so
+under overload every user keeps a predictable slice instead of whoever
+wins the GIL getting served. Face crops queued by different users are run
+through the single shared model as one batch.
+
+Ordering uses start-time fair queuing: a request's start tag is the later
+of the scheduler's virtual time and the finish tag of the user's previous
+request, its finish tag adds ``cost / weight``, and the request with the
+smallest start tag runs next.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+import numpy as np
+from flask import current_app
+
+from app.models.emotion_model import EmotionRecognitionModel
+from app.models.cpu_budget import CpuBudget
+
+# Requested share of inference capacity per client, 0-1 (e.g. a stream
+# analysing every 5th frame requests 0.2). Clients without an entry
+# request a full share.
+client_shares = {}
+_client_shares_lock = threading.Lock()
+
+def set_client_share(client_id, share):
+    """
+    Record the share of inference capacity a client asks for.
+
+    Args:
+        client_id: ID of the client
+        share (float): Requested share between 0 and 1
+    """
+    with _client_shares_lock:
+        client_shares[client_id] = min(1.0, max(0.0, share))
+
+def clear_client_share(client_id):
+    """
+    Forget a client's requested share.
+
+    Args:
+        client_id: ID of the client
+    """
+    with _client_shares_lock:
+        client_shares.pop(client_id, None)
+
+def get_client_share(client_id):
+    """
+    Get the share of inference capacity a client asks for.
+
+    Args:
+        client_id: ID of the client
+
+    Returns:
+        float: Requested share between 0 and 1
+    """
+    return client_shares.get(client_id, 1.0)
+
+# Scheduling weight of each priority class: interactive work (someone is
+# watching the result) is served before background work (streams nobody
+# is viewing, recording only)
+PRIORITY_WEIGHTS = {
+    'interactive': 4.0,
+    'background': 1.0,
+}
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue cannot take more work."""
+
+class InferenceRequest:
+    """A unit of scheduled work: face crops to classify, or a function to run."""
+
+    def __init__(self, client_id, faces=None, function=None, priority='interactive', cost=None):
+        """
+        Initialize the request.
+
+        Args:
+            client_id: ID of the submitting client
+            faces (list, optional): Preprocessed face images to classify
+            function (callable, optional): Function to run instead, e.g. face detection
+            priority (str, optional): Priority class (default: interactive)
+            cost (float, optional): Scheduling cost; defaults to the number of faces, or 1
+        """
+        self.client_id = client_id
+        self.faces = faces if faces is not None else []
+        self.function = function
+        self.priority = priority
+        self.cost = cost if cost is not None else max(1, len(self.faces))
+        self.results = None
+        self.error = None
+        self.cancelled = False
+        self.submitted_time = time.time()
+        self.started_time = None
+        self.completed_time = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the results.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait
+
+        Returns:
+            Emotion dictionaries (one per face), or the function's return value
+
+        Raises:
+            TimeoutError: If the results did not arrive in time
+            RuntimeError: If the work failed
+        """
+        if not self.done.wait(timeout):
+            # Nobody wants the results any more - don't spend capacity on them
+            self.cancelled = True
+            raise TimeoutError("Timed out waiting for emotion inference")
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        return self.results
+
+    def _finish(self, results=None, error=None):
+        """Complete the request and wake the waiting client."""
+        self.results = results
+        self.error = error
+        self.completed_time = time.time()
+        self.done.set()
+
+class _ClientState:
+    """Per-client scheduling state and statistics."""
+
+    def __init__(self, wait_window):
+        self.last_finish = 0.0
+        self.queued = 0
+        self.served = 0
+        self.priority = None
+        self.weight = 1.0
+        self.wait_times = deque(maxlen=wait_window)
+        self.last_seen = time.time()
+
+class BatchInferenceService:
+    """
+    Weighted fair-share scheduler with batched inference on one shared model.
+    """
+
+    def __init__(self, app, max_batch_size=32, max_batch_wait=0.01, max_queue_size=256,
+                 num_workers=1, priority_weights=None, wait_window=100, cpu_budget=None):
+        """
+        Initialize the service.
+
+        Args:
+            app: Flask application used for model configuration
+            max_batch_size (int, optional): Maximum faces per model call (default: 32)
+            max_batch_wait (float, optional): Seconds to wait for more work
+                                              before running a partial batch (default: 0.01)
+            max_queue_size (int, optional): Maximum number of pending requests (default: 256)
+            num_workers (int, optional): Number of worker threads (default: 1)
+            priority_weights (dict, optional): Weight per priority class
+                                               (default: PRIORITY_WEIGHTS)
+            wait_window (int, optional): Number of recent waits kept per client (default: 100)
+            cpu_budget (CpuBudget, optional): Thread budget applied before the model
+                                              loads, and used to bind the workers to CPUs
+        """
+        self.app = app
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        self.max_queue_size = max_queue_size
+        self.num_workers = max(1, num_workers)
+        self.priority_weights = priority_weights or PRIORITY_WEIGHTS
+        self.wait_window = wait_window
+        self.cpu_budget = cpu_budget
+
+        self.condition = threading.Condition()
+        self.heap = []  # (start tag, sequence, request)
+        self.sequence = itertools.count()
+        self.virtual_time = 0.0
+        self.clients = {}  # client_id -> _ClientState
+
+        self.model = None
+        self.model_lock = threading.Lock()
+        self.running = False
+        self.threads = []
+
+        # Statistics
+        self.batches_run = 0
+        self.faces_processed = 0
+        self.jobs_run = 0
+        self.total_batch_time = 0.0
+
+    def start(self):
+        """
+        Load the model and start the worker threads.
+
+        Returns:
+            bool: True if the model loaded successfully
+        """
+        if self.running:
+            return True
+
+        # TensorFlow's pool sizes are fixed once it runs its first operation
+        if self.cpu_budget is not None:
+            self.cpu_budget.apply()
+
+        with self.app.app_context():
+            model = EmotionRecognitionModel()
+            if not model.load():
+                print("Failed to load emotion model for batch inference")
+                return False
+        self.model = model
+
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self._run, args=(i,), name=f'inference-worker-{i}', daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+        return True
+
+    def stop(self):
+        """Stop the worker threads."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+    def _weight(self, client_id, priority):
+        """Scheduling weight of a client's request."""
+        class_weight = self.priority_weights.get(priority, 1.0)
+        # A zero share must not stop a client being served entirely
+        return max(get_client_share(client_id), 0.01) * class_weight
+
+    def _enqueue(self, request):
+        """Tag a request and add it to the fair queue."""
+        with self.condition:
+            if len(self.heap) >= self.max_queue_size:
+                raise InferenceQueueFull("Inference queue is full")
+
+            state = self.clients.get(request.client_id)
+            if state is None:
+                state = self.clients[request.client_id] = _ClientState(self.wait_window)
+            state.weight = self._weight(request.client_id, request.priority)
+            state.priority = request.priority
+            state.queued += 1
+            state.last_seen = time.time()
+
+            start_tag = max(self.virtual_time, state.last_finish)
+            state.last_finish = start_tag + request.cost / state.weight
+            heapq.heappush(self.heap, (start_tag, next(self.sequence), request))
+            self.condition.notify()
+        return request
+
+    def submit(self, client_id, faces, priority='interactive'):
+        """
+        Queue face crops for classification.
+
+        Args:
+            client_id: ID of the submitting client
+            faces (list): Preprocessed face images
+            priority (str, optional): Priority class (default: interactive)
+
+        Returns:
+            InferenceRequest: Request to wait on for the results
+
+        Raises:
+            InferenceQueueFull: If too much work is already pending
+        """
+        request = InferenceRequest(client_id, faces=faces, priority=priority)
+        if not faces:
+            request._finish([])
+            return request
+        return self._enqueue(request)
+
+    def predict(self, client_id, faces, timeout=5.0, priority='interactive'):
+        """
+        Classify face crops, blocking until the results are available.
+
+        Args:
+            client_id: ID of the submitting client
+            faces (list): Preprocessed face images
+            timeout (float, optional): Maximum number of seconds to wait (default: 5)
+            priority (str, optional): Priority class (default: interactive)
+
+        Returns:
+            list: Emotion dictionaries, one per face
+        """
+        return self.submit(client_id, faces, priority).wait(timeout)
+
+    def run(self, client_id, function, timeout=5.0, priority='interactive', cost=1.0):
+        """
+        Run a function (e.g. face detection) on a worker in the client's fair order.
+
+        Args:
+            client_id: ID of the submitting client
+            function (callable): Function taking no arguments
+            timeout (float, optional): Maximum number of seconds to wait (default: 5)
+            priority (str, optional): Priority class (default: interactive)
+            cost (float, optional): Scheduling cost relative to one face (default: 1)
+
+        Returns:
+            The function's return value
+        """
+        request = InferenceRequest(client_id, function=function, priority=priority, cost=cost)
+        return self._enqueue(request).wait(timeout)
+
+    def _pop(self):
+        """Take the next request in fair order (condition held)."""
+        start_tag, _, request = heapq.heappop(self.heap)
+        self.virtual_time = max(self.virtual_time, start_tag)
+
+        state = self.clients[request.client_id]
+        state.queued -= 1
+        request.started_time = time.time()
+        if not request.cancelled:
+            state.served += 1
+            state.wait_times.append(request.started_time - request.submitted_time)
+        return request
+
+    def _next_work(self):
+        """
+        Wait for the next piece of work.
+
+        Returns:
+            list: A function request on its own, or face requests to batch;
+                  None once the service is stopping
+        """
+        with self.condition:
+            while True:
+                while self.running and not self.heap:
+                    self.condition.wait(0.5)
+                if not self.running:
+                    return None
+
+                first = self._pop()
+                if first.cancelled:
+                    continue
+                if first.function is not None:
+                    return [first]
+
+                # Batch face requests that are next in fair order
+                batch = [first]
+                size = len(first.faces)
+                deadline = time.time() + self.max_batch_wait
+                while size < self.max_batch_size:
+                    if self.heap:
+                        head = self.heap[0][2]
+                        if head.function is not None:
+                            break
+                        if head.cancelled:
+                            self._pop()
+                            continue
+                        if size + len(head.faces) > self.max_batch_size:
+                            break
+                        batch.append(self._pop())
+                        size += len(head.faces)
+                        continue
+
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                return batch
+
+    def _run(self, index=0):
+        """Worker thread function."""
+        if self.cpu_budget is not None:
+            self.cpu_budget.bind_current_worker(index)
+
+        while True:
+            work = self._next_work()
+            if work is None:
+                return
+
+            if work[0].function is not None:
+                request = work[0]
+                try:
+                    request._finish(request.function())
+                except Exception as e:
+                    print(f"Error in scheduled job: {str(e)}")
+                    request._finish(error=str(e))
+                with self.condition:
+                    self.jobs_run += 1
+                continue
+
+            faces = [face for request in work for face in request.faces]
+            start_time = time.time()
+            try:
+                with self.model_lock:
+                    predictions = self.model.predict_batch(faces)
+                if predictions is None or len(predictions) != len(faces):
+                    raise RuntimeError("Emotion model returned no results for the batch")
+
+                # Hand each client its slice of the batch results
+                offset = 0
+                for request in work:
+                    count = len(request.faces)
+                    request._finish(predictions[offset:offset + count])
+                    offset += count
+            except Exception as e:
+                # Fail whatever is still waiting rather than leave it blocked
+                print(f"Error in batch inference: {str(e)}")
+                for request in work:
+                    if not request.done.is_set():
+                        request._finish(error=str(e))
+            batch_time = time.time() - start_time
+
+            with self.condition:
+                self.batches_run += 1
+                self.faces_processed += len(faces)
+                self.total_batch_time += batch_time
+
+    def get_client_stats(self, client_id):
+        """
+        Get scheduling statistics for one client.
+
+        Args:
+            client_id: ID of the client
+
+        Returns:
+            dict: Weight, priority, queue length and wait times, or None if unknown
+        """
+        with self.condition:
+            state = self.clients.get(client_id)
+            if state is None:
+                return None
+            waits = list(state.wait_times)
+            return {
+                'share': get_client_share(client_id),
+                'priority': state.priority,
+                'weight': state.weight,
+                'queued': state.queued,
+                'served': state.served,
+                'avg_wait': float(np.mean(waits)) if waits else 0.0,
+                'p95_wait': float(np.percentile(waits, 95)) if waits else 0.0
+            }
+
+    def _prune_clients(self, max_idle=300.0):
+        """Forget clients with nothing queued that haven't been seen for a while."""
+        now = time.time()
+        with self.condition:
+            for client_id, state in list(self.clients.items()):
+                if state.queued == 0 and now - state.last_seen > max_idle:
+                    del self.clients[client_id]
+
+    def get_stats(self):
+        """
+        Get scheduling and batching statistics.
+
+        Returns:
+            dict: Queue depth, batch counts, average batch size and time,
+                  and per-client wait times
+        """
+        self._prune_clients()
+        with self.condition:
+            client_ids = list(self.clients)
+            queue_depth = len(self.heap)
+            batches, faces, jobs = self.batches_run, self.faces_processed, self.jobs_run
+            total_batch_time = self.total_batch_time
+
+        return {
+            'queue_depth': queue_depth,
+            'workers': self.num_workers,
+            'cpu_budget': self.cpu_budget.get_stats() if self.cpu_budget is not None else None,
+            'requested_shares': sum(client_shares.values()),
+            'batches': batches,
+            'faces': faces,
+            'jobs': jobs,
+            'avg_batch_size': faces / batches if batches else 0,
+            'avg_batch_time': total_batch_time / batches if batches else 0,
+            'clients': {str(client_id): self.get_client_stats(client_id) for client_id in client_ids}
+        }
+
+# Process-wide service, created from the app config on first use
+_inference_service = None
+_inference_service_lock = threading.Lock()
+
+def get_inference_service():
+    """
+    Get the process-wide inference scheduler, starting it if needed.
+
+    Returns:
+        BatchInferenceService: The running service, or None if the model failed to load
+    """
+    global _inference_service
+    with _inference_service_lock:
+        if _inference_service is None:
+            config = current_app.config
+            cpu_budget = CpuBudget.from_config(config)
+            service = BatchInferenceService(
+                current_app._get_current_object(),
+                max_batch_size=config.get('INFERENCE_BATCH_SIZE', 32),
+                max_batch_wait=config.get('INFERENCE_BATCH_WAIT', 0.01),
+                max_queue_size=config.get('INFERENCE_QUEUE_SIZE', 256),
+                num_workers=cpu_budget.workers,
+                priority_weights={
+                    'interactive': config.get('INTERACTIVE_PRIORITY_WEIGHT', 4.0),
+                    'background': config.get('BACKGROUND_PRIORITY_WEIGHT', 1.0)
+                },
+                cpu_budget=cpu_budget
+            )
+            if not service.start():
+                return None
+            _inference_service = service
+        return _inference_service
+
+def peek_inference_service():
+    """
+    Get the inference scheduler without starting it.
+
+    Returns:
+        BatchInferenceService: The service, or None if it hasn't been started
+    """
+    return _inference_service
@@ -4,6 +4,7 @@ Image preprocessing module for facial emotion recognition.
 This module handles face detection and preprocessing of images before
 being fed to the emotion recognition model.
 """
+import threading
 import cv2
 import numpy as np
 from flask import current_app
@@ -43,10 +44,45 @@ class FacePreprocessor:
         # Get image size from config
         self.img_size = current_app.config['IMG_SIZE']
         
+        # Scale factor applied to frames before face detection (1.0 = full size)
+        self.detection_scale = 1.0
+        
+        # Keep only the largest N faces (None = all), e.g. under overload
+        self.max_faces = None
+        
+        # Detector chosen at startup, restored by use_detector()
+        self.configured_detector = self.detector_type
+        
         # Face tracking for stability
         self.prev_faces = []
         self.tracking_threshold = 30  # pixel distance threshold for face tracking
         self.max_tracking_history = 5  # number of frames to keep track of
+        
+        # The detector network and the tracking state aren't thread-safe;
+        # one detection runs at a time
+        self.lock = threading.Lock()
+    
+    def use_detector(self, detector_type):
+        """
+        Switch the face detector at runtime.
+        
+        The DNN detector is only available if it loaded at startup; the
+        Haar cascade is loaded on first use.
+        
+        Args:
+            detector_type (str): 'haar' or 'dnn'
+            
+        Returns:
+            str: The detector now in use
+        """
+        if detector_type == 'dnn' and getattr(self, 'face_net', None) is None:
+            return self.detector_type
+        if detector_type == 'haar' and getattr(self, 'face_cascade', None) is None:
+            cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+            self.face_cascade = cv2.CascadeClassifier(cascade_path)
+        
+        self.detector_type = detector_type
+        return self.detector_type
     
     def detect_faces(self, image):
         """
@@ -58,10 +94,24 @@ class FacePreprocessor:
         Returns:
             list: List of face rectangles (x, y, w, h)
         """
+        # Optionally detect on a downscaled copy to save time
+        scale = self.detection_scale
+        if scale < 1.0:
+            detect_image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            detect_image = image
+        
         if self.detector_type == 'dnn':
-            return self._detect_faces_dnn(image)
+            faces = self._detect_faces_dnn(detect_image)
         else:
-            return self._detect_faces_haar(image)
+            faces = self._detect_faces_haar(detect_image)
+        
+        # Map rectangles back to full-resolution coordinates
+        if scale < 1.0:
+            faces = [tuple(int(v / scale) for v in face) for face in faces]
+        
+        # Apply face tracking for stability
+        return self._track_faces(faces)
     
     def _detect_faces_haar(self, image):
         """
@@ -71,7 +121,7 @@ class FacePreprocessor:
             image (numpy.ndarray): Input image (BGR format from OpenCV)
             
         Returns:
-            list: List of face rectangles (x, y, w, h)
+            list: List of untracked face rectangles (x, y, w, h)
         """
         # Convert image to grayscale for face detection
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -99,8 +149,7 @@ class FacePreprocessor:
             )
             faces_list = [tuple(face) for face in faces] if len(faces) > 0 else []
         
-        # Apply face tracking for stability
-        return self._track_faces(faces_list)
+        return faces_list
     
     def _detect_faces_dnn(self, image):
         """
@@ -110,7 +159,7 @@ class FacePreprocessor:
             image (numpy.ndarray): Input image (BGR format from OpenCV)
             
         Returns:
-            list: List of face rectangles (x, y, w, h)
+            list: List of untracked face rectangles (x, y, w, h)
         """
         (h, w) = image.shape[:2]
         blob = cv2.dnn.blobFromImage(
@@ -141,8 +190,7 @@ class FacePreprocessor:
                 if 0 <= x < image.shape[1] and 0 <= y < image.shape[0] and w > 0 and h > 0:
                     faces.append((x, y, w, h))
         
-        # Apply face tracking for stability
-        return self._track_faces(faces)
+        return faces
     
     def _track_faces(self, detected_faces):
         """
@@ -260,9 +308,18 @@ class FacePreprocessor:
         Returns:
             tuple: (List of preprocessed face images, List of face rectangles)
         """
+        with self.lock:
+            return self._detect_and_preprocess(image)
+    
+    def _detect_and_preprocess(self, image):
+        """Detect and preprocess all faces in an image (lock held)."""
         # Detect faces
         face_rects = self.detect_faces(image)
         
+        # Optionally keep only the largest faces
+        if self.max_faces is not None and len(face_rects) > self.max_faces:
+            face_rects = sorted(face_rects, key=lambda rect: rect[2] * rect[3], reverse=True)[:self.max_faces]
+        
         # Preprocess each face
         preprocessed_faces = []
         for face_rect in face_rects:
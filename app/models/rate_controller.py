@@ -0,0 +1,181 @@
+"""
+Adaptive frame-rate control for video streams.
+
+This module adjusts how often each stream analyzes a frame, and optionally
+the resolution used for face detection, so the process stays close to a
+target CPU utilisation and p95 processing latency instead of using the
+static FRAME_INTERVAL for every stream.
+"""
+import os
+import threading
+import time
+import numpy as np
+
+class CpuMonitor:
+    """
+    Process-wide CPU utilisation sampler.
+
+    Utilisation is process CPU time over wall time, divided by the number
+    of cores, so 1.0 means every core is busy with this process. Samples
+    are cached briefly because every stream asks for them.
+    """
+
+    def __init__(self, min_sample_period=0.5):
+        self.min_sample_period = min_sample_period
+        self.cpu_count = os.cpu_count() or 1
+        self.lock = threading.Lock()
+        self.last_wall = time.time()
+        self.last_cpu = time.process_time()
+        self.utilization = 0.0
+
+    def sample(self):
+        """
+        Get the CPU utilisation since the previous sample.
+
+        Returns:
+            float: Utilisation between 0 and 1
+        """
+        with self.lock:
+            now = time.time()
+            elapsed = now - self.last_wall
+            if elapsed >= self.min_sample_period:
+                cpu_now = time.process_time()
+                self.utilization = min(1.0, (cpu_now - self.last_cpu) / elapsed / self.cpu_count)
+                self.last_wall = now
+                self.last_cpu = cpu_now
+            return self.utilization
+
+# Shared by all streams in the process
+cpu_monitor = CpuMonitor()
+
+class AdaptiveIntervalController:
+    """
+    Feedback controller for a stream's processing interval.
+
+    Under load (CPU or p95 latency above target) the interval grows
+    multiplicatively and, once it is at its maximum, the detection
+    resolution steps down. With comfortable headroom the resolution is
+    restored first and then the interval shrinks gradually. The gap
+    between the overload and headroom thresholds avoids oscillation.
+    """
+
+    def __init__(self, base_interval=0.1, min_interval=0.05, max_interval=1.0,
+                 target_cpu=0.75, target_latency=0.5, adjust_period=2.0,
+                 adapt_resolution=False, detection_scales=(1.0, 0.75, 0.5),
+                 latency_window=20, headroom=0.8):
+        """
+        Initialize the controller.
+
+        Args:
+            base_interval (float, optional): Starting interval in seconds (default: 0.1)
+            min_interval (float, optional): Shortest allowed interval (default: 0.05)
+            max_interval (float, optional): Longest allowed interval (default: 1.0)
+            target_cpu (float, optional): Target process CPU utilisation, 0-1 (default: 0.75)
+            target_latency (float, optional): Target p95 processing time in seconds (default: 0.5)
+            adjust_period (float, optional): Seconds between adjustments (default: 2.0)
+            adapt_resolution (bool, optional): Also lower the detection resolution (default: False)
+            detection_scales (tuple, optional): Detection scales to step through (default: 1, 0.75, 0.5)
+            latency_window (int, optional): Number of recent timings used for p95 (default: 20)
+            headroom (float, optional): Fraction of the targets below which the
+                                        controller speeds back up (default: 0.8)
+        """
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_cpu = target_cpu
+        self.target_latency = target_latency
+        self.adjust_period = adjust_period
+        self.adapt_resolution = adapt_resolution
+        self.detection_scales = detection_scales
+        self.latency_window = latency_window
+        self.headroom = headroom
+
+        self.interval = min(max(base_interval, min_interval), max_interval)
+        self.scale_index = 0
+        self.last_adjust_time = time.time()
+        self.cpu_utilization = 0.0
+        self.p95_latency = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create a controller from the application config.
+
+        The configured FRAME_INTERVAL is the shortest interval used: the
+        controller only slows a stream down under load, and speeds it back
+        up to that rate, never past it.
+
+        Args:
+            config: Flask config mapping
+
+        Returns:
+            AdaptiveIntervalController: The controller
+        """
+        base_interval = config.get('FRAME_INTERVAL', 0.1)
+        return cls(
+            base_interval=base_interval,
+            min_interval=max(config.get('MIN_FRAME_INTERVAL', 0.05), base_interval),
+            max_interval=config.get('MAX_FRAME_INTERVAL', 1.0),
+            target_cpu=config.get('TARGET_CPU_UTILIZATION', 0.75),
+            target_latency=config.get('TARGET_P95_LATENCY', 0.5),
+            adjust_period=config.get('RATE_ADJUST_PERIOD', 2.0),
+            adapt_resolution=config.get('ADAPTIVE_DETECTION_RESOLUTION', False)
+        )
+
+    @property
+    def detection_scale(self):
+        """float: Current scale factor for face detection input."""
+        return self.detection_scales[self.scale_index]
+
+    def update(self, inference_times):
+        """
+        Adjust the interval from the latest measurements.
+
+        Args:
+            inference_times (list): Recent per-frame processing times in seconds
+
+        Returns:
+            bool: True if the interval or detection scale changed
+        """
+        now = time.time()
+        if now - self.last_adjust_time < self.adjust_period:
+            return False
+        self.last_adjust_time = now
+
+        recent = inference_times[-self.latency_window:]
+        self.p95_latency = float(np.percentile(recent, 95)) if recent else 0.0
+        self.cpu_utilization = cpu_monitor.sample()
+
+        overloaded = (self.cpu_utilization > self.target_cpu or
+                      self.p95_latency > self.target_latency)
+        idle = (self.cpu_utilization < self.target_cpu * self.headroom and
+                self.p95_latency < self.target_latency * self.headroom)
+
+        interval, scale_index = self.interval, self.scale_index
+        if overloaded:
+            if self.interval < self.max_interval:
+                self.interval = min(self.max_interval, self.interval * 1.25)
+            elif self.adapt_resolution and self.scale_index < len(self.detection_scales) - 1:
+                self.scale_index += 1
+        elif idle:
+            if self.scale_index > 0:
+                self.scale_index -= 1
+            elif self.interval > self.min_interval:
+                self.interval = max(self.min_interval, self.interval / 1.1)
+
+        return interval != self.interval or scale_index != self.scale_index
+
+    def get_metrics(self):
+        """
+        Get the controller state for performance reporting.
+
+        Returns:
+            dict: Current interval, rate, detection scale and measured load
+        """
+        return {
+            'frame_interval': self.interval,
+            'target_analysis_rate': 1.0 / self.interval if self.interval else 0.0,
+            'detection_scale': self.detection_scale,
+            'cpu_utilization': self.cpu_utilization,
+            'p95_inference_time': self.p95_latency
+        }
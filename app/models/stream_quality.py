@@ -0,0 +1,149 @@
+"""
+Quality tiers for the MJPEG video feed.
+
+A tier is a maximum frame width and JPEG quality, optionally with a frame
+rate cap (e.g. a thumbnail-only tier). Viewers ask for a tier or get the
+default one, and a ViewerQuality per viewer steps a slow client down to
+cheaper tiers when its sends start backing up, and back up once they
+recover.
+"""
+import time
+from collections import namedtuple
+import cv2
+
+QualityTier = namedtuple('QualityTier', ['name', 'max_width', 'quality', 'max_fps'])
+
+def parse_quality_tiers(spec):
+    """
+    Parse a tier specification.
+
+    The specification lists tiers from best to cheapest as comma separated
+    ``name:max_width:quality[:max_fps]`` entries, e.g.
+    ``"high:640:85,low:320:50,thumbnail:160:40:2"``.
+
+    Args:
+        spec (str): Tier specification
+
+    Returns:
+        list: QualityTier tuples, best first
+
+    Raises:
+        ValueError: If the specification is malformed
+    """
+    tiers = []
+    for entry in spec.split(','):
+        parts = entry.strip().split(':')
+        if len(parts) not in (3, 4):
+            raise ValueError(f"Invalid quality tier: {entry!r}")
+        name, max_width, quality = parts[0], int(parts[1]), int(parts[2])
+        max_fps = float(parts[3]) if len(parts) == 4 else None
+        if not name or max_width <= 0 or not 1 <= quality <= 100:
+            raise ValueError(f"Invalid quality tier: {entry!r}")
+        tiers.append(QualityTier(name, max_width, quality, max_fps))
+
+    if not tiers:
+        raise ValueError("No quality tiers configured")
+    return tiers
+
+def encode_frame(frame, tier):
+    """
+    Encode a frame as JPEG for a tier.
+
+    Args:
+        frame (numpy.ndarray): BGR frame
+        tier (QualityTier): Target tier
+
+    Returns:
+        bytes: JPEG encoded frame, or None if encoding failed
+    """
+    height, width = frame.shape[:2]
+    if width > tier.max_width:
+        scale = tier.max_width / width
+        frame = cv2.resize(frame, (tier.max_width, max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, tier.quality])
+    return jpeg.tobytes() if ret else None
+
+class ViewerQuality:
+    """
+    Tier selection for one viewer with automatic downgrade.
+
+    Sending a frame normally returns almost immediately; once the client
+    or its network can't keep up, the socket buffer fills and sends start
+    to block. A smoothed send time above ``slow_send_time`` steps the
+    viewer down one tier, and a sustained fast send time steps it back
+    up, never above the tier it asked for.
+    """
+
+    def __init__(self, tiers, requested, auto=True, slow_send_time=0.1,
+                 recovery_time=5.0, min_dwell=2.0, smoothing=0.3):
+        """
+        Initialize the selector.
+
+        Args:
+            tiers (list): Available QualityTier tuples, best first
+            requested (QualityTier): Tier the viewer asked for
+            auto (bool, optional): Adjust the tier to the send time (default: True)
+            slow_send_time (float, optional): Smoothed seconds per send that
+                                              counts as backed up (default: 0.1)
+            recovery_time (float, optional): Seconds of fast sends before
+                                             stepping back up (default: 5)
+            min_dwell (float, optional): Minimum seconds between tier changes (default: 2)
+            smoothing (float, optional): Weight of the newest send time (default: 0.3)
+        """
+        self.tiers = tiers
+        self.requested_index = tiers.index(requested)
+        self.index = self.requested_index
+        self.auto = auto
+        self.slow_send_time = slow_send_time
+        self.recovery_time = recovery_time
+        self.min_dwell = min_dwell
+        self.smoothing = smoothing
+
+        self.send_time = 0.0
+        self.last_change_time = time.time()
+        self.fast_since = None
+        self.downgrades = 0
+
+    @property
+    def tier(self):
+        """QualityTier: The viewer's current tier."""
+        return self.tiers[self.index]
+
+    def record_send(self, duration):
+        """
+        Record how long sending a frame took and adjust the tier.
+
+        Args:
+            duration (float): Seconds the send blocked
+
+        Returns:
+            bool: True if the tier changed
+        """
+        self.send_time += self.smoothing * (duration - self.send_time)
+        if not self.auto:
+            return False
+
+        now = time.time()
+        if self.send_time < self.slow_send_time / 4:
+            if self.fast_since is None:
+                self.fast_since = now
+        else:
+            self.fast_since = None
+
+        if now - self.last_change_time < self.min_dwell:
+            return False
+
+        if self.send_time > self.slow_send_time and self.index < len(self.tiers) - 1:
+            self.index += 1
+            self.downgrades += 1
+        elif (self.index > self.requested_index and self.fast_since is not None and
+              now - self.fast_since >= self.recovery_time):
+            self.index -= 1
+            self.fast_since = now
+        else:
+            return False
+
+        self.last_change_time = now
+        return True
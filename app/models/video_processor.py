@@ -1,32 +1,165 @@
 """
 Video processing module for real-time facial emotion recognition.
 
-This module handles webcam capture, processing, and real-time analysis
+This module handles frame capture, processing, and real-time analysis
 for the emotion recognition system.
 """
 import time
 import threading
 import cv2
 import numpy as np
-from datetime import datetime
-from flask import current_app, g
+from flask import current_app
 
 from app.models.preprocessing import FacePreprocessor
-from app.models.emotion_model import EmotionRecognitionModel
-from app.database.db import get_db
+from app.models.frame_sources import create_frame_source
+from app.models.admission import get_admission_controller, AdmissionRejected
+from app.models.rate_controller import AdaptiveIntervalController
+from app.models.degradation import get_degradation_ladder
+from app.models.broadcast import UpdateChannel
+from app.models.inference_service import (
+    get_inference_service, set_client_share, clear_client_share, InferenceQueueFull
+)
+from app.models.stream_quality import parse_quality_tiers, encode_frame, ViewerQuality
+from app.database.db import get_read_db
+from app.database.writer import get_record_writer
 
 # Dictionary to store all active video streams
 active_streams = {}
 
+# Per-user locks so concurrent requests for the same user share one stream
+_stream_locks = {}
+_stream_locks_lock = threading.Lock()
+
+def get_or_start_stream(user_id, **kwargs):
+    """
+    Get the running video stream for a user, starting one if needed.
+    
+    Args:
+        user_id (int): User ID owning the stream
+        **kwargs: Extra arguments for a new VideoStream
+    
+    Returns:
+        VideoStream: The running stream, or None if it failed to start
+    
+    Raises:
+        AdmissionRejected: If the admission controller refused a new stream
+    """
+    with _stream_locks_lock:
+        user_lock = _stream_locks.setdefault(user_id, threading.Lock())
+    
+    with user_lock:
+        stream = active_streams.get(user_id) if user_id else None
+        if stream is not None and stream.running:
+            return stream
+        
+        # A stream whose capture thread ended can't be restarted: make sure
+        # it has given everything back, then replace it
+        if stream is not None:
+            stream.stop()
+        stream = VideoStream(user_id=user_id, **kwargs)
+        if not stream.start():
+            return None
+        
+        start_stream_reaper(
+            current_app.config.get('STREAM_IDLE_TIMEOUT', 60.0),
+            current_app.config.get('STREAM_REAPER_INTERVAL', 10.0)
+        )
+        return stream
+
 def cleanup_video_streams():
     """Clean up all active video streams when the application exits."""
-    for stream in list(active_streams.values()):
+    streams = list(active_streams.values())
+    
+    # Signal every capture thread first so they all wind down together,
+    # then stop them in parallel instead of joining one after another
+    for stream in streams:
+        stream.running = False
+    
+    def stop_stream(stream):
         try:
             stream.stop()
         except Exception as e:
             print(f"Error stopping video stream: {e}")
+    
+    stoppers = [threading.Thread(target=stop_stream, args=(stream,), daemon=True) for stream in streams]
+    for stopper in stoppers:
+        stopper.start()
+    for stopper in stoppers:
+        stopper.join(timeout=2.0)
     active_streams.clear()
 
+def load_stream_settings(user_id):
+    """
+    Load a user's stream settings from the settings table.
+    
+    Args:
+        user_id (int): User ID
+    
+    Returns:
+        dict: The user's settings row, empty if the user has none
+    """
+    if user_id is None:
+        return {}
+    try:
+        row = get_read_db().execute(
+            'SELECT * FROM settings WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+    except Exception as e:
+        print(f"Error loading stream settings for user {user_id}: {e}")
+        return {}
+    return dict(row) if row else {}
+
+# Background thread stopping streams nobody is watching
+_reaper = None
+_reaper_lock = threading.Lock()
+
+def reap_idle_streams(idle_timeout):
+    """
+    Stop streams without viewers that have not been accessed recently.
+    
+    Args:
+        idle_timeout (float): Seconds without access before a stream is stopped
+    
+    Returns:
+        int: Number of streams stopped
+    """
+    reaped = 0
+    for stream in list(active_streams.values()):
+        if stream.is_idle(idle_timeout):
+            print(f"Stopping idle video stream for user {stream.user_id} "
+                  f"(idle for {stream.idle_time():.0f}s)")
+            try:
+                stream.stop()
+                reaped += 1
+            except Exception as e:
+                print(f"Error stopping idle video stream: {e}")
+    return reaped
+
+def start_stream_reaper(idle_timeout, interval):
+    """
+    Start the idle stream reaper thread if it isn't running yet.
+    
+    Args:
+        idle_timeout (float): Seconds without access before a stream is stopped
+        interval (float): Seconds between idle checks
+    """
+    global _reaper
+    with _reaper_lock:
+        if _reaper is not None and _reaper.is_alive():
+            return
+        
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    reap_idle_streams(idle_timeout)
+                except Exception as e:
+                    print(f"Error in stream reaper: {e}")
+        
+        _reaper = threading.Thread(target=run, name='stream-reaper', daemon=True)
+        _reaper.start()
+
 class VideoStream:
     """
     Class to handle video streaming and processing.
@@ -35,35 +168,69 @@ class VideoStream:
     emotion recognition in real-time.
     """
     
-    def __init__(self, user_id=None, camera_id=0):
+    def __init__(self, user_id=None, camera_id=0, source=None):
         """
         Initialize the video stream.
         
         Args:
             user_id (int, optional): User ID for storing results in the database
             camera_id (int, optional): Camera device ID (default: 0)
+            source (optional): Frame source or source specification (see
+                              ``create_frame_source``). Defaults to the
+                              FRAME_SOURCE config setting, then ``camera_id``.
         """
         self.user_id = user_id
         self.camera_id = camera_id
+        if source is None:
+            source = current_app.config.get('FRAME_SOURCE') or camera_id
+        self.source = create_frame_source(source)
         self.frame = None
         self.processed_frame = None
+        self.frame_generation = 0
+        self.processed_generation = 0
+        self.privacy_mode = False
+        self.privacy_frame = None
         self.running = False
+        self.admitted = False
         self.lock = threading.Lock()
         self.fps = 0
         
         # Initialize face preprocessor
         self.face_preprocessor = FacePreprocessor()
         
-        # Initialize emotion model
-        self.emotion_model = None
+        # Shared scheduler running this stream's detection and inference
+        self.scheduler = None
+        self.client_id = user_id if user_id is not None else id(self)
+        self.inference_timeout = current_app.config.get('INFERENCE_TIMEOUT', 5.0)
         
-        # Frame processing interval (seconds)
+        # Frame processing interval (seconds), optionally adapted to load
         self.frame_interval = current_app.config.get('FRAME_INTERVAL', 0.1)
         self.last_process_time = 0
+        self.rate_controller = None
+        if current_app.config.get('ADAPTIVE_FRAME_INTERVAL', True):
+            self.rate_controller = AdaptiveIntervalController.from_config(current_app.config)
+            self.frame_interval = self.rate_controller.interval
+        self.analysis_fps = 0
+        
+        # Process-wide degradation ladder and the steps this stream has
+        # taken from it (see app.models.degradation)
+        self.degradation = get_degradation_ladder()
+        self.degraded_steps = set()
+        self.degraded_detection_scale = current_app.config.get('DEGRADED_DETECTION_SCALE', 0.5)
+        self.degraded_interval_factor = current_app.config.get('DEGRADED_INTERVAL_FACTOR', 2.0)
+        self.interval_factor = 1.0
+        self.draw_overlay = True
+        
+        # Analyze every Nth captured frame (settings.analysis_frequency), on
+        # top of the frame interval
+        self.analysis_frequency = 1
         
-        # Storage interval (seconds) - don't store every processed frame
+        # Storage interval (seconds) - don't store every processed frame.
+        # Records are written behind by the shared writer thread.
         self.storage_interval = current_app.config.get('STORAGE_INTERVAL', 2.0)
         self.last_storage_time = 0
+        self.record_writer = get_record_writer() if user_id is not None else None
+        self.records_dropped = 0
         
         # Emotion history for smoothing
         self.emotion_history = []
@@ -73,9 +240,39 @@ class VideoStream:
         self.inference_times = []
         self.max_inference_times = 100  # Keep track of this many recent times
         
+        # Channels pushing new emotion results and metrics, and new
+        # processed frames, to subscribers
+        self.updates = UpdateChannel()
+        self.frame_updates = UpdateChannel()
+        self.metrics_publish_interval = current_app.config.get('METRICS_PUSH_INTERVAL', 1.0)
+        self.last_metrics_publish_time = 0
+        
+        # MJPEG quality tiers; each (frame, tier) pair is encoded at most
+        # once per frame generation and shared by all viewers of that tier
+        self.quality_tiers = parse_quality_tiers(
+            current_app.config.get('MJPEG_QUALITY_TIERS', 'high:640:85'))
+        self.default_tier = self.quality_tiers[0]
+        if current_app.config.get('MJPEG_DEFAULT_TIER'):
+            self.default_tier = self.get_quality_tier(current_app.config['MJPEG_DEFAULT_TIER'])
+        self.auto_downgrade = current_app.config.get('MJPEG_AUTO_DOWNGRADE', True)
+        self.slow_send_time = current_app.config.get('MJPEG_SLOW_SEND_TIME', 0.1)
+        self.encoded_frames = {}  # (processed, tier name) -> (generation, jpeg bytes)
+        self.encode_lock = threading.Lock()
+        self.encode_count = 0
+        self.encode_cache_hits = 0
+        
+        # Attached MJPEG viewers and last access by viewers or API pollers,
+        # used to stop streams nobody is watching any more
+        self.viewer_count = 0
+        self.last_access_time = time.time()
+        self.frame_viewers = {}  # ViewerMailbox -> ViewerQuality for MJPEG viewers
+        
         # Debug mode
         self.debug = current_app.config.get('DEBUG', False)
         
+        # Per-user settings (privacy mode, analysis frequency)
+        self.apply_settings(load_stream_settings(user_id))
+        
         # Add to active streams dictionary
         if user_id:
             active_streams[user_id] = self
@@ -86,19 +283,35 @@ class VideoStream:
         
         Returns:
             bool: True if started successfully, False otherwise
+        
+        Raises:
+            AdmissionRejected: If the server or user is at their stream limit
         """
         if self.running:
             print("Video stream is already running")
             return False
         
-        # Initialize the emotion model
-        self.emotion_model = EmotionRecognitionModel()
-        if not self.emotion_model.load():
+        # Reserve a stream slot before loading the model
+        self.admission = get_admission_controller()
+        try:
+            self.admission.acquire(self.user_id)
+        except AdmissionRejected:
+            self._unregister()
+            raise
+        self.admitted = True
+        
+        # Detection and inference run on the shared fair-share scheduler
+        self.scheduler = get_inference_service()
+        if self.scheduler is None:
             print("Failed to load emotion model")
+            self._release_admission()
+            self._unregister()
             return False
         
         # Start the video capture thread
+        self.last_access_time = time.time()
         self.running = True
+        self._register_share()
         self.thread = threading.Thread(target=self._update, args=())
         self.thread.daemon = True
         self.thread.start()
@@ -116,198 +329,335 @@ class VideoStream:
         if hasattr(self, 'thread'):
             self.thread.join(timeout=1.0)
         
-        # Release the camera
-        if hasattr(self, 'cap') and self.cap.isOpened():
-            self.cap.release()
+        # Release the frame source (the capture thread releases it on exit
+        # if it is still finishing its current frame)
+        if not hasattr(self, 'thread') or not self.thread.is_alive():
+            self.source.release()
         
-        # Remove from active streams
-        if self.user_id in active_streams:
-            del active_streams[self.user_id]
+        self._release_resources()
+        
+        # Drop the frame buffers so an idle stream holds no memory
+        with self.lock:
+            self.frame = None
+            self.processed_frame = None
+            self.encoded_frames = {}
+            self.emotion_history = []
+            self.inference_times = []
         
         print("Video stream stopped")
         return True
     
-    def _update(self):
-        """Video capture thread function."""
-        # Initialize camera
-        self.cap = cv2.VideoCapture(self.camera_id)
+    def apply_settings(self, settings):
+        """
+        Apply per-user settings, also while the stream is running.
         
-        if not self.cap.isOpened():
-            print(f"ERROR: Could not open camera {self.camera_id}")
-            self.running = False
-            return
+        Args:
+            settings (dict): Settings row values; missing keys are left unchanged
+        """
+        if 'privacy_mode' in settings:
+            self.set_privacy_mode(bool(settings['privacy_mode']))
+        if settings.get('analysis_frequency'):
+            self.set_analysis_frequency(settings['analysis_frequency'])
+    
+    def set_analysis_frequency(self, frequency):
+        """
+        Analyze every Nth captured frame.
         
-        # Set camera properties
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        The resulting fraction of frames is also registered as the user's
+        requested share of the shared inference capacity.
         
-        # Calculate FPS
-        fps_counter = 0
-        fps_start_time = time.time()
-        last_process_time = time.time()
+        Args:
+            frequency (int): N, at least 1
+        """
+        self.analysis_frequency = max(1, int(frequency))
+        if self.running:
+            self._register_share()
+    
+    def _register_share(self):
+        """Register the user's requested share of the inference capacity."""
+        set_client_share(self.client_id, 1.0 / self.analysis_frequency)
+    
+    @property
+    def priority(self):
+        """str: Scheduling class - interactive while someone is watching, else background."""
+        return 'interactive' if self.viewer_count > 0 else 'background'
+    
+    def set_privacy_mode(self, enabled):
+        """
+        Switch metadata-only mode on or off.
         
-        print("Camera initialized. Starting video processing loop...")
+        In privacy mode frames are analyzed and dropped: nothing is drawn,
+        retained or JPEG encoded. Emotion results are still published and
+        stored as usual.
         
-        while self.running:
-            try:
-                # Read frame from camera
-                ret, frame = self.cap.read()
-                
-                if not ret:
-                    print("ERROR: Failed to grab frame")
-                    # Try to reinitialize the camera
-                    self.cap.release()
-                    time.sleep(1)
-                    self.cap = cv2.VideoCapture(self.camera_id)
-                    continue
-                
-                # Update FPS counter
-                fps_counter += 1
-                current_time = time.time()
-                if (current_time - fps_start_time) > 1.0:
-                    self.fps = fps_counter
-                    fps_counter = 0
-                    fps_start_time = current_time
-                
-                # Store the original frame
-                with self.lock:
-                    self.frame = frame.copy()
-                
-                # Process frame at specified interval
-                if (current_time - last_process_time) >= self.frame_interval:
-                    # THIS IS THE CRITICAL PART - Process the frame
-                    self._process_frame(frame)
-                    last_process_time = current_time
-                    
-            except Exception as e:
-                print(f"Error in video capture thread: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                time.sleep(0.1)  # Prevent CPU spinning on persistent errors
-            """Video capture thread function."""
-            # Initialize camera
-            self.cap = cv2.VideoCapture(self.camera_id)
-            
-            if not self.cap.isOpened():
-                print(f"Error: Could not open camera {self.camera_id}")
-                self.running = False
+        Args:
+            enabled (bool): Whether to enable privacy mode
+        """
+        with self.lock:
+            if enabled == self.privacy_mode:
                 return
+            self.privacy_mode = enabled
             
-            # Set camera properties
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            # Discard any retained video
+            self.frame = None
+            self.processed_frame = None
+            self.encoded_frames = {}
+            self.processed_generation += 1
+        
+        # Let viewers switch to (or away from) the placeholder frame
+        self.frame_updates.publish(time.time())
+    
+    def _get_privacy_frame(self):
+        """Get the JPEG placeholder served instead of video in privacy mode."""
+        if self.privacy_frame is None:
+            frame = np.zeros((480, 640, 3), dtype=np.uint8)
+            cv2.putText(frame, "Privacy mode - video disabled", (130, 240),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+            self.privacy_frame = cv2.imencode('.jpg', frame)[1].tobytes()
+        return self.privacy_frame
+    
+    def _publish_update(self, emotion_results):
+        """
+        Publish the latest emotion result, with metrics at most once per interval.
+        
+        Args:
+            emotion_results (list): Emotion results for the faces in the frame
+        """
+        emotions = emotion_results[0]
+        update = {
+            'emotion': {
+                'emotions': emotions,
+                'dominant_emotion': max(emotions.items(), key=lambda x: x[1])[0],
+                'faces': len(emotion_results),
+                'timestamp': time.time()
+            }
+        }
+        
+        current_time = time.time()
+        if current_time - self.last_metrics_publish_time >= self.metrics_publish_interval:
+            self.last_metrics_publish_time = current_time
+            update['metrics'] = self.get_performance_metrics()
+        
+        self.updates.publish(update)
+    
+    def _adapt_rate(self):
+        """Let the rate controller adjust the interval and detection scale."""
+        if self.rate_controller is None:
+            return
+        
+        if self.rate_controller.update(self.inference_times):
+            self.frame_interval = self.rate_controller.interval
+            self._apply_detection_scale()
+    
+    def _apply_detection_scale(self):
+        """Set the detection scale from the rate controller and degradation steps."""
+        scale = self.rate_controller.detection_scale if self.rate_controller is not None else 1.0
+        if 'low_resolution' in self.degraded_steps:
+            scale = min(scale, self.degraded_detection_scale)
+        self.face_preprocessor.detection_scale = scale
+    
+    def _apply_degradation(self):
+        """Follow the process-wide degradation level."""
+        if self.degradation is None:
+            return
+        
+        level = self.degradation.update()
+        steps = set(self.degradation.steps[:level])
+        if steps == self.degraded_steps:
+            return
+        
+        # The detector settings are read by detections running on the
+        # inference workers; while one holds the lock, defer the change to
+        # a later frame instead of waiting for it here
+        preprocessor = self.face_preprocessor
+        if not preprocessor.lock.acquire(blocking=False):
+            return
+        try:
+            self.degraded_steps = steps
+            if 'haar_detector' in steps:
+                preprocessor.use_detector('haar')
+            else:
+                preprocessor.use_detector(preprocessor.configured_detector)
+            self._apply_detection_scale()
+            preprocessor.max_faces = 1 if 'primary_face' in steps else None
+        finally:
+            preprocessor.lock.release()
+        self.interval_factor = self.degraded_interval_factor if 'long_interval' in steps else 1.0
+        self.draw_overlay = 'no_overlay' not in steps
+    
+    def attach_viewer(self, mailbox=None, quality=None):
+        """
+        Register a viewer attached to this stream.
+        
+        Args:
+            mailbox (ViewerMailbox, optional): Frame mailbox of an MJPEG viewer,
+                                               tracked for per-viewer statistics
+            quality (ViewerQuality, optional): The MJPEG viewer's tier selector
+        """
+        with self.lock:
+            self.viewer_count += 1
+            self.last_access_time = time.time()
+            if mailbox is not None:
+                self.frame_viewers[mailbox] = quality
+    
+    def detach_viewer(self, mailbox=None):
+        """
+        Unregister a viewer that disconnected.
+        
+        Args:
+            mailbox (ViewerMailbox, optional): The mailbox passed to ``attach_viewer``
+        """
+        with self.lock:
+            self.viewer_count = max(0, self.viewer_count - 1)
+            self.last_access_time = time.time()
+            self.frame_viewers.pop(mailbox, None)
+    
+    def get_viewer_stats(self):
+        """
+        Get delivery statistics for the attached MJPEG viewers.
+        
+        Returns:
+            list: Delivered/skipped frame counts, effective FPS and tier per viewer
+        """
+        with self.lock:
+            viewers = list(self.frame_viewers.items())
+        
+        stats = []
+        for mailbox, quality in viewers:
+            viewer_stats = mailbox.get_stats()
+            if quality is not None:
+                viewer_stats['tier'] = quality.tier.name
+                viewer_stats['downgrades'] = quality.downgrades
+            stats.append(viewer_stats)
+        return stats
+    
+    def touch(self):
+        """Record an access by an API poller."""
+        self.last_access_time = time.time()
+    
+    def idle_time(self):
+        """
+        Get the time since the stream was last accessed.
+        
+        Returns:
+            float: Seconds since the last access, 0 while viewers are attached
+        """
+        if self.viewer_count > 0:
+            return 0.0
+        return time.time() - self.last_access_time
+    
+    def is_idle(self, idle_timeout):
+        """
+        Check whether the stream has no viewers and hasn't been accessed recently.
+        
+        Args:
+            idle_timeout (float): Seconds without access before a stream counts as idle
+        
+        Returns:
+            bool: True if the stream is idle
+        """
+        return self.viewer_count == 0 and self.idle_time() > idle_timeout
+    
+    def _release_admission(self):
+        """Return this stream's slot to the admission controller."""
+        # Both stop() and the exiting capture thread may get here
+        with self.lock:
+            admitted, self.admitted = self.admitted, False
+        if admitted:
+            self.admission.release(self.user_id)
+    
+    def _release_resources(self):
+        """
+        Release subscribers, the inference share and the stream slot, and
+        remove the stream from active streams. Safe to call more than once.
+        """
+        # Release clients waiting for updates from this stream
+        self.updates.close()
+        self.frame_updates.close()
+        
+        clear_client_share(self.client_id)
+        self._release_admission()
+        self._unregister()
+    
+    def _unregister(self):
+        """Remove this stream from the active streams dictionary."""
+        if active_streams.get(self.user_id) is self:
+            del active_streams[self.user_id]
+    
+    def _update(self):
+        """Video capture thread function."""
+        try:
+            # Initialize frame source
+            if not self.source.open():
+                print(f"ERROR: Could not open frame source {self.source}")
+                return
             
             # Calculate FPS
             fps_counter = 0
+            analysis_counter = 0
             fps_start_time = time.time()
-            frame_count = 0  # Added frame counter for potential frame skipping
+            last_process_time = time.time()
+            frames_since_process = 0
+            
+            print(f"Frame source {self.source} initialized. Starting video processing loop...")
             
             while self.running:
                 try:
-                    # Read frame from camera
-                    ret, frame = self.cap.read()
+                    # Read frame from source
+                    ret, frame = self.source.read()
                     
                     if not ret:
-                        print("Error: Failed to grab frame")
-                        # Try to reinitialize the camera
-                        self.cap.release()
+                        if self.source.exhausted:
+                            print(f"Frame source {self.source} exhausted")
+                            break
+                        
+                        print("ERROR: Failed to grab frame")
+                        # Try to reinitialize the source
+                        self.source.release()
                         time.sleep(1)
-                        self.cap = cv2.VideoCapture(self.camera_id)
+                        self.source.open()
                         continue
                     
                     # Update FPS counter
                     fps_counter += 1
-                    if (time.time() - fps_start_time) > 1.0:
+                    current_time = time.time()
+                    if (current_time - fps_start_time) > 1.0:
+                        elapsed = current_time - fps_start_time
                         self.fps = fps_counter
+                        self.analysis_fps = analysis_counter / elapsed
                         fps_counter = 0
-                        fps_start_time = time.time()
+                        analysis_counter = 0
+                        fps_start_time = current_time
                     
-                    # Store the original frame
-                    with self.lock:
-                        self.frame = frame.copy()
+                    # Store the original frame, unless the user doesn't want video kept
+                    if not self.privacy_mode:
+                        with self.lock:
+                            self.frame = frame.copy()
+                            self.frame_generation += 1
                     
-                    # Process frame at specified interval
-                    current_time = time.time()
-                    frame_count += 1
-                    
-                    # Process every other frame to improve performance if needed
-                    # Remove the modulo check if you want to process every frame
-                    if (current_time - self.last_process_time) >= self.frame_interval:
-                        self.last_process_time = current_time
-                        
-                        # Process the frame - THIS WAS MISSING
+                    # Process every Nth frame, at most once per interval
+                    frames_since_process += 1
+                    if (frames_since_process >= self.analysis_frequency and
+                            (current_time - last_process_time) >= self.frame_interval * self.interval_factor):
                         self._process_frame(frame)
+                        last_process_time = current_time
+                        frames_since_process = 0
+                        analysis_counter += 1
+                        self._adapt_rate()
+                        self._apply_degradation()
                         
                 except Exception as e:
                     print(f"Error in video capture thread: {str(e)}")
+                    import traceback
+                    traceback.print_exc()
                     time.sleep(0.1)  # Prevent CPU spinning on persistent errors
-                """Video capture thread function."""
-                # Initialize camera
-                self.cap = cv2.VideoCapture(self.camera_id)
-                
-                if not self.cap.isOpened():
-                    print(f"Error: Could not open camera {self.camera_id}")
-                    self.running = False
-                    return
-                
-                # Set camera properties
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                
-                # Calculate FPS
-                fps_counter = 0
-                fps_start_time = time.time()
-                
-                while self.running:
-                    # Read frame from camera
-                    ret, frame = self.cap.read()
-                    
-                    if not ret:
-                        print("Error: Failed to grab frame")
-                        # Try to reinitialize the camera
-                        self.cap.release()
-                        time.sleep(1)
-                        self.cap = cv2.VideoCapture(self.camera_id)
-                        continue
-                    
-                    # Update FPS counter
-                    fps_counter += 1
-                    if (time.time() - fps_start_time) > 1.0:
-                        self.fps = fps_counter
-                        fps_counter = 0
-                        fps_start_time = time.time()
-                    
-                    # Store the original frame
-                    with self.lock:
-                        self.frame = frame.copy()
-                    
-                    # Process frame at specified interval
-                    current_time = time.time()
-                    # Ensure emotion_results is defined
-                    emotion_results = []
-                    if self.user_id is not None and emotion_results and (current_time - self.last_storage_time) >= self.storage_interval:
-                        self.last_storage_time = current_time
-                        
-                        # For simplicity, just use the first face
-                        try:
-                            # Use application context manager to ensure proper database access
-                            with current_app.app_context_manager():
-                                db = get_db()
-                                # Store emotion data as JSON
-                                import json
-                                emotion_data = json.dumps(emotion_results[0])
-                                
-                                # Insert emotion record
-                                db.execute(
-                                    "INSERT INTO emotion_records (user_id, timestamp, emotions_data) VALUES (?, ?, ?)",
-                                    (self.user_id, datetime.utcnow().isoformat(), emotion_data)
-                                )
-                                db.commit()
-                        except Exception as e:
-                            print(f"Error saving emotion record: {str(e)}")
-        
-    
-    
+        finally:
+            # However the thread ends - stopped, source failed or exhausted -
+            # the stream gives its slot back and leaves active streams, so
+            # the user can start a new one
+            self.source.release()
+            self._release_resources()
+            self.running = False
     
     def _process_frame(self, frame):
         """
@@ -320,11 +670,38 @@ class VideoStream:
         start_time = time.time()
         
         try:
-            # Detect and preprocess faces
-            preprocessed_faces, face_rects = self.face_preprocessor.detect_and_preprocess(frame)
+            # A detection abandoned after a timeout may still be running on
+            # a worker; skip this frame rather than queue another behind it
+            if self.face_preprocessor.lock.locked():
+                return
+            
+            # Detect and classify faces in this user's fair turn
+            priority = self.priority
+            try:
+                preprocessed_faces, face_rects = self.scheduler.run(
+                    self.client_id,
+                    lambda: self.face_preprocessor.detect_and_preprocess(frame),
+                    timeout=self.inference_timeout,
+                    priority=priority
+                )
+                predictions = self.scheduler.predict(
+                    self.client_id, preprocessed_faces,
+                    timeout=self.inference_timeout,
+                    priority=priority
+                )
+            except (InferenceQueueFull, TimeoutError) as e:
+                # Scheduler overloaded - skip this frame
+                print(f"Skipping frame for user {self.user_id}: {str(e)}")
+                return
             
             # Skip if no faces detected
             if not preprocessed_faces:
+                if self.privacy_mode:
+                    return
+                if not self.draw_overlay:
+                    self._set_processed_frame(frame.copy())
+                    return
+                
                 # Draw debug info on frame
                 debug_frame = frame.copy()
                 cv2.putText(debug_frame, "No face detected", (10, 30),
@@ -332,16 +709,12 @@ class VideoStream:
                 cv2.putText(debug_frame, f"FPS: {self.fps}", (10, 60),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
                 
-                with self.lock:
-                    self.processed_frame = debug_frame
+                self._set_processed_frame(debug_frame)
                 return
             
-            # Run emotion recognition for each face
+            # Smooth each face's emotion predictions
             emotion_results = []
-            for face in preprocessed_faces:
-                # Get emotion predictions
-                emotion_result = self.emotion_model.predict(face)
-                
+            for emotion_result in predictions:
                 # Apply temporal smoothing if we have history
                 if self.emotion_history:
                     # Get the last prediction for this face
@@ -372,48 +745,30 @@ class VideoStream:
             self.inference_times.append(inference_time)
             if len(self.inference_times) > self.max_inference_times:
                 self.inference_times.pop(0)
+            if self.degradation is not None:
+                self.degradation.record(inference_time)
             
             # Save to database if user_id is provided, but not every frame
             current_time = time.time()
-            if self.user_id is not None and emotion_results and (current_time - self.last_storage_time) >= self.storage_interval:
+            if (self.user_id is not None and emotion_results and
+                    (current_time - self.last_storage_time) >= self.storage_interval):
                 self.last_storage_time = current_time
                 
-                # For simplicity, just use the first face
-                try:
-                    # Use standard Flask application context
-                    with current_app.app_context():
-                        # Try SQLAlchemy first
-                        try:
-                            from app.database.models import EmotionRecord
-                            
-                            # Create a new emotion record
-                            emotion_record = EmotionRecord(
-                                user_id=self.user_id,
-                                emotions_data=emotion_results[0]
-                            )
-                            
-                            # Save the record
-                            emotion_record.save()
-                            print(f"Saved emotion record for user {self.user_id}")
-                            
-                        except ImportError:
-                            # Fall back to direct database access
-                            db = get_db()
-                            import json
-                            emotion_data = json.dumps(emotion_results[0])
-                            
-                            # Insert emotion record
-                            db.execute(
-                                "INSERT INTO emotion_records (user_id, timestamp, emotions_data) VALUES (?, ?, ?)",
-                                (self.user_id, datetime.utcnow().isoformat(), emotion_data)
-                            )
-                            db.commit()
-                            print(f"Saved emotion record for user {self.user_id}")
-                            
-                except Exception as e:
-                    print(f"Error saving emotion record: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
+                # Queue the first face's result; the writer drops it rather
+                # than block this thread when storage falls behind
+                if not self.record_writer.submit(self.user_id, emotion_results[0]):
+                    self.records_dropped += 1
+            
+            # Metadata-only mode: publish the results without rendering a frame
+            if self.privacy_mode:
+                self._publish_update(emotion_results)
+                return
+            
+            # Overlay rendering degraded away: show the plain video
+            if not self.draw_overlay:
+                self._set_processed_frame(frame.copy())
+                self._publish_update(emotion_results)
+                return
             
             # Draw results on frame
             processed_frame = self.face_preprocessor.draw_results(frame, face_rects, emotion_results)
@@ -430,8 +785,10 @@ class VideoStream:
                 self._draw_emotion_meter(processed_frame, emotion_results[0])
             
             # Update the processed frame
-            with self.lock:
-                self.processed_frame = processed_frame
+            self._set_processed_frame(processed_frame)
+            
+            # Push the new result to subscribed clients
+            self._publish_update(emotion_results)
                 
         except Exception as e:
             # Handle any unexpected errors
@@ -439,126 +796,27 @@ class VideoStream:
             import traceback
             traceback.print_exc()
             
+            if self.privacy_mode:
+                return
+            
             # Create an error frame
             error_frame = frame.copy()
             cv2.putText(error_frame, f"Error: {str(e)[:50]}", (10, 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            with self.lock:
-                self.processed_frame = error_frame
-            """
-            Process a video frame for emotion recognition.
-            
-            Args:
-                frame (numpy.ndarray): Input video frame
-            """
-            # Start timer
-            start_time = time.time()
-            
-            # Detect and preprocess faces
-            preprocessed_faces, face_rects = self.face_preprocessor.detect_and_preprocess(frame)
-            
-            # Skip if no faces detected
-            if not preprocessed_faces:
-                # Draw debug info on frame
-                debug_frame = frame.copy()
-                cv2.putText(debug_frame, "No face detected", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                cv2.putText(debug_frame, f"FPS: {self.fps}", (10, 60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                
-                with self.lock:
-                    self.processed_frame = debug_frame
-                return
-            
-            # Run emotion recognition for each face
-            emotion_results = []
-            for face in preprocessed_faces:
-                # Get emotion predictions
-                emotion_result = self.emotion_model.predict(face)
-                
-                # Apply temporal smoothing if we have history
-                if self.emotion_history:
-                    # Get the last prediction for this face
-                    # This is a simplified approach - in a real app you'd need face tracking/matching
-                    if len(self.emotion_history) > 0:
-                        last_emotions = self.emotion_history[-1]
-                        if last_emotions:  # If we have previous emotions
-                            # Apply weighted average (70% new, 30% previous)
-                            smoothed_result = {}
-                            for emotion, prob in emotion_result.items():
-                                smoothed_result[emotion] = 0.7 * prob + 0.3 * last_emotions[0].get(emotion, 0)
-                            
-                            # Normalize probabilities
-                            total = sum(smoothed_result.values())
-                            for emotion in smoothed_result:
-                                smoothed_result[emotion] /= total
-                            
-                            emotion_result = smoothed_result
-                
-                emotion_results.append(emotion_result)
-            
-            # Update emotion history
-            self.emotion_history.append(emotion_results)
-            if len(self.emotion_history) > self.max_history_length:
-                self.emotion_history.pop(0)
-            
-            # Store inference time
-            inference_time = time.time() - start_time
-            self.inference_times.append(inference_time)
-            if len(self.inference_times) > self.max_inference_times:
-                self.inference_times.pop(0)
-            
-            # Save to database if user_id is provided, but not every frame
-            # Save to database if user_id is provided, but not every frame
-            current_time = time.time()
-            if self.user_id is not None and emotion_results and (current_time - self.last_storage_time) >= self.storage_interval:
-                self.last_storage_time = current_time
-                
-                # For simplicity, just use the first face
-                try:
-                    # Use standard Flask application context instead of custom manager
-                    with current_app.app_context():
-                        # Use SQLAlchemy models (preferred) if available
-                        try:
-                            from app.database.models import EmotionRecord
-                            
-                            # Create a new emotion record
-                            emotion_record = EmotionRecord(
-                                user_id=self.user_id,
-                                emotions_data=emotion_results[0]
-                            )
-                            
-                            # Save the record using SQLAlchemy
-                            emotion_record.save()
-                            print(f"Saved emotion record for user {self.user_id} using SQLAlchemy")
-                            
-                        except ImportError:
-                            # Fall back to direct database access if needed
-                            db = get_db()
-                            import json
-                            emotion_data = json.dumps(emotion_results[0])
-                            
-                            # Insert emotion record with direct SQL
-                            db.execute(
-                                "INSERT INTO emotion_records (user_id, timestamp, emotions_data) VALUES (?, ?, ?)",
-                                (self.user_id, datetime.utcnow().isoformat(), emotion_data)
-                            )
-                            db.commit()
-                            print(f"Saved emotion record for user {self.user_id} using direct SQL")
-                    
-                except Exception as e:
-                    print(f"Error saving emotion record: {str(e)}")
-                    import traceback
-                    traceback.print_exc()  # Print full stack trace for debugging
-        
-     
-     
-     
-     
-     
-     
-     
-            
+            self._set_processed_frame(error_frame)
+    
+    def _set_processed_frame(self, frame):
+        """
+        Replace the processed frame and notify frame subscribers.
+        
+        Args:
+            frame (numpy.ndarray): The new processed frame
+        """
+        with self.lock:
+            self.processed_frame = frame
+            self.processed_generation += 1
+        self.frame_updates.publish(time.time())
+    
     def _draw_emotion_meter(self, frame, emotion_result):
         """
         Draw a visual emotion meter on the frame.
@@ -636,29 +894,102 @@ class VideoStream:
         
         return frame
     
-    def get_jpeg_frame(self, processed=True):
+    def get_quality_tier(self, name=None):
+        """
+        Look up an MJPEG quality tier by name.
+        
+        Args:
+            name (str, optional): Tier name; None for the default tier
+        
+        Returns:
+            QualityTier: The tier
+        
+        Raises:
+            ValueError: If there is no tier with that name
+        """
+        if name is None:
+            return self.default_tier
+        for tier in self.quality_tiers:
+            if tier.name == name:
+                return tier
+        raise ValueError(f"Unknown quality tier: {name}")
+    
+    def create_viewer_quality(self, tier_name=None, auto=None):
+        """
+        Create the tier selector for a new MJPEG viewer.
+        
+        Args:
+            tier_name (str, optional): Requested tier; None for the default tier
+            auto (bool, optional): Downgrade slow viewers automatically
+                                   (default: MJPEG_AUTO_DOWNGRADE)
+        
+        Returns:
+            ViewerQuality: The viewer's tier selector
+        
+        Raises:
+            ValueError: If there is no tier with that name
+        """
+        return ViewerQuality(
+            self.quality_tiers,
+            self.get_quality_tier(tier_name),
+            auto=self.auto_downgrade if auto is None else auto,
+            slow_send_time=self.slow_send_time
+        )
+    
+    def get_jpeg_frame(self, processed=True, tier=None):
         """
         Get the current frame encoded as JPEG.
         
+        Encoded frames are cached per tier until the next frame arrives, so
+        any number of viewers of one tier cost a single encode per frame.
+        
         Args:
             processed (bool, optional): Whether to return the processed frame
                                        with emotion results (default: True)
+            tier (QualityTier, optional): Resolution and quality to encode
+                                          at (default: the default tier)
         
         Returns:
             bytes: JPEG encoded frame
         """
-        frame = self.get_frame(processed)
+        if self.privacy_mode:
+            return self._get_privacy_frame()
         
-        # Encode frame as JPEG
-        ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        if not ret:
-            # Return an empty JPEG if encoding fails
-            empty_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(empty_frame, "Error encoding frame", (120, 240),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-            ret, jpeg = cv2.imencode('.jpg', empty_frame)
+        tier = tier or self.default_tier
+        key = (processed, tier.name)
         
-        return jpeg.tobytes()
+        with self.encode_lock:
+            with self.lock:
+                if processed and self.processed_frame is not None:
+                    frame, generation = self.processed_frame, ('processed', self.processed_generation)
+                elif self.frame is not None:
+                    frame, generation = self.frame, ('raw', self.frame_generation)
+                else:
+                    frame, generation = None, None
+                
+                cached = self.encoded_frames.get(key)
+                if cached is not None and generation is not None and cached[0] == generation:
+                    self.encode_cache_hits += 1
+                    return cached[1]
+            
+            # Frames are replaced, never modified in place, so they can be
+            # encoded outside the lock without a copy
+            if frame is None:
+                frame = self.get_frame(processed)
+            jpeg = encode_frame(frame, tier)
+            if jpeg is None:
+                # Return an empty JPEG if encoding fails
+                empty_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                cv2.putText(empty_frame, "Error encoding frame", (120, 240),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+                ret, jpeg = cv2.imencode('.jpg', empty_frame)
+                return jpeg.tobytes()
+            
+            self.encode_count += 1
+            if generation is not None:
+                with self.lock:
+                    self.encoded_frames[key] = (generation, jpeg)
+            return jpeg
     
     def get_performance_metrics(self):
         """
@@ -670,10 +1001,32 @@ class VideoStream:
         avg_inference_time = sum(self.inference_times) / len(self.inference_times) if self.inference_times else 0
         max_inference_time = max(self.inference_times) if self.inference_times else 0
         
-        return {
+        metrics = {
             'fps': self.fps,
             'avg_inference_time': avg_inference_time,
             'max_inference_time': max_inference_time,
             'frame_interval': self.frame_interval,
-            'face_detection_method': self.face_preprocessor.detector_type
-        }
\ No newline at end of file
+            'analysis_rate': self.analysis_fps,
+            'analysis_frequency': self.analysis_frequency,
+            'adaptive_rate': self.rate_controller is not None,
+            'priority': self.priority,
+            'face_detection_method': self.face_preprocessor.detector_type,
+            'privacy_mode': self.privacy_mode,
+            'viewers': self.viewer_count,
+            'idle_time': self.idle_time(),
+            'jpeg_encodes': self.encode_count,
+            'jpeg_cache_hits': self.encode_cache_hits,
+            'records_dropped': self.records_dropped,
+            'viewer_stats': self.get_viewer_stats()
+        }
+        if self.rate_controller is not None:
+            metrics.update(self.rate_controller.get_metrics())
+        if self.degradation is not None:
+            metrics['degradation_level'] = len(self.degraded_steps)
+            metrics['degradation'] = self.degradation.get_metrics()
+        if self.scheduler is not None:
+            # Time this user's work waited for its fair turn
+            scheduling = self.scheduler.get_client_stats(self.client_id) or {}
+            metrics['scheduler_avg_wait'] = scheduling.get('avg_wait', 0.0)
+            metrics['scheduler_p95_wait'] = scheduling.get('p95_wait', 0.0)
+        return metrics
\ No newline at end of file
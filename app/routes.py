@@ -6,7 +6,8 @@ This module defines the base routes and the application entry points.
 import os
 from flask import redirect, url_for, current_app, render_template, session, g
 from functools import wraps
-from app.database.db import get_db
+from app.database.db import get_read_db
+from app.database.retention import get_retention_engine, peek_retention_engine
 from app.database.models import User  # SQLAlchemy model
 
 def login_required(f):
@@ -31,7 +32,7 @@ def load_logged_in_user():
                 g.user = User.query.get(user_id)
             except Exception as e:
                 # Fall back to direct database query
-                db = get_db()
+                db = get_read_db()
                 g.user = db.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
                 
             # If user not found, clear session
@@ -49,6 +50,9 @@ def register_routes(app):
     @app.before_request
     def before_request():
         load_logged_in_user()
+        # Start pruning old emotion data once the app is serving requests
+        if peek_retention_engine() is None:
+            get_retention_engine()
     
     # Register error handlers
     register_error_handlers(app)
@@ -40,7 +40,7 @@ function initEmotionDisplay() {
     // Create initial emotion chart
     createEmotionChart();
     
-    // Start polling for emotion data
+    // Subscribe to pushed emotion data
     startEmotionPolling();
 }
 
@@ -85,35 +85,12 @@ function createEmotionChart() {
 }
 
 /**
- * Start polling for emotion data
+ * Subscribe to emotion data pushed by the server
  */
 function startEmotionPolling() {
-    // Poll for emotion data every 500ms
-    setInterval(() => {
-        if (document.visibilityState === 'visible') {
-            fetchEmotionData();
-        }
-    }, 500);
-}
-
-/**
- * Fetch the current emotion data from the API
- */
-function fetchEmotionData() {
-    fetch('/api/analyze_current_emotion')
-        .then(response => {
-            if (response.ok) {
-                return response.json();
-            }
-            throw new Error('No emotion data available');
-        })
-        .then(data => {
-            updateEmotionDisplay(data.emotions, data.dominant_emotion);
-        })
-        .catch(error => {
-            // Silent error handling - user might not have started the video feed yet
-            console.log('Waiting for emotion data...');
-        });
+    EmotionEvents.subscribe({
+        emotion: data => updateEmotionDisplay(data.emotions, data.dominant_emotion)
+    });
 }
 
 /**
@@ -0,0 +1,73 @@
+/**
+ * Push channel for emotion results and performance metrics.
+ * Opens a single Server-Sent Events connection to /api/events per page and
+ * shares it between all subscribers, replacing per-script polling.
+ */
+
+const EmotionEvents = (function() {
+    const subscribers = new Set();
+    let source = null;
+
+    /**
+     * Dispatch an event payload to every subscriber with a matching handler
+     * @param {string} type - Event type (emotion, metrics, status)
+     * @param {MessageEvent} event - The SSE message
+     */
+    function dispatch(type, event) {
+        let data;
+        try {
+            data = JSON.parse(event.data);
+        } catch (error) {
+            console.error(`Invalid ${type} event:`, error);
+            return;
+        }
+
+        subscribers.forEach(handlers => {
+            if (handlers[type]) {
+                handlers[type](data);
+            }
+        });
+    }
+
+    /**
+     * Open the shared connection if it isn't open yet
+     */
+    function connect() {
+        if (source) {
+            return;
+        }
+
+        // The browser reconnects automatically after network errors
+        source = new EventSource('/api/events');
+        source.addEventListener('emotion', event => dispatch('emotion', event));
+        source.addEventListener('metrics', event => dispatch('metrics', event));
+        source.addEventListener('status', event => dispatch('status', event));
+    }
+
+    /**
+     * Close the shared connection once nobody is listening
+     */
+    function disconnect() {
+        if (source && subscribers.size === 0) {
+            source.close();
+            source = null;
+        }
+    }
+
+    /**
+     * Subscribe to pushed updates
+     * @param {Object} handlers - Callbacks named emotion, metrics and/or status
+     * @returns {Function} Call to unsubscribe
+     */
+    function subscribe(handlers) {
+        subscribers.add(handlers);
+        connect();
+
+        return function unsubscribe() {
+            subscribers.delete(handlers);
+            disconnect();
+        };
+    }
+
+    return { subscribe };
+})();
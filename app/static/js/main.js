@@ -12,8 +12,8 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Status variables
     let streamActive = false;
-    let emotionPollingInterval;
-    let performanceInterval;
+    let unsubscribeEmotions = null;
+    let unsubscribeMetrics = null;
     let reconnectAttempts = 0;
     const MAX_RECONNECT_ATTEMPTS = 5;
     
@@ -183,46 +183,27 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
-    // Start emotion data polling
+    // Subscribe to pushed emotion results
     function startEmotionPolling() {
-        // Clear any existing interval
         stopEmotionPolling();
         
-        // Set new interval
-        emotionPollingInterval = setInterval(() => {
-            if (document.visibilityState === 'visible' && streamActive) {
-                fetchEmotionData();
+        unsubscribeEmotions = EmotionEvents.subscribe({
+            emotion: data => {
+                if (streamActive) {
+                    updateEmotionDisplay(data.emotions, data.dominant_emotion);
+                }
             }
-        }, 300); // Poll more frequently for responsiveness
+        });
     }
     
-    // Stop emotion data polling
+    // Unsubscribe from emotion results
     function stopEmotionPolling() {
-        if (emotionPollingInterval) {
-            clearInterval(emotionPollingInterval);
+        if (unsubscribeEmotions) {
+            unsubscribeEmotions();
+            unsubscribeEmotions = null;
         }
     }
     
-    // Fetch emotion data from API
-    function fetchEmotionData() {
-        fetch('/api/analyze_current_emotion')
-            .then(response => {
-                if (response.ok) {
-                    return response.json();
-                }
-                throw new Error('No emotion data available');
-            })
-            .then(data => {
-                if (data.error) {
-                    console.warn('Emotion data warning:', data.error);
-                }
-                updateEmotionDisplay(data.emotions, data.dominant_emotion);
-            })
-            .catch(error => {
-                console.log('Waiting for emotion data...', error);
-            });
-    }
-    
     // Update the display with emotion data
     function updateEmotionDisplay(emotions, dominantEmotion) {
         // Update dominant emotion
@@ -273,36 +254,25 @@ document.addEventListener('DOMContentLoaded', function() {
         emotionChart.update();
     }
     
-    // Start performance metrics monitoring
+    // Subscribe to pushed performance metrics
     function startPerformanceMonitoring() {
-        if (performanceInterval) {
-            clearInterval(performanceInterval);
-        }
+        stopPerformanceMonitoring();
         
-        performanceInterval = setInterval(() => {
-            if (!streamActive) return;
-            
-            fetch('/api/performance_metrics')
-                .then(response => response.json())
-                .then(data => {
-                    if (data.error) {
-                        console.warn('Performance metrics warning:', data.error);
-                        return;
-                    }
-                    
-                    fpsElement.innerHTML = `<i class="fas fa-tachometer-alt"></i> FPS: ${data.fps || 0}`;
-                    inferenceTimeElement.innerHTML = `<i class="fas fa-stopwatch"></i> Inference: ${((data.avg_inference_time || 0) * 1000).toFixed(1)}ms`;
-                })
-                .catch(error => {
-                    console.error('Error fetching performance metrics:', error);
-                });
-        }, 2000);
+        unsubscribeMetrics = EmotionEvents.subscribe({
+            metrics: data => {
+                if (!streamActive) return;
+                
+                fpsElement.innerHTML = `<i class="fas fa-tachometer-alt"></i> FPS: ${data.fps || 0}`;
+                inferenceTimeElement.innerHTML = `<i class="fas fa-stopwatch"></i> Inference: ${((data.avg_inference_time || 0) * 1000).toFixed(1)}ms`;
+            }
+        });
     }
     
-    // Stop performance monitoring
+    // Unsubscribe from performance metrics
     function stopPerformanceMonitoring() {
-        if (performanceInterval) {
-            clearInterval(performanceInterval);
+        if (unsubscribeMetrics) {
+            unsubscribeMetrics();
+            unsubscribeMetrics = null;
         }
     }
     
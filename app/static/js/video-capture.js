@@ -17,6 +17,7 @@ let inferenceTimeElement = document.getElementById('inference-time');
 
 // Stream status
 let streamActive = true;
+let unsubscribeMetrics = null;
 
 /**
  * Initialize the video feed
@@ -111,26 +112,32 @@ function showNotification(message, type = 'success') {
  * Start performance monitoring
  */
 function startPerformanceMonitoring() {
-    // Update performance metrics every 2 seconds
-    performanceInterval = setInterval(() => {
-        fetch('/api/performance_metrics')
-            .then(response => response.json())
-            .then(data => {
-                // Update UI with performance metrics
-                fpsElement.textContent = `FPS: ${data.fps}`;
-                inferenceTimeElement.textContent = `Inference: ${(data.avg_inference_time * 1000).toFixed(1)}ms`;
-            })
-            .catch(error => {
-                console.error('Error fetching performance metrics:', error);
-            });
-    }, 2000);
+    stopPerformanceSubscription();
+
+    // Metrics are pushed by the server whenever the stream publishes them
+    unsubscribeMetrics = EmotionEvents.subscribe({
+        metrics: data => {
+            fpsElement.textContent = `FPS: ${data.fps}`;
+            inferenceTimeElement.textContent = `Inference: ${(data.avg_inference_time * 1000).toFixed(1)}ms`;
+        }
+    });
+}
+
+/**
+ * Unsubscribe from pushed performance metrics
+ */
+function stopPerformanceSubscription() {
+    if (unsubscribeMetrics) {
+        unsubscribeMetrics();
+        unsubscribeMetrics = null;
+    }
 }
 
 /**
  * Stop performance monitoring
  */
 function stopPerformanceMonitoring() {
-    clearInterval(performanceInterval);
+    stopPerformanceSubscription();
     fpsElement.textContent = 'FPS: --';
     inferenceTimeElement.textContent = 'Inference: --ms';
 }
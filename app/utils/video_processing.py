@@ -0,0 +1,334 @@
+"""
+Offline video analysis for the facial emotion recognition application.
+
+This module scores recorded video files as fast as the hardware allows.
+Frames are decoded on a background thread while the main thread runs face
+detection, detected faces are classified in batches, and long files are
+split into segments that are processed by separate worker processes.
+
+Results are written as a compressed NumPy archive holding one record per
+frame and face track, plus the emotion labels and the source frame rate.
+"""
+import math
+import queue
+import threading
+import time
+import click
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from app.config import config_by_name
+from app.models.frame_sources import VideoFileSource
+from app.models.cpu_budget import CpuBudget
+
+def result_dtype(num_emotions):
+    """
+    Build the record layout used for per-frame, per-track results.
+
+    Args:
+        num_emotions (int): Number of emotion classes
+
+    Returns:
+        numpy.dtype: Structured record type
+    """
+    return np.dtype([
+        ('frame', '<u4'),
+        ('track', '<u4'),
+        ('x', '<i2'),
+        ('y', '<i2'),
+        ('w', '<i2'),
+        ('h', '<i2'),
+        ('probs', '<f4', (num_emotions,)),
+    ])
+
+class CentroidTracker:
+    """
+    Minimal face tracker assigning stable IDs to faces across frames.
+
+    Each face is matched to the nearest live track centre within
+    ``max_distance`` pixels; unmatched faces start a new track and tracks
+    not seen for ``max_age`` frames are dropped.
+    """
+
+    def __init__(self, max_distance=60, max_age=15, first_id=0):
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.next_id = first_id
+        self.tracks = {}  # track id -> (centre x, centre y, last frame index)
+
+    def assign(self, frame_index, face_rects):
+        """
+        Assign track IDs to the faces of a frame.
+
+        Args:
+            frame_index (int): Index of the frame
+            face_rects (list): List of face rectangles (x, y, w, h)
+
+        Returns:
+            list: Track ID for each face rectangle
+        """
+        # Forget tracks that have not been seen recently
+        self.tracks = {
+            track_id: track for track_id, track in self.tracks.items()
+            if frame_index - track[2] <= self.max_age
+        }
+
+        track_ids = []
+        used = set()
+        for x, y, w, h in face_rects:
+            cx, cy = x + w / 2, y + h / 2
+            best_id, best_distance = None, self.max_distance
+            for track_id, (tx, ty, _) in self.tracks.items():
+                if track_id in used:
+                    continue
+                distance = math.hypot(cx - tx, cy - ty)
+                if distance < best_distance:
+                    best_id, best_distance = track_id, distance
+
+            if best_id is None:
+                best_id = self.next_id
+                self.next_id += 1
+
+            used.add(best_id)
+            self.tracks[best_id] = (cx, cy, frame_index)
+            track_ids.append(best_id)
+
+        return track_ids
+
+def _make_app(config_name):
+    """
+    Build a minimal Flask app carrying only configuration.
+
+    Worker processes need the config for the preprocessor and model but
+    must not touch the database, so ``create_app`` is not used here.
+    """
+    app = Flask('app')
+    app.config.from_object(config_by_name[config_name])
+    return app
+
+def _read_frames(source, start_frame, end_frame, frame_step, frames):
+    """Decode frames into a bounded queue; ``None`` marks the end."""
+    try:
+        index = start_frame
+        while index < end_frame:
+            ret, frame = source.read()
+            if not ret:
+                break
+            if (index - start_frame) % frame_step == 0:
+                frames.put((index, frame))
+            index += 1
+    finally:
+        frames.put(None)
+
+def analyze_segment(video_path, config_name, start_frame, end_frame,
+                    batch_size=32, frame_step=1, track_offset=0, cpu_budget=None,
+                    worker_index=0):
+    """
+    Analyze a contiguous range of frames of a video file.
+
+    Args:
+        video_path (str): Path to the video file
+        config_name (str): Configuration name used for detector and model settings
+        start_frame (int): First frame to analyze
+        end_frame (int): Frame index to stop before
+        batch_size (int, optional): Number of faces per inference batch (default: 32)
+        frame_step (int, optional): Analyze every Nth frame (default: 1)
+        track_offset (int, optional): First track ID to hand out (default: 0)
+        cpu_budget (CpuBudget, optional): Thread budget shared with the other
+                                          workers (default: library defaults)
+        worker_index (int, optional): This worker's slice of the budget (default: 0)
+
+    Returns:
+        tuple: (structured result array, number of frames analyzed)
+    """
+    # Imported here so the parent process doesn't load TensorFlow when it
+    # only coordinates worker processes
+    from app.models.preprocessing import FacePreprocessor
+    from app.models.emotion_model import EmotionRecognitionModel
+
+    if cpu_budget is not None:
+        cpu_budget.bind_current_worker(worker_index)
+        cpu_budget.apply()
+
+    with _make_app(config_name).app_context():
+        preprocessor = FacePreprocessor()
+        model = EmotionRecognitionModel()
+        if not model.load():
+            raise RuntimeError("Failed to load emotion model")
+
+        dtype = result_dtype(len(model.emotions))
+        tracker = CentroidTracker(first_id=track_offset)
+
+        source = VideoFileSource(video_path, realtime=False, loop=False)
+        if not source.open():
+            raise IOError(f"Could not open video file {video_path}")
+        source.seek(start_frame)
+
+        frames = queue.Queue(maxsize=max(batch_size, 8))
+        reader = threading.Thread(
+            target=_read_frames,
+            args=(source, start_frame, end_frame, frame_step, frames),
+            daemon=True
+        )
+        reader.start()
+
+        results = []
+        pending_faces = []
+        pending_meta = []
+        frames_analyzed = 0
+
+        def flush():
+            predictions = model.predict_batch(pending_faces)
+            for (frame_index, track_id, rect), emotions in zip(pending_meta, predictions):
+                x, y, w, h = rect
+                results.append((frame_index, track_id, x, y, w, h,
+                                [emotions[name] for name in model.emotions]))
+            pending_faces.clear()
+            pending_meta.clear()
+
+        try:
+            while True:
+                item = frames.get()
+                if item is None:
+                    break
+                frame_index, frame = item
+                frames_analyzed += 1
+
+                faces, face_rects = preprocessor.detect_and_preprocess(frame)
+                track_ids = tracker.assign(frame_index, face_rects)
+                for face, rect, track_id in zip(faces, face_rects, track_ids):
+                    pending_faces.append(face)
+                    pending_meta.append((frame_index, track_id, rect))
+
+                if len(pending_faces) >= batch_size:
+                    flush()
+
+            if pending_faces:
+                flush()
+        finally:
+            reader.join(timeout=1.0)
+            source.release()
+
+        return np.array(results, dtype=dtype), frames_analyzed
+
+def _analyze_segment_task(args):
+    """Process pool entry point for ``analyze_segment``."""
+    return analyze_segment(*args)
+
+def analyze_video_file(video_path, output_path, config_name='development', batch_size=32,
+                       workers=1, frame_step=1, min_segment_frames=900):
+    """
+    Run a recorded video through face detection and emotion recognition.
+
+    Args:
+        video_path (str): Path to the video file
+        output_path (str): Path of the ``.npz`` results file to write
+        config_name (str, optional): Configuration name (default: development)
+        batch_size (int, optional): Number of faces per inference batch (default: 32)
+        workers (int, optional): Number of worker processes (default: 1)
+        frame_step (int, optional): Analyze every Nth frame (default: 1)
+        min_segment_frames (int, optional): Minimum frames per worker segment,
+                                            so short files stay in one process (default: 900)
+
+    Returns:
+        dict: Summary with frame, face and track counts, elapsed time and frames/second
+    """
+    source = VideoFileSource(video_path, realtime=False, loop=False)
+    if not source.open():
+        raise IOError(f"Could not open video file {video_path}")
+    frame_count = source.frame_count
+    video_fps = source.fps
+    source.release()
+
+    # Split long files into one contiguous segment per worker. Tracks do
+    # not continue across segment boundaries, so each segment gets its own
+    # block of track IDs.
+    workers = max(1, min(workers, frame_count // max(min_segment_frames, 1) or 1))
+    segment_length = math.ceil(frame_count / workers) if frame_count else 0
+    # Share the cores between workers instead of letting each one size its
+    # OpenCV and TensorFlow pools to the whole machine
+    cpu_budget = CpuBudget.from_config(_make_app(config_name).config, workers=workers)
+    tasks = []
+    for i in range(workers):
+        start = i * segment_length
+        end = min(frame_count, start + segment_length) if frame_count else 2 ** 31
+        # Keep frame_step sampling aligned across segment boundaries
+        start += (-start) % frame_step
+        tasks.append((video_path, config_name, start, end, batch_size, frame_step, i << 20,
+                      cpu_budget, i))
+
+    start_time = time.time()
+    if workers == 1:
+        segments = [_analyze_segment_task(tasks[0])]
+    else:
+        # TensorFlow is not fork-safe, so workers are spawned fresh
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            segments = list(executor.map(_analyze_segment_task, tasks))
+    elapsed = time.time() - start_time
+
+    records = np.concatenate([segment[0] for segment in segments])
+    frames_analyzed = sum(segment[1] for segment in segments)
+    emotions = config_by_name[config_name].EMOTIONS
+
+    np.savez_compressed(
+        output_path,
+        records=records,
+        emotions=np.array(emotions),
+        fps=np.float32(video_fps)
+    )
+
+    return {
+        'frames': frames_analyzed,
+        'faces': int(len(records)),
+        'tracks': int(len(np.unique(records['track']))) if len(records) else 0,
+        'workers': workers,
+        'elapsed': elapsed,
+        'frames_per_second': frames_analyzed / elapsed if elapsed > 0 else 0.0,
+        'output_path': output_path
+    }
+
+def load_analysis(path):
+    """
+    Load a results file written by ``analyze_video_file``.
+
+    Args:
+        path (str): Path to the ``.npz`` results file
+
+    Returns:
+        tuple: (structured result array, list of emotion names, video frame rate)
+    """
+    with np.load(path) as data:
+        return data['records'], data['emotions'].tolist(), float(data['fps'])
+
+@click.command('analyze-video')
+@click.argument('video_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output_path', type=click.Path(dir_okay=False))
+@click.option('--batch-size', default=32, show_default=True, help='Faces per inference batch.')
+@click.option('--workers', default=1, show_default=True, help='Worker processes for long files.')
+@click.option('--frame-step', default=1, show_default=True, help='Analyze every Nth frame.')
+@with_appcontext
+def analyze_video_command(video_path, output_path, batch_size, workers, frame_step):
+    """Analyze a recorded video file and write per-frame emotion results."""
+    config_name = current_app.config.get('CONFIG_NAME', 'development')
+    summary = analyze_video_file(
+        video_path, output_path,
+        config_name=config_name,
+        batch_size=batch_size,
+        workers=workers,
+        frame_step=frame_step
+    )
+    click.echo(
+        f"Analyzed {summary['frames']} frames ({summary['faces']} faces, "
+        f"{summary['tracks']} tracks) in {summary['elapsed']:.1f}s "
+        f"with {summary['workers']} worker(s): {summary['frames_per_second']:.1f} frames/s"
+    )
+    click.echo(f"Results written to {summary['output_path']}")
+
+def register_video_commands(app):
+    """Register video processing commands with the Flask application."""
+    app.cli.add_command(analyze_video_command)
@@ -0,0 +1,14 @@
+"""
+ASGI entry point for the facial emotion recognition application.
+
+Serves the MJPEG feed and the push channel asynchronously, so connected
+viewers don't each hold a worker thread, and passes every other request
+to the Flask application. Run with an ASGI server, e.g.:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+from wsgi import app as flask_app
+from app.asgi import create_asgi_app
+
+# Create ASGI application instance
+app = create_asgi_app(flask_app)
@@ -0,0 +1,113 @@
+"""
+Storage size and scan speed of JSON versus float32 emotion vectors.
+
+Builds two copies of the same emotion_records data, one with the legacy
+JSON text column and one with 28-byte float32 blobs, and compares the
+database size and the time to load every record of one user into a NumPy
+array.
+
+Usage:
+    python benchmarks/emotion_storage.py --rows 200000 --users 20
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.emotion_vectors import (  # noqa: E402
+    EMOTION_LABELS, encode_emotions, load_emotion_range
+)
+
+def build_database(path, rows, users, vector):
+    """Create and fill an emotion_records table in either format."""
+    column = 'emotion_vector BLOB' if vector else 'emotions_data TEXT'
+    connection = sqlite3.connect(path)
+    connection.execute(f'''
+        CREATE TABLE emotion_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            {column} NOT NULL,
+            dominant_emotion TEXT NOT NULL DEFAULT 'neutral',
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    connection.execute('CREATE INDEX idx_emotion_records_user_id ON emotion_records (user_id)')
+
+    rng = np.random.default_rng(0)
+    probabilities = rng.dirichlet(np.ones(len(EMOTION_LABELS)), size=rows)
+    user_ids = rng.integers(1, users + 1, size=rows)
+    start = time.mktime((2026, 1, 1, 0, 0, 0, 0, 0, -1))
+
+    def records():
+        for i in range(rows):
+            emotions = dict(zip(EMOTION_LABELS, probabilities[i].tolist()))
+            value = encode_emotions(emotions) if vector else json.dumps(emotions)
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start + i * 2))
+            yield (int(user_ids[i]), value, timestamp)
+
+    name = 'emotion_vector' if vector else 'emotions_data'
+    connection.executemany(
+        f'INSERT INTO emotion_records (user_id, {name}, timestamp) VALUES (?, ?, ?)', records())
+    connection.commit()
+    connection.execute('VACUUM')
+    connection.close()
+    return os.path.getsize(path)
+
+def scan_json(connection, user_id):
+    """Load one user's records from the JSON column into an array."""
+    rows = connection.execute(
+        'SELECT timestamp, emotions_data FROM emotion_records WHERE user_id = ? ORDER BY timestamp',
+        (user_id,)).fetchall()
+    emotions = [json.loads(row[1]) for row in rows]
+    return np.array([[e[label] for label in EMOTION_LABELS] for e in emotions], dtype=np.float32)
+
+def scan_vector(connection, user_id):
+    """Load one user's records from the blob column into an array."""
+    return load_emotion_range(connection, user_id)[1]
+
+def time_scan(path, scan, user_id, repeat):
+    """Best-of-N time of a scan, and the rows it returned."""
+    connection = sqlite3.connect(path)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matrix = scan(connection, user_id)
+        best = min(best, time.perf_counter() - start)
+    connection.close()
+    return best, len(matrix)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=200000, help='Records to create')
+    parser.add_argument('--users', type=int, default=20, help='Users the records are spread over')
+    parser.add_argument('--repeat', type=int, default=5, help='Scans per format (best is reported)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        results = {}
+        for name, vector, scan in (('json', False, scan_json), ('float32', True, scan_vector)):
+            path = os.path.join(directory, f'{name}.db')
+            size = build_database(path, args.rows, args.users, vector)
+            elapsed, count = time_scan(path, scan, 1, args.repeat)
+            results[name] = (size, elapsed, count)
+            print(f"{name:8s} {size / 1024 / 1024:8.2f} MiB  {size / args.rows:6.1f} bytes/row  "
+                  f"scan {count} rows in {elapsed * 1000:7.1f} ms "
+                  f"({count / elapsed:10.0f} rows/s)")
+
+        json_size, json_time, _ = results['json']
+        vector_size, vector_time, _ = results['float32']
+        print(f"float32 vectors: {json_size / vector_size:.2f}x smaller, "
+              f"{json_time / vector_time:.2f}x faster to scan")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
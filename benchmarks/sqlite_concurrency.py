@@ -0,0 +1,185 @@
+"""
+Concurrent writers and dashboard readers against SQLite.
+
+Writer threads insert batches of emotion records, the way the record
+writer does, while reader threads run the dashboard's recent-records
+query. The default profile opens a fresh connection per operation with
+SQLite's defaults (rollback journal, full sync), as the app used to per
+request; the tuned profile uses the pooled WAL connections from
+app.database.db. Each profile gets its own database file, since the
+journal mode is stored in the file.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py --writers 4 --readers 8 --duration 10
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.db import ConnectionPool, connect_db  # noqa: E402
+from app.database.emotion_vectors import EMOTION_LABELS, encode_emotions, dominant_emotion  # noqa: E402
+from app.database.writer import INSERT_EMOTION_RECORD as INSERT_QUERY  # noqa: E402
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'app', 'database', 'schema.sql')
+RECENT_QUERY = 'SELECT * FROM emotion_records WHERE user_id = ? ORDER BY timestamp DESC LIMIT 100'
+
+# PRAGMAs of the tuned profile, matching the Config defaults
+TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16384,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY'
+}
+
+def make_record(user_id):
+    """Build one random emotion record row."""
+    probabilities = np.random.dirichlet(np.ones(len(EMOTION_LABELS)))
+    emotions = dict(zip(EMOTION_LABELS, probabilities.tolist()))
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    return (user_id, timestamp, encode_emotions(emotions)) + dominant_emotion(emotions)
+
+def create_database(path, users, seed_rows):
+    """Create the schema and seed some history for the readers."""
+    connection = sqlite3.connect(path)
+    with open(SCHEMA_PATH) as f:
+        connection.executescript(f.read())
+    connection.executemany(
+        'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+        [(f'user{i}', f'user{i}@example.com', 'x') for i in range(1, users + 1)])
+    connection.executemany(INSERT_QUERY, [make_record(random.randint(1, users)) for _ in range(seed_rows)])
+    connection.commit()
+    connection.close()
+
+def run_profile(profile, writers, readers, duration, batch_size, users, seed_rows):
+    """
+    Run writers and readers concurrently against a fresh database.
+
+    Args:
+        profile (str): 'default' or 'tuned'
+        writers (int): Number of writer threads
+        readers (int): Number of reader threads
+        duration (float): Seconds to run
+        batch_size (int): Records inserted per write transaction
+        users (int): Number of users records are spread over
+        seed_rows (int): Records created before the run
+
+    Returns:
+        dict: Write and read throughput, read latency percentiles and error count
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, f'{profile}.db')
+    create_database(path, users, seed_rows)
+
+    if profile == 'tuned':
+        write_pool = ConnectionPool(path, size=writers, pragmas=TUNED_PRAGMAS)
+        read_pool = ConnectionPool(path, size=readers, pragmas=TUNED_PRAGMAS, readonly=True)
+        write_connection = write_pool.connection
+        read_connection = read_pool.connection
+    else:
+        @contextmanager
+        def connection_per_operation():
+            connection = connect_db(path)
+            try:
+                yield connection
+            finally:
+                connection.close()
+        write_connection = read_connection = connection_per_operation
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {'rows_written': 0, 'reads': 0, 'errors': 0, 'read_latencies': []}
+
+    def writer():
+        while not stop.is_set():
+            batch = [make_record(random.randint(1, users)) for _ in range(batch_size)]
+            try:
+                with write_connection() as connection:
+                    with connection:
+                        connection.executemany(INSERT_QUERY, batch)
+                with lock:
+                    results['rows_written'] += len(batch)
+            except sqlite3.OperationalError:
+                with lock:
+                    results['errors'] += 1
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with read_connection() as connection:
+                    connection.execute(RECENT_QUERY, (random.randint(1, users),)).fetchall()
+                with lock:
+                    results['reads'] += 1
+                    results['read_latencies'].append(time.perf_counter() - start)
+            except sqlite3.OperationalError:
+                with lock:
+                    results['errors'] += 1
+
+    threads = ([threading.Thread(target=writer) for _ in range(writers)] +
+               [threading.Thread(target=reader) for _ in range(readers)])
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start_time
+
+    if profile == 'tuned':
+        write_pool.close()
+        read_pool.close()
+    shutil.rmtree(directory)
+
+    latencies = results['read_latencies'] or [0.0]
+    return {
+        'profile': profile,
+        'rows_written_per_second': results['rows_written'] / elapsed,
+        'reads_per_second': results['reads'] / elapsed,
+        'read_p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'read_p95_ms': float(np.percentile(latencies, 95)) * 1000,
+        'errors': results['errors']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--writers', type=int, default=4, help='Writer threads')
+    parser.add_argument('--readers', type=int, default=8, help='Dashboard reader threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+    parser.add_argument('--batch-size', type=int, default=20, help='Records per write transaction')
+    parser.add_argument('--users', type=int, default=50, help='Users records are spread over')
+    parser.add_argument('--seed-rows', type=int, default=50000, help='Records created up front')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = [
+        run_profile(profile, args.writers, args.readers, args.duration,
+                    args.batch_size, args.users, args.seed_rows)
+        for profile in ('default', 'tuned')
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['profile']:8s} {result['rows_written_per_second']:9.0f} rows/s written  "
+              f"{result['reads_per_second']:7.0f} reads/s  "
+              f"p50 {result['read_p50_ms']:6.1f} ms  p95 {result['read_p95_ms']:6.1f} ms  "
+              f"{result['errors']} lock errors")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Aggregate analysis throughput with 1, 4 and 10 concurrent streams.
+
+Each run starts N synthetic-face streams against a scratch database and
+reports how many frames per second the shared inference service analyses
+in total, with and without a CPU budget. TensorFlow's thread pools can
+only be sized once per process, so every run happens in a fresh process.
+
+Usage:
+    python benchmarks/stream_throughput.py --streams 1,4,10 --duration 20
+    python benchmarks/stream_throughput.py --cores 4 --pin
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def measure(num_streams, duration, warmup, config, budgeted):
+    """
+    Run N streams and measure the aggregate analysis rate.
+
+    Args:
+        num_streams (int): Number of concurrent streams
+        duration (float): Seconds to measure for
+        warmup (float): Seconds to run before measuring
+        config (dict): Config overrides, e.g. CPU_* and INFERENCE_WORKERS
+        budgeted (bool): Apply the CPU budget; otherwise every pool is
+                         sized to the whole machine, like the libraries' defaults
+
+    Returns:
+        dict: Frames and faces analysed per second and mean analysis time
+    """
+    from app.factory import create_app
+    from app.database.db import init_db, get_db
+    from app.models.video_processor import get_or_start_stream, cleanup_video_streams
+    from app.models.inference_service import peek_inference_service
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+
+    # The scratch database must be set before the app migrates its database
+    app = create_app('development', {'DATABASE_URI': 'sqlite:///' + db_file.name})
+    app.config.update(
+        FRAME_SOURCE='synthetic:1?fps=30',
+        FRAME_INTERVAL=0.01,
+        ADAPTIVE_FRAME_INTERVAL=False,
+        MAX_CONCURRENT_USERS=max(num_streams, 1),
+        STORAGE_INTERVAL=3600.0
+    )
+    app.config.update(config)
+    if not budgeted:
+        cpus = os.cpu_count()
+        app.config.update(CPU_CORE_BUDGET=None, CPU_SET=None, CPU_PIN_WORKERS=False,
+                          OPENCV_THREADS=cpus, TF_INTRA_OP_THREADS=cpus, TF_INTER_OP_THREADS=cpus)
+
+    try:
+        with app.app_context():
+            init_db()
+            db = get_db()
+            for i in range(1, num_streams + 1):
+                db.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                           (f'bench{i}', f'bench{i}@example.com', 'x'))
+            db.commit()
+
+        with app.test_request_context():
+            streams = [get_or_start_stream(i) for i in range(1, num_streams + 1)]
+        if not all(streams):
+            raise RuntimeError("Failed to start all streams")
+
+        time.sleep(warmup)
+        service = peek_inference_service()
+        start_stats = service.get_stats()
+        start_time = time.time()
+        time.sleep(duration)
+        end_stats = service.get_stats()
+        elapsed = time.time() - start_time
+
+        inference_times = [t for stream in streams for t in stream.inference_times]
+        return {
+            'streams': num_streams,
+            'budget': end_stats['cpu_budget'] if budgeted else None,
+            'frames_per_second': (end_stats['jobs'] - start_stats['jobs']) / elapsed,
+            'faces_per_second': (end_stats['faces'] - start_stats['faces']) / elapsed,
+            'avg_analysis_time': sum(inference_times) / len(inference_times) if inference_times else 0.0
+        }
+    finally:
+        cleanup_video_streams()
+        os.unlink(db_file.name)
+
+def _run(args):
+    """Process pool entry point for ``measure``."""
+    return measure(*args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--streams', default='1,4,10', help='Comma separated stream counts')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds measured per run')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds before measuring')
+    parser.add_argument('--cores', type=int, default=None, help='CPU_CORE_BUDGET for budgeted runs')
+    parser.add_argument('--workers', type=int, default=None, help='INFERENCE_WORKERS')
+    parser.add_argument('--pin', action='store_true', help='Pin workers to CPUs (Linux)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    config = {
+        'CPU_CORE_BUDGET': args.cores,
+        'CPU_PIN_WORKERS': args.pin,
+        'INFERENCE_WORKERS': args.workers
+    }
+    runs = []
+    for count in (int(n) for n in args.streams.split(',')):
+        runs.append((count, args.duration, args.warmup, config, False))
+        runs.append((count, args.duration, args.warmup, config, True))
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for run in runs:
+        # One process per run: TensorFlow's pool sizes are fixed on first use
+        with context.Pool(1) as pool:
+            result = pool.apply(_run, (run,))
+        results.append(result)
+        if not args.json:
+            label = 'budget ' if run[-1] else 'default'
+            num_streams = run[0]
+            print(f"{num_streams:3d} streams  {label}  "
+                  f"{result['frames_per_second']:7.1f} frames/s  "
+                  f"{result['faces_per_second']:7.1f} faces/s  "
+                  f"{result['avg_analysis_time'] * 1000:7.1f} ms/frame")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
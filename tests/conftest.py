@@ -0,0 +1,92 @@
+"""Shared fixtures: a temporary SQLite database with the current schema."""
+import os
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.config insists on a secret key for its production settings
+os.environ.setdefault('SECRET_KEY', 'test')
+
+from app.database.db import connect_db  # noqa: E402
+from app.database.emotion_vectors import EMOTION_LABELS, encode_emotions, dominant_emotion  # noqa: E402
+from app.database.migrations import create_schema  # noqa: E402
+
+def add_users(connection):
+    """Add users 1 and 2."""
+    with connection:
+        for i in (1, 2):
+            connection.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                               (f'user{i}', f'user{i}@example.com', 'x'))
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of an empty database file."""
+    return str(tmp_path / 'test.db')
+
+@pytest.fixture
+def db(db_path):
+    """Connection to a database with the current schema and two users."""
+    connection = connect_db(db_path)
+    create_schema(connection)
+    add_users(connection)
+    yield connection
+    connection.close()
+
+def make_record(user_id, timestamp, emotions):
+    """
+    Build a record row matching INSERT_EMOTION_RECORD.
+
+    Args:
+        user_id (int): User ID
+        timestamp (str): 'YYYY-MM-DD HH:MM:SS' timestamp
+        emotions (dict): Probabilities by emotion; missing ones are 0
+
+    Returns:
+        tuple: The row
+    """
+    emotions = {label: emotions.get(label, 0.0) for label in EMOTION_LABELS}
+    label, confidence = dominant_emotion(emotions)
+    return (user_id, timestamp, encode_emotions(emotions), label, confidence)
+
+@pytest.fixture
+def cli_app(db_path):
+    """Bare Flask app on the test database, for running CLI commands."""
+    from flask import Flask
+    from app.database.db import close_db
+
+    app = Flask(__name__)
+    app.config['DATABASE_URI'] = 'sqlite:///' + db_path
+    app.teardown_appcontext(close_db)
+    return app
+
+@pytest.fixture
+def stream_app(db_path, monkeypatch):
+    """App on a test database with two users, whose streams run on a scheduler that never loads a model."""
+    pytest.importorskip('tensorflow')
+    from app.factory import create_app
+    from app.models import admission, video_processor
+
+    app = create_app('testing', {'DATABASE_URI': 'sqlite:///' + db_path, 'MAX_STREAMS_PER_USER': 1,
+                                 'ADMISSION_QUEUE_TIMEOUT': 0.1})
+    connection = connect_db(db_path)
+    add_users(connection)
+    connection.close()
+    monkeypatch.setattr(video_processor, 'get_inference_service', lambda: object())
+    monkeypatch.setattr(admission, '_admission_controller', None)
+    yield app
+    video_processor.cleanup_video_streams()
+
+def wait_until(condition, timeout=2.0):
+    """Poll a condition until it holds or the timeout passes; return its last value."""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def login(app, user_id):
+    """Test client whose session belongs to a user."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
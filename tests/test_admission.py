@@ -0,0 +1,65 @@
+"""Tests for stream admission and the release of stream slots."""
+import time
+
+import pytest
+
+from app.models.admission import AdmissionController, AdmissionRejected
+from tests.conftest import wait_until
+
+def test_per_user_limit_and_release():
+    admission = AdmissionController(max_streams=2, max_streams_per_user=1, queue_timeout=0.1)
+    admission.acquire(1)
+    with pytest.raises(AdmissionRejected):
+        admission.acquire(1)
+    admission.acquire(2)
+
+    admission.release(1)
+    admission.acquire(1)
+    assert admission.total_active == 2
+
+def test_release_is_idempotent():
+    admission = AdmissionController(max_streams=1)
+    admission.acquire(1)
+    admission.release(1)
+    admission.release(1)
+    assert admission.total_active == 0 and admission.active == {}
+
+def test_global_limit_times_out():
+    admission = AdmissionController(max_streams=1, queue_timeout=0.05)
+    admission.acquire(1)
+    with pytest.raises(AdmissionRejected):
+        admission.acquire(2)
+
+def test_waiting_request_gets_a_freed_slot():
+    import threading
+
+    admission = AdmissionController(max_streams=1, queue_timeout=2.0)
+    admission.acquire(1)
+    threading.Timer(0.05, admission.release, args=(1,)).start()
+    admission.acquire(2)
+    assert admission.active == {2: 1}
+
+def test_full_queue_is_rejected_at_once():
+    admission = AdmissionController(max_streams=1, max_queue_length=0, queue_timeout=5.0)
+    admission.acquire(1)
+    start = time.time()
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.acquire(2)
+    assert time.time() - start < 1.0
+    assert rejected.value.retry_after == admission.retry_after
+    assert admission.get_load()['rejected'] == 1
+
+def test_failing_source_releases_its_slot(stream_app, tmp_path):
+    from app.models.admission import get_admission_controller
+    from app.models.video_processor import active_streams, get_or_start_stream
+
+    missing = f'images:{tmp_path / "missing"}'
+    with stream_app.app_context():
+        admission = get_admission_controller()
+        for _ in range(3):
+            # The source can't open, so the capture thread ends at once
+            stream = get_or_start_stream(1, source=missing)
+            assert stream is not None
+            assert wait_until(lambda: not stream.running)
+            assert admission.active.get(1, 0) == 0
+            assert 1 not in active_streams
@@ -0,0 +1,135 @@
+"""Tests for the asynchronous serving mode of the streaming endpoints."""
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('tensorflow')
+pytest.importorskip('asgiref')
+
+from app.asgi import ChannelWatcher, create_asgi_app  # noqa: E402
+from app.models.broadcast import UpdateChannel  # noqa: E402
+from tests.conftest import login  # noqa: E402
+from tests.test_broadcast import FakeStream, parse_events  # noqa: E402
+
+def test_watcher_wakes_on_publish_from_another_thread():
+    async def main():
+        channel = UpdateChannel()
+        watcher = ChannelWatcher(asyncio.get_running_loop())
+        with watcher.watching(channel):
+            threading.Timer(0.05, channel.publish, args=('a',)).start()
+            result = await watcher.wait(channel, 0, timeout=2.0)
+        assert channel.listeners == []
+        return result
+
+    assert asyncio.run(main()) == (1, 'a')
+
+def test_watcher_times_out():
+    async def main():
+        channel = UpdateChannel()
+        watcher = ChannelWatcher(asyncio.get_running_loop())
+        with watcher.watching(channel):
+            return await watcher.wait(channel, 0, timeout=0.05)
+
+    assert asyncio.run(main()) == (0, None)
+
+def test_watcher_shares_one_listener_per_channel():
+    async def main():
+        channel = UpdateChannel()
+        watcher = ChannelWatcher(asyncio.get_running_loop())
+        waiters = []
+        for _ in range(3):
+            watcher.subscribe(channel)
+            waiters.append(asyncio.ensure_future(watcher.wait(channel, 0, timeout=2.0)))
+        await asyncio.sleep(0.01)
+        assert len(channel.listeners) == 1
+
+        channel.publish('a')
+        results = await asyncio.gather(*waiters)
+        for _ in range(3):
+            watcher.unsubscribe(channel)
+        return results, channel.listeners
+
+    results, listeners = asyncio.run(main())
+    assert results == [(1, 'a')] * 3 and listeners == []
+
+def session_cookie(app, user_id):
+    """Cookie header of a logged-in user's session."""
+    client = login(app, user_id)
+    cookie = client.get_cookie(app.config.get('SESSION_COOKIE_NAME', 'session'))
+    return f'{cookie.key}={cookie.value}'.encode()
+
+def http_scope(path, cookie=None):
+    headers = [(b'cookie', cookie)] if cookie else []
+    return {'type': 'http', 'method': 'GET', 'path': path, 'root_path': '', 'query_string': b'',
+            'headers': headers, 'client': ('127.0.0.1', 1234), 'server': ('testserver', 80),
+            'scheme': 'http', 'http_version': '1.1', 'asgi': {'version': '3.0'}}
+
+async def call(app, scope, disconnect, on_message=None):
+    """Run an ASGI request until ``disconnect`` is set; return the messages sent."""
+    messages = []
+    requested = []
+
+    async def receive():
+        if not requested:
+            requested.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+        if on_message is not None:
+            on_message(message)
+
+    await app(scope, receive, send)
+    return messages
+
+def test_events_are_pushed(stream_app, monkeypatch):
+    from app.models import video_processor
+
+    stream = FakeStream()
+    monkeypatch.setitem(video_processor.active_streams, 1, stream)
+    asgi_app = create_asgi_app(stream_app)
+    cookie = session_cookie(stream_app, 1)
+
+    async def main():
+        disconnect = asyncio.Event()
+        bodies = []
+
+        def on_message(message):
+            bodies.append(message.get('body', b''))
+            if b'event: status' in bodies[-1]:
+                threading.Timer(0.05, stream.updates.publish,
+                                args=({'emotion': {'dominant_emotion': 'sad'}},)).start()
+            if b'event: emotion' in bodies[-1]:
+                disconnect.set()
+
+        messages = await call(asgi_app, http_scope('/api/events', cookie), disconnect, on_message)
+        return messages, bodies
+
+    messages, bodies = asyncio.run(asyncio.wait_for(main(), 5.0))
+    assert messages[0]['status'] == 200
+    assert bodies[1] == b'retry: 3000\n\n'
+    assert parse_events(bodies[2]) == [('status', {'active': True})]
+    assert parse_events(bodies[3]) == [('emotion', {'dominant_emotion': 'sad'})]
+    assert stream.viewer_count == 0
+
+def test_events_need_a_login(stream_app):
+    asgi_app = create_asgi_app(stream_app)
+
+    async def main():
+        return await call(asgi_app, http_scope('/api/events'), asyncio.Event())
+
+    messages = asyncio.run(asyncio.wait_for(main(), 5.0))
+    assert messages[0]['status'] == 401
+
+def test_other_routes_go_to_flask(stream_app):
+    asgi_app = create_asgi_app(stream_app)
+
+    async def main():
+        return await call(asgi_app, http_scope('/api/load'), asyncio.Event())
+
+    messages = asyncio.run(asyncio.wait_for(main(), 5.0))
+    # Served by the Flask route, which also requires a login
+    assert messages[0]['status'] == 401
@@ -0,0 +1,117 @@
+"""Tests for the latest-value update channel and the push endpoint."""
+import json
+import threading
+
+from app.models.broadcast import UpdateChannel, ViewerMailbox
+from tests.conftest import login
+
+def test_wait_returns_the_newest_value():
+    channel = UpdateChannel()
+    channel.publish('a')
+    channel.publish('b')
+    assert channel.wait(0) == (2, 'b')
+    assert channel.wait(2, timeout=0.01) == (2, None)
+
+def test_wait_wakes_on_publish():
+    channel = UpdateChannel()
+    threading.Timer(0.05, channel.publish, args=('a',)).start()
+    assert channel.wait(0, timeout=2.0) == (1, 'a')
+
+def test_close_releases_waiters():
+    channel = UpdateChannel()
+    threading.Timer(0.05, channel.close).start()
+    assert channel.wait(0, timeout=2.0) == (0, None)
+    assert channel.closed
+
+def test_listeners_are_called_on_publish_and_close():
+    channel = UpdateChannel()
+    calls = []
+    channel.add_listener(lambda: calls.append(channel.version))
+    channel.add_listener(lambda: 1 / 0)  # A failing listener doesn't stop the others
+    channel.publish('a')
+    channel.close()
+    assert calls == [1, 1]
+
+    channel.remove_listener(channel.listeners[0])
+    channel.publish('b')
+    assert calls == [1, 1]
+
+def test_slow_viewer_skips_to_the_newest_value():
+    channel = UpdateChannel()
+    mailbox = ViewerMailbox(channel)
+    channel.publish('a')
+    assert mailbox.take() == 'a'
+    for value in 'bcd':
+        channel.publish(value)
+    assert mailbox.take() == 'd'
+    assert mailbox.get_stats()['delivered'] == 2 and mailbox.skipped == 2
+    assert mailbox.take(timeout=0.01) is None
+
+def test_values_before_the_first_delivery_are_not_skips():
+    channel = UpdateChannel()
+    for value in 'ab':
+        channel.publish(value)
+    mailbox = ViewerMailbox(channel)
+    assert mailbox.take() == 'b' and mailbox.skipped == 0
+
+def test_accept_ignores_old_versions():
+    mailbox = ViewerMailbox(UpdateChannel())
+    assert mailbox.accept(2, 'b') == 'b'
+    assert mailbox.accept(2, 'b') is None
+    assert mailbox.accept(1, 'a') is None
+    assert mailbox.accept(3, None) is None
+    assert mailbox.delivered == 1
+
+def test_effective_rate(monkeypatch):
+    from app.models import broadcast
+
+    now = {'value': 0.0}
+    monkeypatch.setattr(broadcast.time, 'time', lambda: now['value'])
+    mailbox = ViewerMailbox(UpdateChannel())
+    assert mailbox.effective_rate() == 0.0
+    for version in range(1, 11):
+        mailbox.accept(version, 'frame')
+        now['value'] += 0.1
+    assert abs(mailbox.effective_rate() - 10.0) < 1e-6
+
+class FakeStream:
+    """Stand-in for a user's video stream publishing updates."""
+
+    def __init__(self):
+        self.updates = UpdateChannel()
+        self.viewer_count = 0
+
+    def attach_viewer(self):
+        self.viewer_count += 1
+
+    def detach_viewer(self):
+        self.viewer_count -= 1
+
+def parse_events(chunk):
+    """Split an SSE chunk into (event, data) pairs."""
+    events = []
+    for message in chunk.decode().strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.split('\n'))
+        events.append((fields.get('event'), json.loads(fields['data']) if 'data' in fields else None))
+    return events
+
+def test_events_relay_stream_updates(stream_app, monkeypatch):
+    from app.models import video_processor
+
+    stream = FakeStream()
+    monkeypatch.setitem(video_processor.active_streams, 1, stream)
+    response = login(stream_app, 1).get('/api/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.iter_encoded()
+
+    assert next(chunks) == b'retry: 3000\n\n'
+    assert parse_events(next(chunks)) == [('status', {'active': True})]
+    assert stream.viewer_count == 1
+
+    stream.updates.publish({'emotion': {'dominant_emotion': 'happy'}, 'metrics': {'fps': 30}})
+    assert parse_events(next(chunks)) == [('emotion', {'dominant_emotion': 'happy'})]
+    assert parse_events(next(chunks)) == [('metrics', {'fps': 30})]
+
+    # Disconnecting detaches the viewer
+    response.close()
+    assert stream.viewer_count == 0
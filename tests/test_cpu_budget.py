@@ -0,0 +1,69 @@
+"""Tests for CPU thread budgeting."""
+import os
+import threading
+
+import cv2
+import pytest
+
+from app.models.cpu_budget import CpuBudget, available_cpus, parse_cpu_list
+
+def test_parse_cpu_list():
+    assert parse_cpu_list('0-3,6') == [0, 1, 2, 3, 6]
+    assert parse_cpu_list(' 2, 1,1 ') == [1, 2]
+
+@pytest.mark.parametrize('spec', ['', ',', '3-1', 'a'])
+def test_malformed_cpu_list_is_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_cpu_list(spec)
+
+def test_cores_are_shared_between_workers():
+    budget = CpuBudget(cores=8, cpus=range(16), workers=4)
+    assert budget.threads_per_worker == 2
+    assert budget.opencv_threads == budget.tf_intra_op_threads == 2
+    assert budget.tf_inter_op_threads == 1
+    assert [budget.worker_cpus(i) for i in range(5)] == [[0, 1], [2, 3], [4, 5], [6, 7], [0, 1]]
+
+def test_every_worker_gets_a_thread():
+    budget = CpuBudget(cores=2, cpus=range(2), workers=5)
+    assert budget.threads_per_worker == 1
+    assert budget.worker_cpus(3) == [1]
+
+def test_budget_is_capped_by_the_allowed_cpus():
+    budget = CpuBudget(cores=64, cpus=[2, 3])
+    assert budget.cores == budget.workers == 2
+
+def test_overrides_and_config():
+    budget = CpuBudget.from_config({
+        'CPU_CORE_BUDGET': 4, 'CPU_SET': '0-7', 'INFERENCE_WORKERS': 2,
+        'OPENCV_THREADS': 1, 'TF_INTER_OP_THREADS': 2
+    })
+    assert budget.get_stats() == {
+        'cores': 4, 'cpus': [0, 1, 2, 3], 'workers': 2, 'opencv_threads': 1,
+        'tf_intra_op_threads': 2, 'tf_inter_op_threads': 2, 'pinned': False
+    }
+    assert CpuBudget.from_config({'INFERENCE_WORKERS': 2}, workers=3).workers == 3
+
+def test_apply_sizes_the_opencv_pool():
+    previous = cv2.getNumThreads()
+    try:
+        CpuBudget(cores=1, cpus=[0]).apply()
+        assert cv2.getNumThreads() == 1
+    finally:
+        cv2.setNumThreads(previous)
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='needs CPU affinity')
+def test_pinned_worker_runs_on_its_cpus():
+    cpus = available_cpus()
+    budget = CpuBudget(cpus=cpus, workers=len(cpus), pin_workers=True)
+    seen = []
+
+    def worker():
+        budget.bind_current_worker(len(cpus) - 1)
+        seen.append(sorted(os.sched_getaffinity(threading.get_native_id())))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert seen == [[cpus[-1]]]
+    # Only the worker thread was bound
+    assert available_cpus() == cpus
@@ -0,0 +1,58 @@
+"""Tests for the pooled SQLite connections."""
+import sqlite3
+
+import pytest
+
+from app.database.db import ConnectionPool, connect_db
+
+def test_connections_are_reused(db_path):
+    pool = ConnectionPool(db_path, size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.get_stats() == {'size': 2, 'open': 1, 'idle': 1}
+    pool.close()
+    assert pool.get_stats()['open'] == 0
+
+def test_full_pool_times_out(db_path):
+    pool = ConnectionPool(db_path, size=1, timeout=0.05)
+    connection = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    pool.release(connection)
+    assert pool.acquire() is connection
+
+def test_released_connections_are_rolled_back(db, db_path):
+    pool = ConnectionPool(db_path)
+    connection = pool.acquire()
+    connection.execute("UPDATE users SET email = email || '.changed'")
+    pool.release(connection)
+    assert db.execute("SELECT COUNT(*) FROM users WHERE email LIKE '%.changed'").fetchone()[0] == 0
+
+def test_read_only_connections_reject_writes(db, db_path):
+    with ConnectionPool(db_path, readonly=True).connection() as connection:
+        assert connection.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 2
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute('DELETE FROM users')
+
+def test_in_memory_database_is_shared():
+    writer = ConnectionPool(':memory:')
+    reader = ConnectionPool(':memory:', readonly=True)
+    with writer.connection() as connection:
+        connection.execute('CREATE TABLE notes (text TEXT)')
+        connection.execute("INSERT INTO notes VALUES ('shared')")
+        connection.commit()
+    with reader.connection() as connection:
+        assert connection.execute('SELECT text FROM notes').fetchone()[0] == 'shared'
+    with writer.connection() as connection:
+        connection.execute('DROP TABLE notes')
+        connection.commit()
+    reader.close()
+    writer.close()
+
+def test_pragmas_are_applied(db_path):
+    connection = connect_db(db_path, {'journal_mode': 'WAL', 'busy_timeout': 1234})
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert connection.execute('PRAGMA busy_timeout').fetchone()[0] == 1234
+    connection.close()
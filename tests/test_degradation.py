@@ -0,0 +1,92 @@
+"""Tests for the overload degradation ladder."""
+import pytest
+
+from app.models import rate_controller
+from app.models.degradation import DEGRADATION_STEPS, DegradationLadder
+
+@pytest.fixture
+def cpu(monkeypatch):
+    """Settable CPU utilisation seen by the ladder."""
+    load = {'value': 0.0}
+    monkeypatch.setattr(rate_controller.cpu_monitor, 'sample', lambda: load['value'])
+    return load
+
+def make_ladder(**kwargs):
+    kwargs.setdefault('evaluate_period', 0)
+    kwargs.setdefault('escalate_after', 0)
+    kwargs.setdefault('recover_after', 0)
+    return DegradationLadder(**kwargs)
+
+def test_overload_climbs_one_step_at_a_time(cpu):
+    ladder = make_ladder()
+    cpu['value'] = 0.95
+    assert ladder.update() == 1
+    assert ladder.active_steps == ['haar_detector']
+    for _ in range(10):
+        ladder.update()
+    assert ladder.level == len(DEGRADATION_STEPS)
+    assert ladder.is_active('no_overlay')
+
+def test_recovery_steps_back_in_reverse(cpu):
+    ladder = make_ladder()
+    cpu['value'] = 0.95
+    ladder.update()
+    ladder.update()
+    cpu['value'] = 0.1
+    assert ladder.update() == 1
+    assert ladder.active_steps == ['haar_detector']
+    assert ladder.update() == 0
+    assert ladder.get_metrics()['changes'] == 4
+
+def test_between_thresholds_the_level_holds(cpu):
+    ladder = make_ladder()
+    cpu['value'] = 0.95
+    ladder.update()
+    cpu['value'] = 0.75
+    assert ladder.update() == 1
+
+def test_steps_wait_for_sustained_load(cpu):
+    ladder = make_ladder(escalate_after=60)
+    cpu['value'] = 0.95
+    assert ladder.update() == 0
+    assert ladder.overloaded_since is not None
+
+def test_slow_frames_count_as_overload(cpu):
+    ladder = make_ladder(latency_high=0.5)
+    for _ in range(20):
+        ladder.record(0.8)
+    assert ladder.update() == 1
+    assert ladder.p95_latency == pytest.approx(0.8)
+
+def test_steps_come_from_the_config():
+    ladder = DegradationLadder.from_config({'DEGRADATION_STEPS': 'primary_face, no_overlay'})
+    assert ladder.steps == ('primary_face', 'no_overlay')
+    with pytest.raises(ValueError):
+        DegradationLadder(steps=['grayscale'])
+
+def test_stream_waits_for_running_detection(stream_app, cpu):
+    from app.models.video_processor import VideoStream
+
+    with stream_app.app_context():
+        stream = VideoStream(user_id=1, source='synthetic:1')
+    stream.degradation = make_ladder(steps=('haar_detector', 'primary_face'))
+    preprocessor = stream.face_preprocessor
+    cpu['value'] = 0.95
+
+    # A detection is running: nothing changes under it
+    with preprocessor.lock:
+        stream._apply_degradation()
+        assert stream.degraded_steps == set() and preprocessor.max_faces is None
+
+    # The next frame picks the change up
+    stream._apply_degradation()
+    assert stream.degraded_steps == {'haar_detector', 'primary_face'}
+    assert preprocessor.detector_type == 'haar' and preprocessor.max_faces == 1
+
+    cpu['value'] = 0.1
+    stream._apply_degradation()
+    stream._apply_degradation()
+    assert stream.degraded_steps == set()
+    assert preprocessor.detector_type == preprocessor.configured_detector
+    assert preprocessor.max_faces is None
+    stream.stop()
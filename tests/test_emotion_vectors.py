@@ -0,0 +1,84 @@
+"""Tests for the float32 emotion vector format."""
+import numpy as np
+import pytest
+
+from app.database.db import connect_db
+from app.database.emotion_vectors import (
+    EMOTION_LABELS, VECTOR_SIZE, decode_emotions, decode_matrix, dominant_emotion, encode_emotions,
+    load_emotion_range, migrate_dominant_emotions
+)
+from app.database.writer import INSERT_EMOTION_RECORD
+from tests.conftest import make_record
+
+def test_vectors_round_trip():
+    emotions = {'happy': 0.7, 'sad': 0.2, 'surprise': 0.1}
+    blob = encode_emotions(emotions)
+    assert len(blob) == VECTOR_SIZE == 28
+
+    decoded = decode_emotions(blob)
+    assert list(decoded) == list(EMOTION_LABELS)
+    assert decoded['happy'] == pytest.approx(0.7) and decoded['angry'] == 0.0
+    assert sum(decoded.values()) == pytest.approx(1.0)
+
+def test_vectors_are_little_endian_float32_in_label_order():
+    blob = encode_emotions({'angry': 1.0, 'surprise': 0.5})
+    assert blob[:4] == b'\x00\x00\x80\x3f'
+    assert blob[-4:] == b'\x00\x00\x00\x3f'
+
+def test_unknown_emotions_are_not_stored():
+    assert decode_emotions(encode_emotions({'bored': 1.0})) == dict.fromkeys(EMOTION_LABELS, 0.0)
+
+def test_blobs_decode_into_one_matrix():
+    blobs = [encode_emotions({'happy': 1.0}), encode_emotions({'fear': 0.5, 'sad': 0.5})]
+    matrix = decode_matrix(blobs)
+    assert matrix.shape == (2, len(EMOTION_LABELS)) and matrix.dtype == np.float32
+    assert EMOTION_LABELS[matrix[0].argmax()] == 'happy'
+    assert matrix[1, EMOTION_LABELS.index('fear')] == 0.5
+    assert decode_matrix([]).shape == (0, len(EMOTION_LABELS))
+
+def test_range_loads_oldest_first(db):
+    with db:
+        db.executemany(INSERT_EMOTION_RECORD, [
+            make_record(1, '2024-01-02 00:00:00', {'sad': 1.0}),
+            make_record(1, '2024-01-01 00:00:00', {'happy': 1.0}),
+            make_record(1, '2024-01-03 00:00:00', {'angry': 1.0}),
+            make_record(2, '2024-01-02 00:00:00', {'fear': 1.0}),
+        ])
+
+    timestamps, matrix = load_emotion_range(db, 1, start='2024-01-01 12:00:00')
+    assert [str(timestamp) for timestamp in timestamps] == ['2024-01-02 00:00:00', '2024-01-03 00:00:00']
+    assert [EMOTION_LABELS[i] for i in matrix.argmax(axis=1)] == ['sad', 'angry']
+
+    _, matrix = load_emotion_range(db, 1, end='2024-01-02 00:00:00')
+    assert matrix.shape == (1, len(EMOTION_LABELS))
+
+def test_dominant_emotion():
+    assert dominant_emotion({'happy': 0.3, 'sad': 0.6, 'angry': 0.1}) == ('sad', 0.6)
+    assert dominant_emotion({}) == ('neutral', 0.0)
+
+def test_records_written_before_confidence_get_their_dominant_emotion(db_path):
+    connection = connect_db(db_path)
+    connection.executescript('''
+        CREATE TABLE emotion_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            emotion_vector BLOB NOT NULL,
+            dominant_emotion TEXT NOT NULL DEFAULT 'neutral',
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX idx_emotion_records_user_id ON emotion_records (user_id);
+    ''')
+    connection.executemany('INSERT INTO emotion_records (user_id, emotion_vector) VALUES (1, ?)',
+                           [(encode_emotions({'fear': 0.9, 'sad': 0.1}),), (encode_emotions({}),)])
+    connection.commit()
+
+    assert migrate_dominant_emotions(connection) == 2
+    rows = connection.execute('SELECT dominant_emotion, confidence FROM emotion_records ORDER BY id').fetchall()
+    assert rows[0][0] == 'fear' and rows[0][1] == pytest.approx(0.9)
+    # All zeros: the first label wins, with no confidence
+    assert tuple(rows[1]) == ('angry', 0.0)
+
+    indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert indexes == {'idx_emotion_records_user_time', 'idx_emotion_records_user_dominant'}
+    assert migrate_dominant_emotions(connection) == 0
+    connection.close()
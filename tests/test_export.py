@@ -0,0 +1,120 @@
+"""Tests for the streaming emotion export."""
+import csv
+import io
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from app.database.emotion_vectors import EMOTION_LABELS
+from app.database.export import EmotionExporter, export_emotions_command, read_columnar
+from app.database.writer import INSERT_EMOTION_RECORD
+from tests.conftest import login, make_record
+
+ROWS = [
+    make_record(1, '2026-01-01 10:00:00', {'happy': 0.75, 'sad': 0.25}),
+    make_record(2, '2026-01-01 11:00:00', {'angry': 1.0}),
+    make_record(1, '2026-01-01 12:00:00.250000', {'fear': 0.5, 'surprise': 0.5}),
+    make_record(1, '2026-01-02 09:00:00', {'neutral': 1.0}),
+]
+
+@pytest.fixture
+def records(db):
+    with db:
+        db.executemany(INSERT_EMOTION_RECORD, ROWS)
+    return db
+
+def export(connection, export_format, **kwargs):
+    exporter = EmotionExporter(connection, export_format, chunk_size=2, **kwargs)
+    return b''.join(exporter), exporter
+
+def test_columnar_round_trip(records):
+    data, exporter = export(records, 'columnar')
+    chunks = list(read_columnar(io.BytesIO(data)))
+    assert [len(chunk['id']) for chunk in chunks] == [2, 2]
+    columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+    assert columns['id'].tolist() == [1, 2, 3, 4]
+    assert columns['user_id'].tolist() == [1, 2, 1, 1]
+    timestamps = columns['timestamp'].astype('datetime64[us]').astype(str).tolist()
+    assert timestamps[2] == '2026-01-01T12:00:00.250000'
+    assert [EMOTION_LABELS[i] for i in columns['dominant_emotion']] == ['happy', 'angry', 'fear', 'neutral']
+    assert columns['confidence'][0] == 0.75
+    assert columns['emotions'].shape == (4, len(EMOTION_LABELS))
+    assert columns['emotions'][0, EMOTION_LABELS.index('sad')] == 0.25
+
+    stats = exporter.get_stats()
+    assert stats['rows'] == 4 and stats['bytes'] == len(data)
+
+def test_columnar_reader_rejects_other_data():
+    with pytest.raises(ValueError):
+        list(read_columnar(io.BytesIO(b'id,user_id\n')))
+
+def test_csv_export(records):
+    data, exporter = export(records, 'csv', user_id=1)
+    rows = list(csv.DictReader(io.StringIO(data.decode())))
+    assert [row['id'] for row in rows] == ['1', '3', '4']
+    assert rows[0]['timestamp'] == '2026-01-01 10:00:00'
+    assert float(rows[0]['happy']) == 0.75 and rows[0]['dominant_emotion'] == 'happy'
+    assert exporter.filename == 'emotions-user1.csv' and exporter.mimetype == 'text/csv'
+
+def test_ndjson_export_of_a_range(records):
+    data, _ = export(records, 'ndjson', start='2026-01-01 11:00:00', end='2026-01-02 00:00:00')
+    lines = [json.loads(line) for line in data.decode().splitlines()]
+    assert [line['id'] for line in lines] == [2, 3]
+    assert lines[1]['emotions']['surprise'] == 0.5
+
+def test_empty_export_has_header_only(db):
+    data, _ = export(db, 'csv')
+    assert data.decode().splitlines() == [','.join(['id', 'user_id', 'timestamp', 'dominant_emotion',
+                                                    'confidence', *EMOTION_LABELS])]
+    assert list(read_columnar(io.BytesIO(export(db, 'columnar')[0]))) == []
+
+def test_unknown_format_is_rejected(db):
+    with pytest.raises(ValueError):
+        EmotionExporter(db, 'xml')
+
+def test_command_reads_timestamps_like_the_api(records, cli_app, tmp_path):
+    output = tmp_path / 'export.ndjson'
+    result = cli_app.test_cli_runner().invoke(export_emotions_command, [
+        '--format', 'ndjson', '--from', '2026-01-01T12:00:00+02:00', '--to', '2026-01-02',
+        '--output', str(output)])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line)['id'] for line in output.read_text().splitlines()] == [1, 2, 3]
+
+    result = cli_app.test_cli_runner().invoke(export_emotions_command, ['--from', 'yesterday'])
+    assert result.exit_code == 2
+
+def test_api_export_closes_its_connection(stream_app, db_path, monkeypatch):
+    from app.api import routes
+    from app.database.db import connect_db
+
+    connection = connect_db(db_path)
+    with connection:
+        connection.executemany(INSERT_EMOTION_RECORD, ROWS)
+    connection.close()
+    connections = []
+
+    def connect(*args, **kwargs):
+        connections.append(connect_db(*args, **kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(routes, 'connect_db', connect)
+    client = login(stream_app, 1)
+
+    response = client.get('/api/export?format=ndjson&from=2026-01-01T12:00:00%2B01:00')
+    assert [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()] == [3, 4]
+    response.close()
+    assert client.get('/api/export?user_id=2').status_code == 403
+    assert client.get('/api/export?from=soon').status_code == 400
+
+    # A client that leaves before the server reads any of the body
+    environ = EnvironBuilder('/api/export', headers={
+        'Cookie': f"session={client.get_cookie('session').value}"}).get_environ()
+    stream_app.wsgi_app(environ, lambda status, headers: None).close()
+    assert len(connections) == 2
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
@@ -0,0 +1,14 @@
+"""Tests for the application factory."""
+import pytest
+
+def test_shutdown_handlers_are_registered_once(db_path, monkeypatch):
+    pytest.importorskip('tensorflow')
+    from app import factory
+
+    registered = []
+    monkeypatch.setattr(factory.atexit, 'register', registered.append)
+    monkeypatch.setattr(factory, '_shutdown_registered', False)
+    for _ in range(3):
+        factory.create_app('testing', {'DATABASE_URI': 'sqlite:///' + db_path})
+    assert [handler.__name__ for handler in registered] == [
+        'shutdown_record_writer', 'shutdown_retention_engine', 'cleanup_video_streams']
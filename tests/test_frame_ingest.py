@@ -0,0 +1,102 @@
+"""Tests for frames pushed by browsers to /api/frames."""
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+
+from app.api import emotion_recognition  # noqa: E402
+from app.api.emotion_recognition import TokenBucketLimiter, decode_frame  # noqa: E402
+from tests.conftest import login  # noqa: E402
+
+def test_token_bucket_allows_bursts_then_paces(monkeypatch):
+    now = {'value': 100.0}
+    monkeypatch.setattr(emotion_recognition.time, 'time', lambda: now['value'])
+    limiter = TokenBucketLimiter(rate=2.0, burst=3)
+
+    assert [limiter.acquire('a') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire('a') == pytest.approx(0.5)
+    assert limiter.acquire('b') == 0.0
+
+    now['value'] += 0.5
+    assert limiter.acquire('a') == 0.0
+
+def test_token_bucket_forgets_old_clients():
+    limiter = TokenBucketLimiter(max_clients=2)
+    for client_id in ('a', 'b', 'c'):
+        limiter.acquire(client_id)
+    assert list(limiter.buckets) == ['b', 'c']
+
+def test_decode_raw_frames():
+    rgba = np.zeros((2, 3, 4), dtype=np.uint8)
+    rgba[..., 0] = 255  # Red
+    frame = decode_frame(rgba.tobytes(), 'application/octet-stream', width=3, height=2)
+    assert frame.shape == (2, 3, 3)
+    assert frame[0, 0].tolist() == [0, 0, 255]
+
+    with pytest.raises(ValueError):
+        decode_frame(rgba.tobytes(), 'application/octet-stream', width=4, height=2)
+    with pytest.raises(ValueError):
+        decode_frame(rgba.tobytes(), 'application/octet-stream', width=3, height=2, pixel_format='yuv')
+
+def test_decode_images():
+    image = np.full((8, 8, 3), 128, dtype=np.uint8)
+    png = cv2.imencode('.png', image)[1].tobytes()
+    assert np.array_equal(decode_frame(png, 'image/png'), image)
+    with pytest.raises(ValueError):
+        decode_frame(b'not an image', 'image/jpeg')
+
+class FakeService:
+    """Inference service finding one happy face in every frame."""
+
+    def run(self, client_id, function, timeout=None, priority=None):
+        return [np.zeros((96, 96, 3))], [(1, 2, 3, 4)]
+
+    def predict(self, client_id, faces, timeout=None, priority=None):
+        return [{'happy': 0.9, 'sad': 0.1} for _ in faces]
+
+@pytest.fixture
+def ingest_app(stream_app, monkeypatch):
+    stream_app.config.update(INGEST_MAX_FRAME_BYTES=1000, INGEST_MAX_FPS=100, INGEST_BURST=100)
+    monkeypatch.setattr(emotion_recognition, 'get_inference_service', lambda: FakeService())
+    monkeypatch.setattr(emotion_recognition, '_rate_limiter', None)
+    return stream_app
+
+def raw_frame(width, height):
+    return np.zeros((height, width, 4), dtype=np.uint8).tobytes()
+
+def post_raw(client, body, width, height, chunked=False):
+    headers = {'X-Frame-Width': str(width), 'X-Frame-Height': str(height)}
+    if not chunked:
+        return client.post('/api/frames', data=body, headers=headers,
+                           content_type='application/octet-stream')
+    # A chunked upload: no Content-Length, the server reads to the end
+    headers['Transfer-Encoding'] = 'chunked'
+    return client.post('/api/frames', input_stream=io.BytesIO(body), headers=headers,
+                       content_type='application/octet-stream',
+                       environ_overrides={'wsgi.input_terminated': True})
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_frame_is_analyzed(ingest_app, chunked):
+    response = post_raw(login(ingest_app, 1), raw_frame(10, 20), 10, 20, chunked)
+    assert response.status_code == 200
+    assert response.json['width'] == 10 and response.json['height'] == 20
+    assert response.json['faces'] == [{'box': [1, 2, 3, 4], 'dominant_emotion': 'happy',
+                                       'emotions': {'happy': 0.9, 'sad': 0.1}}]
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_oversized_frame_is_rejected(ingest_app, chunked):
+    response = post_raw(login(ingest_app, 1), raw_frame(20, 20), 20, 20, chunked)
+    assert response.status_code == 413
+
+def test_rate_limit(ingest_app):
+    ingest_app.config.update(INGEST_MAX_FPS=0.1, INGEST_BURST=1)
+    client = login(ingest_app, 1)
+    assert post_raw(client, raw_frame(10, 20), 10, 20).status_code == 200
+    response = post_raw(client, raw_frame(10, 20), 10, 20)
+    assert response.status_code == 429 and int(response.headers['Retry-After']) >= 1
+
+def test_login_is_required(ingest_app):
+    assert post_raw(ingest_app.test_client(), raw_frame(10, 20), 10, 20).status_code == 401
@@ -0,0 +1,107 @@
+"""Tests for the pluggable frame sources."""
+import cv2
+import numpy as np
+import pytest
+
+from app.models.frame_sources import (
+    ImageDirectorySource, NetworkStreamSource, SyntheticFaceSource, VideoFileSource,
+    WebcamSource, create_frame_source
+)
+
+def read_all(source, limit=1000):
+    frames = []
+    while len(frames) < limit:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    return frames
+
+def test_synthetic_frames_are_reproducible():
+    first = SyntheticFaceSource(seed=3, num_faces=2, realtime=False, num_frames=5)
+    second = SyntheticFaceSource(seed=3, num_faces=2, realtime=False, num_frames=5)
+    assert first.open() and second.open()
+
+    frames = read_all(first)
+    assert len(frames) == 5 and first.exhausted
+    assert all(np.array_equal(a, b) for a, b in zip(frames, read_all(second)))
+    assert frames[0].shape == (480, 640, 3)
+    assert not np.array_equal(frames[0], frames[4])
+
+def test_unopened_source_reads_nothing():
+    source = SyntheticFaceSource(realtime=False)
+    assert source.read() == (False, None)
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """Directory of three images and a file that isn't one."""
+    for i in range(3):
+        cv2.imwrite(str(tmp_path / f'{i}.png'), np.full((20, 30, 3), i * 50, dtype=np.uint8))
+    (tmp_path / 'notes.txt').write_text('not an image')
+    return tmp_path
+
+def test_image_directory_plays_in_name_order(image_dir):
+    source = ImageDirectorySource(str(image_dir), realtime=False, loop=False)
+    assert source.open()
+    frames = read_all(source)
+    assert [int(frame[0, 0, 0]) for frame in frames] == [0, 50, 100]
+    assert source.exhausted and source.frames_read == 3
+
+def test_image_directory_loops(image_dir):
+    source = ImageDirectorySource(str(image_dir), realtime=False)
+    source.open()
+    frames = read_all(source, limit=7)
+    assert [int(frame[0, 0, 0]) for frame in frames] == [0, 50, 100, 0, 50, 100, 0]
+    assert not source.exhausted
+
+def test_missing_directory_does_not_open(tmp_path):
+    assert not ImageDirectorySource(str(tmp_path / 'missing')).open()
+    assert not ImageDirectorySource(str(tmp_path)).open()
+
+def test_video_file_source(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 15, (64, 48))
+    if not writer.isOpened():
+        pytest.skip('OpenCV was built without a video writer')
+    for i in range(6):
+        writer.write(np.full((48, 64, 3), i * 40, dtype=np.uint8))
+    writer.release()
+
+    source = create_frame_source(f'file:{path}?realtime=0&loop=0')
+    assert source.open()
+    assert source.fps == 15 and source.frame_count == 6
+    assert len(read_all(source)) == 6 and source.exhausted
+    source.release()
+    assert not source.is_opened()
+
+def test_realtime_source_is_paced():
+    import time
+
+    source = SyntheticFaceSource(fps=50.0, num_frames=6)
+    source.open()
+    start = time.time()
+    read_all(source)
+    assert time.time() - start >= 0.09
+
+@pytest.mark.parametrize('spec, source_type', [
+    (0, WebcamSource),
+    ('1', WebcamSource),
+    ('webcam:2?width=320', WebcamSource),
+    ('file:/videos/a.mp4', VideoFileSource),
+    ('images:/frames?fps=5', ImageDirectorySource),
+    ('synthetic:7?faces=3&frames=10', SyntheticFaceSource),
+    ('rtsp://camera/stream', NetworkStreamSource),
+    ('http://camera/stream.mjpg', NetworkStreamSource),
+])
+def test_create_frame_source(spec, source_type):
+    assert type(create_frame_source(spec)) is source_type
+
+def test_create_frame_source_parses_options():
+    source = create_frame_source('synthetic:7?faces=3&frames=10&fps=5&realtime=off')
+    assert (source.seed, source.num_faces, source.num_frames, source.fps, source.realtime) == (7, 3, 10, 5.0, False)
+    assert create_frame_source('webcam:2?width=320').width == 320
+    assert create_frame_source(source) is source
+
+def test_unknown_source_is_rejected():
+    with pytest.raises(ValueError):
+        create_frame_source('ftp:/somewhere')
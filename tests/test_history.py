@@ -0,0 +1,63 @@
+"""Tests for cursors and keyset-paginated history."""
+import pytest
+
+from app.database.records import decode_cursor, encode_cursor, get_history_page
+from app.database.writer import INSERT_EMOTION_RECORD
+from tests.conftest import make_record
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('2026-01-01 10:00:00.123456', 42)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == ('2026-01-01 10:00:00.123456', 42)
+
+@pytest.mark.parametrize('cursor', ['', 'not-a-cursor', encode_cursor(1, 'x')])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def load(db, rows):
+    with db:
+        db.executemany(INSERT_EMOTION_RECORD, rows)
+
+def read_all(db, limit, **filters):
+    """Follow next_cursor to the end; return the record IDs and page count."""
+    ids, cursor, pages = [], None, 0
+    while True:
+        records, cursor = get_history_page(db, 1, cursor=cursor, limit=limit, **filters)
+        ids.extend(record['id'] for record in records)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+def test_pages_cover_equal_timestamps_exactly_once(db):
+    # Many records share each timestamp, so pages split within a timestamp
+    rows = [make_record(1, f'2026-01-01 10:00:0{i // 7}', {'happy': 1.0}) for i in range(50)]
+    rows += [make_record(2, '2026-01-01 10:00:00', {'sad': 1.0}) for _ in range(5)]
+    load(db, rows)
+
+    ids, pages = read_all(db, limit=4)
+    expected = [row[0] for row in db.execute(
+        'SELECT id FROM emotion_records WHERE user_id = 1 ORDER BY timestamp DESC, id DESC')]
+    assert ids == expected
+    assert len(set(ids)) == 50
+    assert pages == 13
+
+def test_last_page_has_no_cursor(db):
+    load(db, [make_record(1, '2026-01-01 10:00:00', {'happy': 1.0}) for _ in range(4)])
+    records, cursor = get_history_page(db, 1, limit=4)
+    assert len(records) == 4 and cursor is None
+
+def test_filters_apply_across_pages(db):
+    rows = [make_record(1, f'2026-01-0{1 + i % 3} 12:00:00', {'happy' if i % 2 else 'sad': 1.0})
+            for i in range(30)]
+    load(db, rows)
+
+    ids, _ = read_all(db, limit=3, emotion='happy', start='2026-01-02', end='2026-01-03')
+    expected = [row[0] for row in db.execute(
+        "SELECT id FROM emotion_records WHERE dominant_emotion = 'happy' "
+        "AND timestamp >= '2026-01-02' AND timestamp < '2026-01-03' ORDER BY id DESC")]
+    assert ids == expected and ids
+
+def test_unknown_emotion_is_rejected(db):
+    with pytest.raises(ValueError):
+        get_history_page(db, 1, emotion='bored')
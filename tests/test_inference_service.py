@@ -0,0 +1,113 @@
+"""Tests for the fair-share ordering of the inference scheduler."""
+import pytest
+
+pytest.importorskip('tensorflow')
+
+from app.models.inference_service import (  # noqa: E402
+    BatchInferenceService, InferenceRequest, clear_client_share, set_client_share
+)
+
+@pytest.fixture
+def service():
+    """A scheduler whose queue is drained by the test instead of workers."""
+    service = BatchInferenceService(app=None, max_batch_wait=0)
+    service.running = True
+    yield service
+    for client_id in ('a', 'b'):
+        clear_client_share(client_id)
+
+def job(client_id, name, priority='interactive'):
+    return InferenceRequest(client_id, function=lambda: name, priority=priority)
+
+def drain(service):
+    order = []
+    while service.heap:
+        work = service._next_work()
+        if work:
+            order.append(work[0].function())
+    return order
+
+def test_clients_take_turns(service):
+    for i in range(3):
+        service._enqueue(job('a', f'a{i}'))
+    for i in range(3):
+        service._enqueue(job('b', f'b{i}'))
+    assert drain(service) == ['a0', 'b0', 'a1', 'b1', 'a2', 'b2']
+
+def test_share_weights_the_order(service):
+    set_client_share('a', 1.0)
+    set_client_share('b', 0.5)
+    for i in range(4):
+        service._enqueue(job('a', f'a{i}'))
+    for i in range(2):
+        service._enqueue(job('b', f'b{i}'))
+    order = drain(service)
+    # a is served twice as often as b
+    assert order == ['a0', 'b0', 'a1', 'a2', 'b1', 'a3']
+
+def test_cancelled_requests_are_skipped(service):
+    first, second = job('a', 'a0'), job('a', 'a1')
+    service._enqueue(first)
+    service._enqueue(second)
+    with pytest.raises(TimeoutError):
+        first.wait(timeout=0)
+    assert drain(service) == ['a1']
+    assert service.get_client_stats('a')['served'] == 1
+
+def test_full_queue_is_rejected(service):
+    from app.models.inference_service import InferenceQueueFull
+
+    service.max_queue_size = 2
+    service._enqueue(job('a', 'a0'))
+    service._enqueue(job('b', 'b0'))
+    with pytest.raises(InferenceQueueFull):
+        service._enqueue(job('a', 'a1'))
+
+class FakeModel:
+    """Model tagging each face with its value; returns None while broken."""
+
+    def __init__(self):
+        self.broken = False
+
+    def predict_batch(self, faces):
+        if self.broken:
+            return None
+        return [{'face': face} for face in faces]
+
+@pytest.fixture
+def workers():
+    """A running service on FakeModel, with one worker thread."""
+    import threading
+
+    service = BatchInferenceService(app=None, max_batch_wait=0.05)
+    service.model = FakeModel()
+    service.running = True
+    service.threads = [threading.Thread(target=service._run, daemon=True)]
+    service.threads[0].start()
+    yield service
+    service.stop()
+
+def test_batch_results_go_back_to_their_clients(workers):
+    first = workers.submit('a', [1, 2])
+    second = workers.submit('b', [3])
+    assert first.wait(2.0) == [{'face': 1}, {'face': 2}]
+    assert second.wait(2.0) == [{'face': 3}]
+    assert workers.run('a', lambda: 'done', timeout=2.0) == 'done'
+
+    stats = workers.get_stats()
+    assert stats['faces'] == 3 and stats['jobs'] == 1
+    assert stats['avg_batch_size'] == 3 / stats['batches']
+
+def test_failed_batch_fails_its_requests_and_not_the_worker(workers):
+    workers.model.broken = True
+    with pytest.raises(RuntimeError):
+        workers.predict('a', [1], timeout=2.0)
+
+    workers.model.broken = False
+    assert workers.predict('a', [2], timeout=2.0) == [{'face': 2}]
+    assert workers.threads[0].is_alive()
+
+def test_failing_job_reports_its_error(workers):
+    with pytest.raises(RuntimeError):
+        workers.run('a', lambda: 1 / 0, timeout=2.0)
+    assert workers.run('a', lambda: 'still running', timeout=2.0) == 'still running'
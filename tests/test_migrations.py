@@ -0,0 +1,132 @@
+"""Tests for the versioned schema migrations."""
+import json
+import sqlite3
+
+from app.database.db import connect_db
+from app.database.emotion_vectors import decode_emotions
+from app.database.migrations import MIGRATIONS, apply_migrations, get_pending_migrations
+
+# Schema of the first release: JSON probabilities, no rollups, no migrations table
+BASELINE_SCHEMA = '''
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_login TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE emotion_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    emotions_data TEXT NOT NULL,
+    dominant_emotion TEXT NOT NULL DEFAULT 'neutral',
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    session_token TEXT UNIQUE NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE settings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER UNIQUE NOT NULL,
+    theme TEXT DEFAULT 'light',
+    notification_enabled BOOLEAN DEFAULT TRUE,
+    privacy_mode BOOLEAN DEFAULT FALSE,
+    analysis_frequency INTEGER DEFAULT 5,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE INDEX idx_emotion_records_user_id ON emotion_records (user_id);
+CREATE INDEX idx_emotion_records_timestamp ON emotion_records (timestamp);
+'''
+
+def make_baseline(path):
+    """Create a first-release database with a user and three records."""
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.execute("INSERT INTO users (username, email, password_hash) VALUES ('a', 'a@example.com', 'x')")
+    connection.executemany(
+        'INSERT INTO emotion_records (user_id, emotions_data, timestamp) VALUES (1, ?, ?)',
+        [(json.dumps({'happy': 0.7, 'sad': 0.3}), '2026-01-01 10:00:00'),
+         (json.dumps({'happy': 0.2, 'angry': 0.8}), '2026-01-01 10:00:02'),
+         (json.dumps({'neutral': 1.0}), '2026-01-02 09:00:00')])
+    connection.commit()
+    connection.close()
+
+def test_new_database_gets_current_schema(db_path):
+    connection = connect_db(db_path)
+    assert apply_migrations(connection, db_path) == ['schema']
+    assert get_pending_migrations(connection) == []
+    assert connection.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    connection.close()
+
+def test_baseline_database_is_migrated(db_path):
+    make_baseline(db_path)
+    connection = connect_db(db_path)
+
+    applied = apply_migrations(connection, db_path) + apply_migrations(connection, db_path, online=True)
+    assert applied == [migration.name for migration in MIGRATIONS]
+
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(emotion_records)')]
+    assert 'emotions_data' not in columns and 'confidence' in columns
+    rows = connection.execute(
+        'SELECT emotion_vector, dominant_emotion, confidence FROM emotion_records ORDER BY id').fetchall()
+    assert [row[1] for row in rows] == ['happy', 'angry', 'neutral']
+    assert abs(decode_emotions(rows[0][0])['sad'] - 0.3) < 1e-6
+    assert abs(rows[1][2] - 0.8) < 1e-6
+
+    # The rollups were built from the existing records
+    days = connection.execute(
+        "SELECT CAST(bucket_start AS TEXT), samples FROM emotion_rollups WHERE resolution = 'day' ORDER BY bucket_start").fetchall()
+    assert [tuple(row) for row in days] == [('2026-01-01 00:00:00', 2), ('2026-01-02 00:00:00', 1)]
+
+    indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_emotion_records_user_time', 'idx_emotion_records_user_dominant',
+            'idx_emotion_rollups_resolution_time'} <= indexes
+    connection.close()
+
+def test_migrating_again_is_a_no_op(db_path):
+    make_baseline(db_path)
+    connection = connect_db(db_path)
+    apply_migrations(connection, db_path)
+    apply_migrations(connection, db_path, online=True)
+    before = connection.execute('SELECT version, applied_at FROM schema_migrations ORDER BY version').fetchall()
+
+    assert apply_migrations(connection, db_path) == []
+    assert apply_migrations(connection, db_path, online=True) == []
+    after = connection.execute('SELECT version, applied_at FROM schema_migrations ORDER BY version').fetchall()
+    assert [tuple(row) for row in after] == [tuple(row) for row in before]
+    assert connection.execute('SELECT COUNT(*) FROM emotion_records').fetchone()[0] == 3
+    connection.close()
+
+def test_interrupted_migration_runs_again(db_path):
+    make_baseline(db_path)
+    connection = connect_db(db_path)
+    apply_migrations(connection, db_path)
+    # As if the process died after migrating but before recording it
+    with connection:
+        connection.execute('DELETE FROM schema_migrations WHERE version = 3')
+
+    assert apply_migrations(connection, db_path) == ['emotion_rollups']
+    assert connection.execute('SELECT COUNT(*) FROM emotion_records').fetchone()[0] == 3
+    connection.close()
+
+def test_timestamp_index_is_left_to_the_online_migration(db_path):
+    make_baseline(db_path)
+    connection = connect_db(db_path)
+
+    def indexes():
+        return {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    # Rebuilding the table drops the baseline's index; it isn't rebuilt while blocking
+    apply_migrations(connection, db_path)
+    assert 'idx_emotion_records_timestamp' not in indexes()
+    apply_migrations(connection, db_path, online=True)
+    assert 'idx_emotion_records_timestamp' in indexes()
+    connection.close()
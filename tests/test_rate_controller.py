@@ -0,0 +1,71 @@
+"""Tests for the adaptive frame-interval controller."""
+import pytest
+
+from app.models import rate_controller
+from app.models.rate_controller import AdaptiveIntervalController
+
+@pytest.fixture
+def cpu(monkeypatch):
+    """Settable CPU utilisation seen by the controllers."""
+    load = {'value': 0.0}
+    monkeypatch.setattr(rate_controller.cpu_monitor, 'sample', lambda: load['value'])
+    return load
+
+def make_controller(**kwargs):
+    kwargs.setdefault('adjust_period', 0)
+    return AdaptiveIntervalController(**kwargs)
+
+def test_overload_lengthens_the_interval(cpu):
+    controller = make_controller(base_interval=0.1, max_interval=0.2)
+    cpu['value'] = 0.95
+    assert controller.update([0.01])
+    assert controller.interval == pytest.approx(0.125)
+    for _ in range(10):
+        controller.update([0.01])
+    assert controller.interval == 0.2
+
+def test_slow_processing_counts_as_overload(cpu):
+    controller = make_controller(base_interval=0.1, target_latency=0.1)
+    assert controller.update([0.05] * 18 + [0.5, 0.5])
+    assert controller.p95_latency > 0.1 and controller.interval > 0.1
+
+def test_headroom_shortens_the_interval_to_its_minimum(cpu):
+    controller = make_controller(base_interval=0.5, min_interval=0.2)
+    for _ in range(30):
+        controller.update([0.01])
+    assert controller.interval == 0.2
+
+def test_between_thresholds_nothing_changes(cpu):
+    controller = make_controller(base_interval=0.3, target_cpu=0.75, headroom=0.8)
+    cpu['value'] = 0.7
+    assert not controller.update([0.01])
+    assert controller.interval == 0.3
+
+def test_resolution_steps_down_at_the_longest_interval(cpu):
+    controller = make_controller(base_interval=1.0, max_interval=1.0, adapt_resolution=True)
+    cpu['value'] = 0.95
+    controller.update([0.01])
+    controller.update([0.01])
+    assert controller.detection_scale == 0.5
+
+    # With headroom the resolution comes back before the rate
+    cpu['value'] = 0.1
+    controller.update([0.01])
+    assert controller.detection_scale == 0.75 and controller.interval == 1.0
+
+def test_adjustments_wait_for_the_period(cpu):
+    controller = make_controller(base_interval=0.1, adjust_period=60)
+    cpu['value'] = 0.95
+    assert not controller.update([0.01])
+    assert controller.interval == 0.1
+
+def test_config_interval_is_the_fastest_rate(cpu):
+    controller = AdaptiveIntervalController.from_config(
+        {'FRAME_INTERVAL': 0.2, 'MIN_FRAME_INTERVAL': 0.05, 'RATE_ADJUST_PERIOD': 0})
+    assert controller.interval == controller.min_interval == 0.2
+    for _ in range(10):
+        controller.update([0.01])
+    assert controller.interval == 0.2
+
+    controller = AdaptiveIntervalController.from_config({'FRAME_INTERVAL': 0.1, 'MIN_FRAME_INTERVAL': 0.3})
+    assert controller.interval == controller.min_interval == 0.3
@@ -0,0 +1,66 @@
+"""Tests for the write-behind emotion record writer."""
+import threading
+from datetime import datetime
+
+from app.database.db import connect_db
+from app.database.emotion_vectors import decode_emotions
+from app.database.writer import EmotionRecordWriter
+from tests.conftest import wait_until
+
+def test_records_are_written_with_their_rollups(db, db_path):
+    writer = EmotionRecordWriter(db_path, batch_size=2, flush_interval=0.05)
+    writer.start()
+    for second in range(3):
+        assert writer.submit(1, {'happy': 0.8, 'sad': 0.2}, datetime(2024, 1, 1, 12, 0, second))
+    writer.stop()
+
+    rows = db.execute('SELECT * FROM emotion_records ORDER BY id').fetchall()
+    assert len(rows) == 3
+    assert rows[0]['dominant_emotion'] == 'happy' and abs(rows[0]['confidence'] - 0.8) < 1e-6
+    assert abs(decode_emotions(rows[0]['emotion_vector'])['sad'] - 0.2) < 1e-6
+    samples = db.execute("SELECT samples FROM emotion_rollups WHERE resolution = 'day'").fetchone()[0]
+    assert samples == 3
+    assert writer.get_stats()['written'] == 3 and writer.batches == 2
+
+def test_full_queue_drops_records(db_path):
+    writer = EmotionRecordWriter(db_path, max_queue_size=2)
+    assert writer.submit(1, {'happy': 1.0})
+    assert writer.submit(1, {'happy': 1.0})
+    assert not writer.submit(1, {'happy': 1.0})
+    assert writer.get_stats()['pending'] == 2 and writer.dropped == 1
+
+def test_pending_records_are_flushed_at_stop(db, db_path):
+    writer = EmotionRecordWriter(db_path, batch_size=1000, flush_interval=60)
+    writer.start()
+    for _ in range(5):
+        writer.submit(2, {'neutral': 1.0})
+    assert wait_until(lambda: writer.queue.empty())
+    writer.stop()
+    assert db.execute('SELECT COUNT(*) FROM emotion_records').fetchone()[0] == 5
+
+def locked_writer(db_path, max_retries):
+    """Writer, not started, whose connection gives up at once on a locked database."""
+    writer = EmotionRecordWriter(db_path, max_retries=max_retries)
+    writer.connection = connect_db(db_path, {'busy_timeout': 0})
+    writer.submit(1, {'angry': 1.0})
+    return writer, [writer.queue.get_nowait()]
+
+def test_locked_database_is_retried(db, db_path):
+    writer, batch = locked_writer(db_path, max_retries=5)
+    db.execute('BEGIN EXCLUSIVE')
+    threading.Timer(0.15, db.rollback).start()
+
+    assert writer._flush(batch)
+    assert writer.written == 1 and writer.failed == 0
+    assert db.execute('SELECT COUNT(*) FROM emotion_records').fetchone()[0] == 1
+    writer.connection.close()
+
+def test_batch_fails_after_the_last_retry(db, db_path):
+    writer, batch = locked_writer(db_path, max_retries=1)
+    db.execute('BEGIN EXCLUSIVE')
+    try:
+        assert not writer._flush(batch)
+    finally:
+        db.rollback()
+    assert writer.written == 0 and writer.failed == 1
+    writer.connection.close()
@@ -0,0 +1,70 @@
+"""Tests for the emotion data retention engine."""
+from datetime import datetime
+
+from app.database.retention import RetentionEngine
+from app.database.rollups import get_emotion_summary
+from app.database.writer import INSERT_EMOTION_RECORD
+from tests.test_rollups import random_records, write
+
+def make_engine(db_path, **kwargs):
+    kwargs.setdefault('batch_size', 500)
+    kwargs.setdefault('batch_pause', 0)
+    return RetentionEngine(db_path, **kwargs)
+
+def count(db, query='SELECT COUNT(*) FROM emotion_records'):
+    return db.execute(query).fetchone()[0]
+
+def test_retention_folds_then_prunes(db, db_path):
+    rows = random_records(3000)
+    # Old records written without rollups, as before rollups existed
+    with db:
+        db.executemany(INSERT_EMOTION_RECORD, rows)
+    assert get_emotion_summary(db, 1)['samples'] == 0
+
+    engine = make_engine(db_path, raw_days=1, minute_rollup_days=2)
+    report = engine.run_once(now=datetime(2026, 1, 10))
+    assert report['days_folded'] > 0
+    assert report['raw_pruned'] == len(rows)
+    assert count(db) == 0
+    assert count(db, "SELECT COUNT(*) FROM emotion_rollups WHERE resolution = 'minute'") == 0
+
+    # Day and hour rollups keep the statistics of the pruned records
+    summary = get_emotion_summary(db, 1)
+    assert summary['samples'] == sum(1 for row in rows if row[0] == 1)
+
+    # Nothing left to do on a second run
+    report = engine.run_once(now=datetime(2026, 1, 10))
+    assert report['days_folded'] == report['raw_pruned'] == report['rollups_pruned'] == 0
+    assert engine.get_stats()['runs'] == 2 and engine.total_raw_pruned == len(rows)
+
+def test_raw_records_are_pruned_in_whole_days(db, db_path):
+    write(db, random_records(3000))
+    engine = make_engine(db_path, raw_days=1, minute_rollup_days=0)
+
+    kept = count(db, "SELECT COUNT(*) FROM emotion_records WHERE timestamp >= '2026-01-02'")
+
+    # The retention period ends mid-day: that day is kept whole
+    engine.run_once(now=datetime(2026, 1, 3, 12))
+    assert count(db) == kept
+
+def test_unrolled_records_of_a_kept_day_are_folded_whole(db, db_path):
+    rows = random_records(3000)
+    write(db, [row for row in rows if row[1] < '2026-01-02 12:00:00'])
+    # The rest of the day was written without rollups
+    with db:
+        db.executemany(INSERT_EMOTION_RECORD, [row for row in rows if row[1] >= '2026-01-02 12:00:00'])
+    expected = sum(1 for row in rows if row[0] == 1 and row[1] < '2026-01-03')
+    engine = make_engine(db_path, raw_days=1, minute_rollup_days=0)
+
+    # Day 2 isn't pruned yet, then is folded as a whole before it goes
+    engine.run_once(now=datetime(2026, 1, 3, 12))
+    report = engine.run_once(now=datetime(2026, 1, 4, 12))
+    assert report['days_folded'] == 2
+    summary = get_emotion_summary(db, 1, '2026-01-01', '2026-01-03')
+    assert summary['samples'] == expected
+
+def test_zero_days_keeps_everything(db, db_path):
+    write(db, random_records(500))
+    report = make_engine(db_path, raw_days=0, minute_rollup_days=0).run_once(now=datetime(2030, 1, 1))
+    assert report['raw_pruned'] == report['rollups_pruned'] == 0
+    assert count(db) == 500
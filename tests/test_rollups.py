@@ -0,0 +1,102 @@
+"""Tests for rollup maintenance."""
+import numpy as np
+import pytest
+
+from app.database.rollups import (
+    apply_rollups, first_complete_day, get_emotion_summary, rebuild_rollups, rebuild_rollups_command
+)
+from app.database.writer import INSERT_EMOTION_RECORD
+from tests.conftest import make_record
+
+def random_records(count, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(count):
+        probabilities = rng.dirichlet(np.ones(7))
+        emotions = dict(zip(('angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise'),
+                            probabilities.tolist()))
+        day, second = divmod(i * 97, 86400)
+        timestamp = f'2026-01-{1 + day:02d} {second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}'
+        rows.append(make_record(1 + i % 2, timestamp, emotions))
+    return rows
+
+def write(db, rows):
+    """Insert records and their rollups in one transaction, like the record writer."""
+    with db:
+        db.executemany(INSERT_EMOTION_RECORD, rows)
+        apply_rollups(db, rows)
+
+def rollup_table(db):
+    return db.execute('SELECT * FROM emotion_rollups ORDER BY user_id, resolution, bucket_start').fetchall()
+
+def test_incremental_rollups_match_a_rebuild(db):
+    rows = random_records(3000)
+    for i in range(0, len(rows), 250):
+        write(db, rows[i:i + 250])
+    incremental = rollup_table(db)
+
+    assert rebuild_rollups(db) == len(rows)
+    rebuilt = rollup_table(db)
+    assert len(incremental) == len(rebuilt)
+    for a, b in zip(incremental, rebuilt):
+        assert tuple(a)[:4] == tuple(b)[:4]
+        assert np.allclose(tuple(a)[4:], tuple(b)[4:])
+
+@pytest.mark.parametrize('resolution', ['minute', 'hour', 'day'])
+def test_summary_matches_raw_records(db, resolution):
+    rows = random_records(2000)
+    write(db, rows)
+
+    summary = get_emotion_summary(db, 1, '2026-01-01', '2026-01-02', resolution=resolution)
+    raw = db.execute(
+        "SELECT dominant_emotion, COUNT(*) FROM emotion_records "
+        "WHERE user_id = 1 AND timestamp >= '2026-01-01' AND timestamp < '2026-01-02' "
+        "GROUP BY dominant_emotion").fetchall()
+    assert summary['samples'] == sum(row[1] for row in raw)
+    for label, count in raw:
+        assert summary['emotions'][label]['count'] == count
+
+def day_samples(db, user_id=1):
+    return {str(row[0])[:10]: row[1] for row in db.execute(
+        "SELECT CAST(bucket_start AS TEXT), samples FROM emotion_rollups "
+        "WHERE user_id = ? AND resolution = 'day' ORDER BY bucket_start", (user_id,))}
+
+def test_first_complete_day(db):
+    assert first_complete_day(db) is None
+    write(db, [make_record(1, '2026-01-01 10:00:00', {'happy': 1.0}),
+               make_record(2, '2026-01-03 00:00:00', {'sad': 1.0})])
+    assert first_complete_day(db) == '2026-01-02 00:00:00'
+    assert first_complete_day(db, user_id=2) == '2026-01-03 00:00:00'
+
+def test_rebuild_keeps_the_history_of_pruned_records(db, cli_app):
+    rows = random_records(3000)
+    write(db, rows)
+    before = day_samples(db)
+    # Retention deleted the first day and part of the second
+    with db:
+        db.execute("DELETE FROM emotion_records WHERE timestamp < '2026-01-02 12:00:00'")
+    with db:
+        db.execute("UPDATE emotion_rollups SET samples = 0 WHERE bucket_start >= '2026-01-03'")
+
+    result = cli_app.test_cli_runner().invoke(rebuild_rollups_command)
+    assert result.exit_code == 0 and 'from 2026-01-03' in result.output
+    assert day_samples(db) == before
+
+def test_rebuild_range_is_explicit(db, cli_app):
+    write(db, random_records(3000))
+    with db:
+        db.execute("DELETE FROM emotion_records WHERE timestamp < '2026-01-02 12:00:00'")
+    before = day_samples(db)
+
+    result = cli_app.test_cli_runner().invoke(
+        rebuild_rollups_command, ['--from', '2026-01-02', '--to', '2026-01-03'])
+    assert result.exit_code == 0
+    after = day_samples(db)
+    assert after['2026-01-01'] == before['2026-01-01']
+    assert after['2026-01-02'] == db.execute(
+        "SELECT COUNT(*) FROM emotion_records WHERE user_id = 1 AND timestamp < '2026-01-03'").fetchone()[0]
+    assert after['2026-01-03'] == before['2026-01-03']
+
+def test_rebuild_of_an_empty_database(db, cli_app):
+    result = cli_app.test_cli_runner().invoke(rebuild_rollups_command)
+    assert result.exit_code == 0 and 'No emotion records' in result.output
@@ -0,0 +1,83 @@
+"""Tests for MJPEG quality tiers and per-viewer downgrades."""
+import cv2
+import numpy as np
+import pytest
+
+from app.models import stream_quality
+from app.models.stream_quality import QualityTier, ViewerQuality, encode_frame, parse_quality_tiers
+
+TIERS = parse_quality_tiers('high:640:85,medium:480:70,low:320:50,thumbnail:160:40:2')
+
+def test_parse_tiers():
+    assert TIERS[0] == QualityTier('high', 640, 85, None)
+    assert TIERS[-1] == QualityTier('thumbnail', 160, 40, 2.0)
+
+@pytest.mark.parametrize('spec', ['', 'high:640', 'high:0:85', 'high:640:101', ':640:85', 'high:x:85'])
+def test_malformed_tiers_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_quality_tiers(spec)
+
+def test_encode_scales_down_to_the_tier_width():
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    high = encode_frame(frame, TIERS[0])
+    low = encode_frame(frame, TIERS[2])
+    assert cv2.imdecode(np.frombuffer(high, np.uint8), cv2.IMREAD_COLOR).shape == (480, 640, 3)
+    assert cv2.imdecode(np.frombuffer(low, np.uint8), cv2.IMREAD_COLOR).shape == (240, 320, 3)
+    assert len(low) < len(high)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {'value': 1000.0}
+    monkeypatch.setattr(stream_quality.time, 'time', lambda: now['value'])
+    return now
+
+def test_slow_viewer_steps_down_and_recovers(clock):
+    quality = ViewerQuality(TIERS, TIERS[1], slow_send_time=0.1, recovery_time=5.0,
+                            min_dwell=2.0, smoothing=1.0)
+    # Too soon after the viewer joined
+    assert not quality.record_send(0.5)
+    clock['value'] += 2.0
+    assert quality.record_send(0.5)
+    assert quality.tier.name == 'low' and quality.downgrades == 1
+
+    # Sends are fast again: back up after the recovery time, but never
+    # above the requested tier
+    clock['value'] += 2.0
+    assert not quality.record_send(0.001)
+    clock['value'] += 5.0
+    assert quality.record_send(0.001)
+    assert quality.tier.name == 'medium'
+    clock['value'] += 10.0
+    assert not quality.record_send(0.001)
+    assert quality.tier.name == 'medium'
+
+def test_cheapest_tier_is_the_floor(clock):
+    quality = ViewerQuality(TIERS, TIERS[-1], min_dwell=0, smoothing=1.0)
+    assert not quality.record_send(1.0)
+    assert quality.tier.name == 'thumbnail'
+
+def test_manual_tier_is_kept(clock):
+    quality = ViewerQuality(TIERS, TIERS[0], auto=False, min_dwell=0, smoothing=1.0)
+    assert not quality.record_send(1.0)
+    assert quality.tier.name == 'high' and quality.send_time == 1.0
+
+def test_viewers_of_a_tier_share_one_encode(stream_app):
+    from app.models.video_processor import VideoStream
+
+    with stream_app.app_context():
+        stream = VideoStream(source='synthetic:0')
+    stream.processed_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    high, low = stream.get_quality_tier('high'), stream.get_quality_tier('low')
+
+    for _ in range(3):
+        stream.get_jpeg_frame(tier=high)
+        stream.get_jpeg_frame(tier=low)
+    assert stream.encode_count == 2 and stream.encode_cache_hits == 4
+
+    # A new frame is encoded again
+    stream._set_processed_frame(np.ones((480, 640, 3), dtype=np.uint8))
+    stream.get_jpeg_frame(tier=high)
+    assert stream.encode_count == 3
+
+    with pytest.raises(ValueError):
+        stream.get_quality_tier('ultra')
@@ -0,0 +1,61 @@
+"""Tests for synthetic emotion data generation."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.database.emotion_vectors import EMOTION_LABELS, decode_matrix
+from app.database.rollups import get_emotion_summary
+from app.database.synthetic import EmotionDataGenerator, bulk_load, create_users
+
+START = datetime(2026, 1, 1)
+
+def generate(seed=1, user_id=1, days=3, **kwargs):
+    generator = EmotionDataGenerator(seed, **kwargs)
+    return list(generator.iter_records(user_id, generator.make_profile(), START, days))
+
+def test_records_are_reproducible():
+    assert generate(seed=5) == generate(seed=5)
+    assert generate(seed=5) != generate(seed=6)
+
+def test_records_look_like_stored_ones():
+    records = generate(days=5, interval=2.0)
+    assert records
+    user_ids, timestamps, blobs, labels, confidences = zip(*records)
+    assert set(user_ids) == {1}
+    assert list(timestamps) == sorted(timestamps)
+    assert all(len(timestamp) == 19 for timestamp in timestamps)
+
+    matrix = decode_matrix(list(blobs))
+    assert np.allclose(matrix.sum(axis=1), 1.0, atol=1e-5)
+    assert [EMOTION_LABELS[i] for i in matrix.argmax(axis=1)] == list(labels)
+    assert np.allclose(matrix.max(axis=1), confidences)
+
+def test_sessions_sample_every_interval():
+    records = generate(days=2, interval=5.0)
+    times = np.array([np.datetime64(record[1]) for record in records])
+    gaps = np.diff(times).astype(int)
+    # Most gaps are one interval; the rest separate sessions
+    assert np.median(gaps) == 5
+    assert (gaps > 60).sum() < len(records) / 10
+
+def test_bulk_load_writes_records_with_rollups(db):
+    records = generate(days=2) + generate(seed=2, user_id=2, days=2)
+    batches = []
+    stats = bulk_load(db, iter(records), batch_size=1000, progress=lambda s: batches.append(s['rows']))
+
+    assert stats['rows'] == len(records)
+    assert stats['batches'] == len(batches) == -(-len(records) // 1000)
+    assert batches[-1] == len(records)
+    assert db.execute('SELECT COUNT(*) FROM emotion_records').fetchone()[0] == len(records)
+    assert get_emotion_summary(db, 2)['samples'] == sum(1 for record in records if record[0] == 2)
+
+def test_created_users_share_a_password(db):
+    pytest.importorskip('faker')
+    from werkzeug.security import check_password_hash
+
+    user_ids = create_users(db, 3, 'secret')
+    assert user_ids == [3, 4, 5]
+    rows = db.execute('SELECT username, password_hash FROM users WHERE id >= 3 ORDER BY id').fetchall()
+    assert [row[0][-1] for row in rows] == ['3', '4', '5']
+    assert all(check_password_hash(row[1], 'secret') for row in rows)
@@ -0,0 +1,77 @@
+"""Tests for the offline video analysis job."""
+import queue
+
+import cv2
+import numpy as np
+import pytest
+
+from app.models.frame_sources import SyntheticFaceSource
+from app.utils import video_processing
+from app.utils.video_processing import (
+    CentroidTracker, _read_frames, analyze_video_file, load_analysis, result_dtype
+)
+
+def test_tracker_follows_moving_faces():
+    tracker = CentroidTracker(max_distance=50)
+    assert tracker.assign(0, [(0, 0, 20, 20), (200, 200, 20, 20)]) == [0, 1]
+    # Both faces moved a little; the order of detection doesn't matter
+    assert tracker.assign(1, [(210, 205, 20, 20), (10, 5, 20, 20)]) == [1, 0]
+    # A face far from every track starts a new one
+    assert tracker.assign(2, [(500, 500, 20, 20)]) == [2]
+
+def test_tracker_forgets_old_tracks():
+    tracker = CentroidTracker(max_age=2, first_id=100)
+    assert tracker.assign(0, [(0, 0, 20, 20)]) == [100]
+    assert tracker.assign(5, [(0, 0, 20, 20)]) == [101]
+
+def test_tracker_never_gives_two_faces_one_track():
+    tracker = CentroidTracker(max_distance=100)
+    tracker.assign(0, [(0, 0, 20, 20)])
+    assert tracker.assign(1, [(5, 0, 20, 20), (0, 5, 20, 20)]) == [0, 1]
+
+def test_reader_samples_every_nth_frame():
+    source = SyntheticFaceSource(realtime=False, num_frames=10)
+    source.open()
+    frames = queue.Queue()
+    _read_frames(source, 0, 8, 3, frames)
+
+    indexes = []
+    while (item := frames.get()) is not None:
+        indexes.append(item[0])
+    assert indexes == [0, 3, 6]
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (64, 48))
+    if not writer.isOpened():
+        pytest.skip('OpenCV was built without a video writer')
+    for _ in range(40):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_results_round_trip(video_path, tmp_path, monkeypatch):
+    tasks = []
+
+    def fake_segment(task):
+        tasks.append(task)
+        _, _, start, end, _, frame_step, track_offset, _, _ = task
+        records = np.zeros(2, dtype=result_dtype(7))
+        records['frame'] = [start, start + frame_step]
+        records['track'] = track_offset
+        records['probs'][:, 3] = 1.0
+        return records, len(range(start, end, frame_step))
+
+    monkeypatch.setattr(video_processing, '_analyze_segment_task', fake_segment)
+    output = str(tmp_path / 'results.npz')
+    summary = analyze_video_file(video_path, output, 'testing', frame_step=2)
+
+    assert [task[2:4] for task in tasks] == [(0, 40)]
+    assert summary['frames'] == 20 and summary['faces'] == 2 and summary['tracks'] == 1
+
+    records, emotions, fps = load_analysis(output)
+    assert records.dtype == result_dtype(7)
+    assert records['frame'].tolist() == [0, 2]
+    assert emotions[int(records['probs'][0].argmax())] == 'happy'
+    assert fps == 25
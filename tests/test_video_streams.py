@@ -0,0 +1,188 @@
+"""Tests for video stream lifecycle: viewers and the idle reaper."""
+import time
+
+import numpy as np
+import pytest
+
+from app.models.broadcast import ViewerMailbox
+from tests.conftest import wait_until
+
+SOURCE = 'synthetic:1?fps=30'
+
+@pytest.fixture
+def stream(stream_app):
+    """A running stream of user 1 on a synthetic source."""
+    from app.models.video_processor import get_or_start_stream
+
+    with stream_app.app_context():
+        stream = get_or_start_stream(1, source=SOURCE)
+        assert stream is not None
+        yield stream
+        stream.stop()
+
+def test_viewers_are_counted(stream):
+    stream.attach_viewer()
+    stream.attach_viewer()
+    assert stream.viewer_count == 2 and stream.priority == 'interactive'
+    stream.detach_viewer()
+    stream.detach_viewer()
+    stream.detach_viewer()
+    assert stream.viewer_count == 0 and stream.priority == 'background'
+
+def test_reaper_stops_idle_streams(stream):
+    from app.models.admission import get_admission_controller
+    from app.models.video_processor import active_streams, reap_idle_streams
+
+    assert reap_idle_streams(idle_timeout=60) == 0
+    stream.last_access_time = time.time() - 120
+    assert stream.is_idle(60)
+    assert reap_idle_streams(idle_timeout=60) == 1
+
+    assert not stream.running
+    assert 1 not in active_streams
+    assert get_admission_controller().active.get(1, 0) == 0
+    assert stream.frame is None and stream.processed_frame is None
+
+def test_watched_streams_are_not_reaped(stream):
+    from app.models.video_processor import reap_idle_streams
+
+    stream.attach_viewer()
+    stream.last_access_time = time.time() - 120
+    assert stream.idle_time() == 0
+    assert reap_idle_streams(idle_timeout=60) == 0
+
+    # Leaving counts as an access, so the stream gets the full timeout again
+    stream.detach_viewer()
+    assert reap_idle_streams(idle_timeout=60) == 0
+    assert stream.running
+
+def test_polling_keeps_a_stream_alive(stream):
+    stream.last_access_time = time.time() - 120
+    stream.touch()
+    assert not stream.is_idle(60)
+
+def test_running_stream_is_shared(stream, stream_app):
+    from app.models.video_processor import get_or_start_stream
+
+    with stream_app.app_context():
+        assert get_or_start_stream(1, source=SOURCE) is stream
+
+def test_cleanup_stops_every_stream(stream):
+    from app.models.video_processor import active_streams, cleanup_video_streams
+
+    cleanup_video_streams()
+    assert wait_until(lambda: not stream.thread.is_alive())
+    assert active_streams == {}
+
+def test_viewer_stats_follow_attached_mailboxes(stream):
+    mailbox = ViewerMailbox(stream.frame_updates)
+    stream.attach_viewer(mailbox, stream.create_viewer_quality('low'))
+    assert mailbox.take(timeout=2.0) is not None
+
+    stats = stream.get_viewer_stats()
+    assert len(stats) == 1
+    assert stats[0]['tier'] == 'low' and stats[0]['delivered'] == 1
+    stream.detach_viewer(mailbox)
+    assert stream.get_viewer_stats() == []
+
+class FakeScheduler:
+    """Scheduler finding one happy face in every frame without running a model."""
+
+    def __init__(self):
+        self.predictions = 0
+
+    def run(self, client_id, function, timeout=None, priority=None):
+        return [np.zeros((96, 96, 3))], [(10, 10, 50, 50)]
+
+    def predict(self, client_id, faces, timeout=None, priority=None):
+        self.predictions += 1
+        return [{'happy': 0.9, 'sad': 0.1} for _ in faces]
+
+    def get_client_stats(self, client_id):
+        return {}
+
+class FakeWriter:
+    """Record writer keeping the submitted records."""
+
+    def __init__(self):
+        self.records = []
+
+    def submit(self, user_id, emotions):
+        self.records.append((user_id, emotions))
+        return True
+
+@pytest.fixture
+def analyzed_stream(stream_app, monkeypatch):
+    """A stream of user 1 whose frames are analyzed by FakeScheduler, not yet started."""
+    from app.models import video_processor
+
+    monkeypatch.setattr(video_processor, 'get_inference_service', lambda: FakeScheduler())
+    with stream_app.app_context():
+        stream = video_processor.VideoStream(user_id=1, source=SOURCE)
+        stream.record_writer = FakeWriter()
+        stream.storage_interval = 0
+        stream.frame_interval = 0
+        yield stream
+        stream.stop()
+
+def test_privacy_mode_keeps_no_video_but_stores_results(analyzed_stream):
+    stream = analyzed_stream
+    stream.set_privacy_mode(True)
+    updates = ViewerMailbox(stream.updates)
+    assert stream.start()
+
+    update = updates.take(timeout=2.0)
+    assert update['emotion']['dominant_emotion'] == 'happy'
+    assert wait_until(lambda: stream.record_writer.records)
+    assert stream.record_writer.records[0][0] == 1
+
+    assert stream.frame is None and stream.processed_frame is None
+    assert stream.encode_count == 0
+    assert stream.get_jpeg_frame() == stream._get_privacy_frame()
+
+def test_leaving_privacy_mode_brings_video_back(analyzed_stream):
+    stream = analyzed_stream
+    stream.set_privacy_mode(True)
+    assert stream.start()
+    stream.apply_settings({'privacy_mode': 0})
+    assert wait_until(lambda: stream.processed_frame is not None)
+    assert stream.get_jpeg_frame() != stream._get_privacy_frame()
+
+def save_settings(app, user_id, **values):
+    from tests.conftest import login
+
+    return login(app, user_id).post('/settings/update', data=values)
+
+def test_analysis_frequency_comes_from_the_settings(stream_app):
+    from app.models.video_processor import VideoStream
+
+    with stream_app.app_context():
+        from app.database.db import get_db
+
+        db = get_db()
+        db.execute('INSERT INTO settings (user_id, analysis_frequency) VALUES (1, 3)')
+        db.commit()
+        stream = VideoStream(user_id=1, source=SOURCE)
+        assert stream.analysis_frequency == 3
+        stream.stop()
+
+def test_analysis_frequency_applies_live(analyzed_stream, stream_app):
+    from app.models.inference_service import get_client_share
+
+    stream = analyzed_stream
+    assert stream.start()
+    assert get_client_share(stream.client_id) == 1.0
+
+    # Saving the preferences form updates the running stream
+    response = save_settings(stream_app, 1, section='preferences', theme='dark', analysis_frequency='4')
+    assert response.status_code == 302
+    assert stream.analysis_frequency == 4
+    assert get_client_share(stream.client_id) == 0.25
+
+    # Every 4th captured frame is analyzed
+    time.sleep(0.2)
+    frames, analyzed = stream.source.frames_read, stream.scheduler.predictions
+    time.sleep(0.5)
+    frames = stream.source.frames_read - frames
+    analyzed = stream.scheduler.predictions - analyzed
+    assert frames >= 8 and abs(analyzed - frames / 4) <= 1